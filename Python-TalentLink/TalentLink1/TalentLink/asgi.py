@@ -2,6 +2,13 @@
 ASGI config for TalentLink project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+
+Serve it with an ASGI server (e.g. ``uvicorn TalentLink.asgi:application``)
+to get pushed notifications over Server-Sent Events
+(``myapp.views.notification_stream``) and live contract chat over
+WebSockets (``myapp.chat.chat_socket`` at ``/ws/contract/<id>/chat/``).
+The WSGI/waitress entry point still works; browsers then fall back to
+polling ``get_notifications`` and ``chat_updates``.
 """
 
 import os
@@ -9,4 +16,14 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "TalentLink.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after setup so the app registry is ready
+from myapp.chat import chat_socket  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "websocket":
+        await chat_socket(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -109,6 +109,57 @@ else:
         }
     }
 
+# =========================
+# CACHE
+# =========================
+# CACHE_BACKEND picks the store: "locmem" (default, per process), "file",
+# or "redis" (any Redis-compatible server at CACHE_LOCATION, e.g. a local
+# stand-in; needs the redis package). Use file/redis with several workers.
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "locmem").lower()
+
+if CACHE_BACKEND == "redis":
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ.get("CACHE_LOCATION", "redis://127.0.0.1:6379/1"),
+        }
+    }
+elif CACHE_BACKEND == "file":
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.environ.get("CACHE_LOCATION", str(BASE_DIR / "cache")),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "talentlink",
+        }
+    }
+
+# Seconds a computed dashboard context stays cached; model signals drop
+# it sooner whenever the underlying rows change.
+DASHBOARD_CACHE_TIMEOUT = int(os.environ.get("DASHBOARD_CACHE_TIMEOUT", 300))
+
+# =========================
+# NOTIFICATIONS
+# =========================
+# Seconds between keepalive comments on an idle notification stream (SSE)
+NOTIFICATION_STREAM_KEEPALIVE = int(os.environ.get("NOTIFICATION_STREAM_KEEPALIVE", 25))
+
+# Read notifications older than this many days are moved to the archive
+# table by `manage.py archive_notifications`
+NOTIFICATION_RETENTION_DAYS = int(os.environ.get("NOTIFICATION_RETENTION_DAYS", 90))
+
+# Pub/sub behind the contract chat WebSockets. The in-process default only
+# reaches sockets in the same server process; with several processes use
+# "myapp.events.RedisChannelLayer" and point CHAT_CHANNEL_LAYER_URL at any
+# Redis-protocol server.
+CHAT_CHANNEL_LAYER = os.environ.get("CHAT_CHANNEL_LAYER", "myapp.events.InProcessChannelLayer")
+CHAT_CHANNEL_LAYER_URL = os.environ.get("CHAT_CHANNEL_LAYER_URL", "redis://127.0.0.1:6379/1")
+
 # =========================
 # PASSWORD VALIDATION
 # =========================
@@ -132,6 +183,26 @@ STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Chat attachments are uploaded in chunks (myapp.uploads); sizes in bytes
+CHAT_UPLOAD_MAX_SIZE = int(os.environ.get("CHAT_UPLOAD_MAX_SIZE", 100 * 1024 * 1024))
+CHAT_UPLOAD_CHUNK_SIZE = 1024 * 1024
+CHAT_UPLOAD_MAX_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Let the front proxy send attachment bytes once download_attachment has
+# authorized the request. nginx: set the prefix to an `internal` location
+# aliased to MEDIA_ROOT, e.g.
+#     location /protected-media/ { internal; alias /app/media/; }
+# Apache (mod_xsendfile) / lighttpd: set MEDIA_X_SENDFILE=True.
+MEDIA_X_ACCEL_REDIRECT_PREFIX = os.environ.get("MEDIA_X_ACCEL_REDIRECT_PREFIX", "")
+MEDIA_X_SENDFILE = os.environ.get("MEDIA_X_SENDFILE", "False").lower() in ["true", "1", "yes"]
+
+# Background threads per process rendering avatar and chat image thumbnails
+THUMBNAIL_WORKERS = int(os.environ.get("THUMBNAIL_WORKERS", 2))
+
+# Seconds between checks by each process's skill matcher (myapp.matching)
+# for projects changed by other processes
+SKILL_MATCHER_SYNC_INTERVAL = float(os.environ.get("SKILL_MATCHER_SYNC_INTERVAL", 5))
+
 # =========================
 # LOGIN SETTINGS
 # =========================
@@ -149,6 +220,8 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
+    # Keyset pages of at most 100 rows; ?count=true adds the total
+    "DEFAULT_PAGINATION_CLASS": "myapp.pagination.KeysetPagination",
 }
 
 # =========================
@@ -175,6 +248,13 @@ TIME_ZONE = "Asia/Kolkata"
 USE_I18N = True
 USE_TZ = True
 
+# =========================
+# SYSTEM CHECKS
+# =========================
+# Review's covering index only carries INCLUDE columns on PostgreSQL;
+# SQLite builds it as a plain composite index, which is fine.
+SILENCED_SYSTEM_CHECKS = ["models.W040"]
+
 # =========================
 # DEFAULT AUTO FIELD
 # =========================
@@ -6,4 +6,4 @@ class MyappConfig(AppConfig):
     name = 'myapp'
 
     def ready(self):
-        pass
\ No newline at end of file
+        from . import signals  # noqa: F401
@@ -0,0 +1,68 @@
+# myapp/cache.py
+from django.conf import settings
+from django.core.cache import cache
+
+DASHBOARD_KINDS = ("client_dashboard", "freelancer_dashboard", "profile_view")
+PROJECTS_VERSION_KEY = "dashboard:projects:version"
+
+
+def _timeout():
+    return getattr(settings, "DASHBOARD_CACHE_TIMEOUT", 300)
+
+
+def projects_version():
+    """
+    Generation number of the project listing. Freelancer dashboards show
+    every project, so a project change bumps this instead of deleting the
+    cached dashboard of every freelancer.
+    """
+    version = cache.get(PROJECTS_VERSION_KEY)
+    if version is None:
+        cache.add(PROJECTS_VERSION_KEY, 1, None)
+        version = cache.get(PROJECTS_VERSION_KEY, 1)
+    return version
+
+
+def bump_projects_version():
+    try:
+        cache.incr(PROJECTS_VERSION_KEY)
+    except ValueError:
+        cache.add(PROJECTS_VERSION_KEY, 2, None)
+
+
+def dashboard_cache_key(kind, user_id, version=None):
+    if version is None:
+        version = projects_version()
+    return f"dashboard:{kind}:{user_id}:{version}"
+
+
+def get_dashboard_context(kind, user, build):
+    """
+    Returns the cached context for this user's dashboard, calling build()
+    on a miss. Querysets are evaluated before caching so a hit runs no
+    queries for the cached data.
+    """
+    key = dashboard_cache_key(kind, user.pk)
+    context = cache.get(key)
+    if context is None:
+        context = {
+            name: list(value) if hasattr(value, "_fetch_all") else value
+            for name, value in build().items()
+        }
+        cache.set(key, context, _timeout())
+    return context
+
+
+def invalidate_dashboards(*user_ids):
+    """
+    Drops every cached dashboard of the given users.
+    """
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return
+    version = projects_version()
+    cache.delete_many([
+        dashboard_cache_key(kind, user_id, version)
+        for user_id in user_ids
+        for kind in DASHBOARD_KINDS
+    ])
@@ -0,0 +1,230 @@
+# myapp/chat.py
+import asyncio
+import json
+import os
+import re
+from http.cookies import SimpleCookie
+from importlib import import_module
+from types import SimpleNamespace
+from urllib.parse import urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.db import transaction
+from django.db.models import Count, F, Q, Value
+from django.db.models.functions import Greatest, Least
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+
+from .events import get_chat_layer
+from .cache import invalidate_dashboards
+from .models import Contract, Message, Notification
+from .utils import mark_notifications_read, notify_chat_message
+
+CHAT_SOCKET_PATH = re.compile(r"^/ws/contract/(?P<contract_id>\d+)/chat/$")
+
+# Close codes for refused sockets (4000-4999 are free for applications)
+CLOSE_NOT_FOUND = 4404
+CLOSE_FORBIDDEN = 4403
+
+
+def chat_group(contract_id):
+    return f"contract-{contract_id}"
+
+
+def chat_message_item(message):
+    item = {
+        "id": message.id,
+        "html": render_to_string("chat_message.html", {"msg": message}),
+        "sender": message.sender.user.username,
+        "content": message.content,
+        "timestamp": timezone.localtime(message.timestamp).strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    if message.file:
+        item.update({
+            "file_url": reverse("download_attachment", args=[message.id]),
+            "file_name": message.file_name or os.path.basename(message.file.name),
+            "is_image": message.is_image,
+        })
+    return item
+
+
+def post_chat_message(contract, sender, content, file=None):
+    """
+    Saves a chat message, notifies the other party and, once committed,
+    pushes it to every socket open on the contract. send_message and the
+    WebSocket both post through here.
+    """
+    message = Message.objects.create(
+        contract=contract,
+        sender=sender,
+        content=content,
+        file=file,
+        file_name=os.path.basename(file.name)[:255] if file else "",
+    )
+
+    # Sending implies having read the chat up to here
+    sender_pointer = contract.read_pointer_field(sender)
+    Contract.all_objects.filter(id=contract.id).update(
+        last_message_id=Greatest(F("last_message_id"), message.id),
+        **{sender_pointer: Greatest(F(sender_pointer), message.id)},
+    )
+
+    receiver = contract.freelancer if sender.pk == contract.client_id else contract.client
+    # Either party may be missing (both columns are nullable)
+    if receiver is not None:
+        notify_chat_message(receiver.user, contract, sender.user.username)
+
+    item = chat_message_item(message)
+    group = chat_group(contract.id)
+    transaction.on_commit(lambda: get_chat_layer().publish(group, item))
+    return message
+
+
+# ---------------- Read pointers ----------------
+def mark_chat_read(contract, profile, message_id):
+    """
+    Moves profile's read pointer on contract forward to message_id (never
+    back) and marks the contract's chat notification read with it.
+    Returns whether the pointer moved.
+    """
+    field = contract.read_pointer_field(profile)
+    # Never past the newest message, whatever the client claims
+    target = Least(Value(message_id), F("last_message_id"))
+    moved = Contract.all_objects.filter(id=contract.id, **{f"{field}__lt": target}).update(**{field: target})
+    if moved:
+        chat_notifications = Notification.objects.filter(
+            user_id=profile.user_id, contract=contract, is_read=False
+        ).values_list("id", flat=True)
+        if not mark_notifications_read(profile.user, ids=list(chat_notifications)):
+            invalidate_dashboards(profile.user_id)
+    return bool(moved)
+
+
+def unread_chat_counts(profile):
+    """
+    {contract_id: unread messages} for every contract of profile with
+    any, in one grouped query: messages from the other side past the
+    profile's read pointer, each found through the (contract, id) index.
+    """
+    rows = (
+        Message.objects.filter(
+            Q(contract__client=profile, id__gt=F("contract__client_last_read_id"))
+            | Q(contract__freelancer=profile, id__gt=F("contract__freelancer_last_read_id")),
+            id__gt=F("contract__chat_cleared_through"),
+            contract__deleted_at__isnull=True,
+        )
+        .exclude(sender=profile)
+        .values("contract_id")
+        .annotate(unread=Count("id"))
+        .order_by()
+    )
+    return {row["contract_id"]: row["unread"] for row in rows}
+
+
+# ---------------- WebSocket transport ----------------
+def _session_key(scope):
+    cookies = SimpleCookie()
+    for name, value in scope.get("headers", []):
+        if name == b"cookie":
+            cookies.load(value.decode("latin-1"))
+    morsel = cookies.get(settings.SESSION_COOKIE_NAME)
+    return morsel.value if morsel else None
+
+
+def _same_origin(scope):
+    # Browsers send Origin on every WebSocket handshake; refusing other
+    # sites stops a page elsewhere from riding the user's session cookie.
+    headers = dict(scope.get("headers", []))
+    origin = headers.get(b"origin")
+    if origin is None:
+        return True
+    return urlsplit(origin.decode("latin-1")).netloc == headers.get(b"host", b"").decode("latin-1")
+
+
+@sync_to_async
+def _authorize(session_key, contract_id):
+    """
+    (contract, profile) when the session's user is a party to the
+    contract, else (None, None). One hop to the ORM thread per handshake.
+    """
+    engine = import_module(settings.SESSION_ENGINE)
+    user = get_user(SimpleNamespace(session=engine.SessionStore(session_key)))
+    if not user.is_authenticated:
+        return None, None
+    contract = Contract.objects.select_related("client__user", "freelancer__user").filter(id=contract_id).first()
+    profile = getattr(user, "profile", None)
+    if contract is None or not contract.has_party(profile):
+        return None, None
+    return contract, profile
+
+
+@sync_to_async
+def _post_from_socket(contract, profile, content):
+    with transaction.atomic():
+        return post_chat_message(contract, profile, content).id
+
+
+async def chat_socket(scope, receive, send):
+    """
+    ASGI WebSocket endpoint /ws/contract/<id>/chat/ for the contract's two
+    parties. Server -> client frames are {"type": "message", "message": ...}
+    with the same payload chat_updates returns; clients post by sending
+    {"content": "..."}. An idle socket costs one queue and two suspended
+    coroutines, and no database work.
+    """
+    event = await receive()
+    if event["type"] != "websocket.connect":
+        return
+
+    match = CHAT_SOCKET_PATH.match(scope["path"])
+    if match is None:
+        await send({"type": "websocket.close", "code": CLOSE_NOT_FOUND})
+        return
+
+    contract, profile = None, None
+    session_key = _session_key(scope)
+    if session_key and _same_origin(scope):
+        contract, profile = await _authorize(session_key, int(match["contract_id"]))
+    if profile is None:
+        await send({"type": "websocket.close", "code": CLOSE_FORBIDDEN})
+        return
+
+    layer = get_chat_layer()
+    group = chat_group(contract.id)
+    queue = layer.subscribe(group)
+    await send({"type": "websocket.accept"})
+
+    pushing = asyncio.ensure_future(_push_messages(queue, send))
+    try:
+        while True:
+            event = await receive()
+            if event["type"] == "websocket.disconnect":
+                break
+            if event["type"] == "websocket.receive":
+                await _handle_frame(contract, profile, event, send)
+    finally:
+        pushing.cancel()
+        layer.unsubscribe(group, queue)
+
+
+async def _push_messages(queue, send):
+    while True:
+        event = await queue.get()
+        frame = {"type": "message", "message": event}
+        await send({"type": "websocket.send", "text": json.dumps(frame)})
+
+
+async def _handle_frame(contract, profile, event, send):
+    try:
+        content = str(json.loads(event.get("text") or "{}").get("content", "")).strip()
+    except (ValueError, AttributeError):
+        content = ""
+    if not content:
+        error = {"type": "error", "error": "Empty message"}
+        await send({"type": "websocket.send", "text": json.dumps(error)})
+        return
+    # The saved message comes back to this socket through the layer too
+    await _post_from_socket(contract, profile, content)
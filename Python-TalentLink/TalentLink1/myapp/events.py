@@ -0,0 +1,211 @@
+# myapp/events.py
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class InProcessChannelLayer:
+    """
+    In-process publish/subscribe, keyed by group (a user id for
+    notifications, a contract group for chat).
+
+    Each open SSE or WebSocket connection owns an asyncio.Queue on the
+    server's event loop. publish() may be called from any thread (sync
+    views run in a worker thread under ASGI) and hands the event to the
+    loop safely. Only subscribers in this process are reached; use
+    RedisChannelLayer to fan out across processes.
+    """
+    QUEUE_SIZE = 100
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # group -> {queue: the event loop that owns it}
+        self._subscribers = defaultdict(dict)
+
+    def subscribe(self, group):
+        queue = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+        with self._lock:
+            self._subscribers[group][queue] = asyncio.get_running_loop()
+        return queue
+
+    def unsubscribe(self, group, queue):
+        with self._lock:
+            entries = self._subscribers.get(group, {})
+            entries.pop(queue, None)
+            if not entries:
+                self._subscribers.pop(group, None)
+
+    def subscriber_count(self, group=None):
+        with self._lock:
+            if group is not None:
+                return len(self._subscribers.get(group, ()))
+            return sum(len(entries) for entries in self._subscribers.values())
+
+    def publish(self, group, event):
+        with self._lock:
+            entries = list(self._subscribers.get(group, {}).items())
+        try:
+            current = asyncio.get_running_loop()
+        except RuntimeError:
+            current = None
+        for queue, loop in entries:
+            if loop is current:
+                _offer(queue, event)
+                continue
+            try:
+                loop.call_soon_threadsafe(_offer, queue, event)
+            except RuntimeError:
+                # Loop already closed; the stream's finally block will unsubscribe
+                pass
+
+
+def _offer(queue, event):
+    try:
+        queue.put_nowait(event)
+    except asyncio.QueueFull:
+        # A stalled client; it resyncs (get_notifications / chat_updates) when it reconnects
+        pass
+
+
+class RedisChannelLayer:
+    """
+    Fans events out to every process through Redis PUBLISH/SUBSCRIBE
+    (any server speaking the Redis protocol will do, e.g. a local
+    Valkey for multi-process runs). Each process holds one subscriber
+    connection and hands what it receives to its own InProcessChannelLayer.
+
+    Needs the redis package; set CHAT_CHANNEL_LAYER to
+    "myapp.events.RedisChannelLayer" and CHAT_CHANNEL_LAYER_URL.
+    """
+    PREFIX = "talentlink:"
+    # How long the reader waits on Redis before looking at its channels again
+    POLL_TIMEOUT = 1.0
+
+    def __init__(self, url=None):
+        self.url = url or getattr(settings, "CHAT_CHANNEL_LAYER_URL", "redis://127.0.0.1:6379/1")
+        self._publisher = self._connect()
+        self._local = InProcessChannelLayer()
+        self._pubsub = None
+        # Channels the subscriber connection is subscribed to
+        self._channels = set()
+        self._changes = None
+        self._listener = None
+
+    def _connect(self):
+        import redis
+
+        return redis.Redis.from_url(self.url)
+
+    def _connect_pubsub(self):
+        import redis.asyncio
+
+        return redis.asyncio.Redis.from_url(self.url).pubsub()
+
+    def subscribe(self, group):
+        queue = self._local.subscribe(group)
+        if self._local.subscriber_count(group) == 1:
+            asyncio.ensure_future(self._sync(group))
+        return queue
+
+    def unsubscribe(self, group, queue):
+        self._local.unsubscribe(group, queue)
+        if not self._local.subscriber_count(group):
+            asyncio.ensure_future(self._sync(group))
+
+    def subscriber_count(self, group=None):
+        return self._local.subscriber_count(group)
+
+    def publish(self, group, event):
+        self._publisher.publish(self.PREFIX + str(group), json.dumps(event))
+
+    async def _sync(self, group):
+        """
+        Subscribes to or unsubscribes from group's channel, by whether this
+        process still has sockets on it. Changes run one at a time and
+        read the state as it is then, so a group closed and at once
+        reopened ends up subscribed whichever change runs first.
+        """
+        if self._changes is None:
+            self._changes = asyncio.Lock()
+        async with self._changes:
+            if self._pubsub is None:
+                self._pubsub = self._connect_pubsub()
+            channel = self.PREFIX + str(group)
+            wanted = self._local.subscriber_count(group) > 0
+            if wanted and channel not in self._channels:
+                await self._pubsub.subscribe(channel)
+                self._channels.add(channel)
+            elif not wanted and channel in self._channels:
+                await self._pubsub.unsubscribe(channel)
+                self._channels.discard(channel)
+            # The reader stops once nothing is subscribed; start it again
+            if self._channels and (self._listener is None or self._listener.done()):
+                self._listener = asyncio.ensure_future(self._forward())
+
+    async def _forward(self):
+        while self._channels:
+            try:
+                message = await self._pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=self.POLL_TIMEOUT
+                )
+            except Exception:
+                # Lost connection: redis-py reconnects and resubscribes on
+                # the next read
+                await asyncio.sleep(self.POLL_TIMEOUT)
+                continue
+            if message is None or message["type"] != "message":
+                continue
+            channel = message["channel"].decode()[len(self.PREFIX):]
+            group = int(channel) if channel.isdigit() else channel
+            self._local.publish(group, json.loads(message["data"]))
+
+
+hub = InProcessChannelLayer()
+
+_chat_layer = None
+
+
+def get_chat_layer():
+    """
+    The channel layer chat sockets subscribe to, built once from the
+    CHAT_CHANNEL_LAYER setting (default: in-process).
+    """
+    global _chat_layer
+    if _chat_layer is None:
+        path = getattr(settings, "CHAT_CHANNEL_LAYER", "myapp.events.InProcessChannelLayer")
+        _chat_layer = import_string(path)()
+    return _chat_layer
+
+
+def format_sse(event, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def notification_events(user_id):
+    """
+    Server-Sent Events for one user. Waits on the queue without touching
+    the database; the only idle traffic is a comment line every
+    NOTIFICATION_STREAM_KEEPALIVE seconds so proxies keep the socket open.
+    """
+    keepalive = getattr(settings, "NOTIFICATION_STREAM_KEEPALIVE", 25)
+    queue = hub.subscribe(user_id)
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield format_sse("notification", event, event_id=event.get("id"))
+    finally:
+        hub.unsubscribe(user_id, queue)
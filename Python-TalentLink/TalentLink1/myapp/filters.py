@@ -1,5 +1,11 @@
 import django_filters
-from .models import Project
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.settings import api_settings
+
+from django.db.models.functions import Lower
+
+from .models import Profile, Project
+from .search import get_project_search, search_terms
 
 class ProjectFilter(django_filters.FilterSet):
     client_username = django_filters.CharFilter(field_name="client__user__username", lookup_expr='icontains')
@@ -11,3 +17,34 @@ class ProjectFilter(django_filters.FilterSet):
     class Meta:
         model = Project
         fields = []  # we define filters explicitly
+
+
+class FreelancerFilter(django_filters.FilterSet):
+    min_rate = django_filters.NumberFilter(field_name="hourly_rate", lookup_expr='gte')
+    max_rate = django_filters.NumberFilter(field_name="hourly_rate", lookup_expr='lte')
+    available = django_filters.BooleanFilter(field_name="availability")
+    location = django_filters.CharFilter(method="filter_location")
+
+    class Meta:
+        model = Profile
+        fields = []
+
+    def filter_location(self, queryset, name, value):
+        # Case-insensitive equality, served by freelancer_location_idx
+        return queryset.alias(location_key=Lower("location")).filter(location_key=value.strip().lower())
+
+
+class ProjectSearchFilter(BaseFilterBackend):
+    """
+    ?search= through the project search backend (myapp.search): every
+    word must match the title or description, the last one as a prefix.
+    Results come best match first unless ?ordering= is given.
+    """
+    search_param = api_settings.SEARCH_PARAM
+
+    def filter_queryset(self, request, queryset, view):
+        terms = search_terms(request.query_params.get(self.search_param, ""))
+        if not terms:
+            return queryset
+        ranked = not request.query_params.get(api_settings.ORDERING_PARAM)
+        return get_project_search().search(queryset, terms, ranked=ranked)
@@ -84,11 +84,8 @@ class ProfileForm(forms.ModelForm):
         skills_names = [s.strip() for s in skills_str.split(',') if s.strip()]
         if commit:
             profile.save()
-            # Update skills
-            profile.skills.clear()
-            for skill_name in skills_names:
-                skill, _ = Skill.objects.get_or_create(name=skill_name)
-                profile.skills.add(skill)
+            # Only the skills that changed are removed or added
+            profile.skills.set(Skill.objects.resolve(skills_names))
         return profile
 
 # -------------------------
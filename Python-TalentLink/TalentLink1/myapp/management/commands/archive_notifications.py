@@ -0,0 +1,79 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from myapp.cache import invalidate_dashboards
+from myapp.models import Notification, NotificationArchive
+
+
+class Command(BaseCommand):
+    help = "Move read notifications older than the retention window into the archive table, in small batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=None,
+            help="Retention window in days (default: NOTIFICATION_RETENTION_DAYS)",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0.0,
+            help="Seconds to pause between batches to leave room for live traffic",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Only report how many rows would move")
+
+    def archive_batch(self, cutoff, batch_size):
+        # Each batch is its own short transaction so locks are held briefly;
+        # rows a concurrent request already holds are left for the next run.
+        with transaction.atomic():
+            batch = list(
+                Notification.objects.select_for_update(skip_locked=True)
+                .filter(is_read=True, created_at__lt=cutoff)
+                .order_by("id")[:batch_size]
+            )
+            if not batch:
+                return 0
+            NotificationArchive.objects.bulk_create(
+                [
+                    NotificationArchive(
+                        user_id=n.user_id,
+                        message=n.message,
+                        is_read=n.is_read,
+                        created_at=n.created_at,
+                    )
+                    for n in batch
+                ]
+            )
+            # Only read rows move, so the unread counters are unaffected
+            Notification.objects.filter(id__in=[n.id for n in batch]).delete()
+        invalidate_dashboards(*{n.user_id for n in batch})
+        return len(batch)
+
+    def handle(self, *args, **options):
+        days = options["days"]
+        if days is None:
+            days = getattr(settings, "NOTIFICATION_RETENTION_DAYS", 90)
+        if days < 0 or options["batch_size"] < 1:
+            raise CommandError("--days must be >= 0 and --batch-size >= 1")
+        cutoff = timezone.now() - timedelta(days=days)
+
+        if options["dry_run"]:
+            count = Notification.objects.filter(is_read=True, created_at__lt=cutoff).count()
+            self.stdout.write(f"{count} notification(s) older than {days} days would be archived")
+            return
+
+        total = 0
+        while True:
+            moved = self.archive_batch(cutoff, options["batch_size"])
+            if not moved:
+                break
+            total += moved
+            if options["sleep"]:
+                time.sleep(options["sleep"])
+        self.stdout.write(self.style.SUCCESS(f"Archived {total} notification(s) older than {days} days"))
@@ -0,0 +1,157 @@
+import asyncio
+import gc
+import time
+import tracemalloc
+from importlib import import_module
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries
+from myapp.chat import chat_group, chat_socket
+from myapp.events import get_chat_layer
+from myapp.models import Contract
+
+
+class FakeSocket:
+    """
+    The ASGI side of one WebSocket, driven without a network server.
+    """
+
+    def __init__(self, path, headers):
+        self.scope = {"type": "websocket", "path": path, "headers": headers}
+        self.incoming = asyncio.Queue()
+        self.outgoing = asyncio.Queue()
+        self.incoming.put_nowait({"type": "websocket.connect"})
+
+    async def receive(self):
+        return await self.incoming.get()
+
+    async def send(self, event):
+        await self.outgoing.put(event)
+
+
+class Command(BaseCommand):
+    help = (
+        "Open many idle contract chat sockets in this process, then time one "
+        "broadcast to all of them. Without --url the ASGI handler is driven "
+        "directly; with --url real sockets go to a running ASGI server "
+        "(needs the websockets package and a high `ulimit -n`, and posts one "
+        "real message to the contract)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sockets", type=int, default=5000)
+        parser.add_argument("--contract", type=int, help="Contract id (default: first contract)")
+        parser.add_argument("--url", help="Server base URL, e.g. ws://127.0.0.1:8000")
+        parser.add_argument(
+            "--memory",
+            action="store_true",
+            help="Measure memory held per socket with tracemalloc (makes connecting much slower)",
+        )
+
+    def session_cookie(self, user):
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        return f"{settings.SESSION_COOKIE_NAME}={session.session_key}"
+
+    def handle(self, *args, **options):
+        contracts = Contract.objects.select_related("client__user").exclude(client=None)
+        if options["contract"]:
+            contracts = contracts.filter(id=options["contract"])
+        contract = contracts.order_by("id").first()
+        if contract is None:
+            raise CommandError("No contract to connect to; run seed_data first")
+
+        cookie = self.session_cookie(contract.client.user)
+        path = f"/ws/contract/{contract.id}/chat/"
+        if options["url"]:
+            result = asyncio.run(self.run_network(options["url"] + path, cookie, contract, options["sockets"]))
+        else:
+            result = asyncio.run(
+                self.run_in_process(path, cookie, contract, options["sockets"], options["memory"])
+            )
+
+        opened, connect_seconds, memory, fanout_seconds, idle_queries = result
+        self.stdout.write(f"Opened {opened} socket(s) on contract {contract.id} in {connect_seconds:.2f}s")
+        if memory is not None:
+            self.stdout.write(f"Memory held by idle sockets: {memory / 1024:.0f} KiB ({memory / max(opened, 1):.0f} B each)")
+        if idle_queries is not None:
+            self.stdout.write(f"Queries while idle: {idle_queries}")
+        self.stdout.write(self.style.SUCCESS(f"Broadcast reached all sockets in {fanout_seconds * 1000:.1f} ms"))
+
+    def start_counting_queries(self):
+        self.debug_cursor = connection.force_debug_cursor
+        connection.force_debug_cursor = True
+        reset_queries()
+
+    def stop_counting_queries(self):
+        connection.force_debug_cursor = self.debug_cursor
+        return len(connection.queries)
+
+    async def run_in_process(self, path, cookie, contract, count, measure_memory=False):
+        headers = [(b"cookie", cookie.encode()), (b"host", b"testserver")]
+        sockets = [FakeSocket(path, headers) for _ in range(count)]
+
+        memory = None
+        if measure_memory:
+            tracemalloc.start()
+            baseline = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        tasks = [asyncio.ensure_future(chat_socket(s.scope, s.receive, s.send)) for s in sockets]
+        for s in sockets:
+            event = await s.outgoing.get()
+            if event["type"] != "websocket.accept":
+                raise CommandError(f"Socket refused: {event}")
+        connect_seconds = time.perf_counter() - started
+        if measure_memory:
+            memory = tracemalloc.get_traced_memory()[0] - baseline
+            tracemalloc.stop()
+
+        # Settle the garbage left over from 5k handshakes so a full
+        # collection doesn't land inside the broadcast timing
+        gc.collect()
+
+        # Idle period: nothing should touch the database. ORM calls from
+        # async code all run on the one thread-sensitive executor thread,
+        # so that's the connection to watch.
+        await sync_to_async(self.start_counting_queries)()
+        await asyncio.sleep(1)
+        idle_queries = await sync_to_async(self.stop_counting_queries)()
+
+        started = time.perf_counter()
+        get_chat_layer().publish(chat_group(contract.id), {"id": 0, "content": "load test"})
+        for s in sockets:
+            await s.outgoing.get()
+        fanout_seconds = time.perf_counter() - started
+
+        for s in sockets:
+            s.incoming.put_nowait({"type": "websocket.disconnect", "code": 1000})
+        await asyncio.gather(*tasks)
+        return len(sockets), connect_seconds, memory, fanout_seconds, idle_queries
+
+    async def run_network(self, url, cookie, contract, count):
+        try:
+            from websockets.asyncio.client import connect
+        except ImportError:
+            raise CommandError("--url needs the websockets package")
+
+        started = time.perf_counter()
+        clients = await asyncio.gather(*(
+            connect(url, additional_headers={"Cookie": cookie}, open_timeout=60) for _ in range(count)
+        ))
+        connect_seconds = time.perf_counter() - started
+
+        await asyncio.sleep(1)
+        started = time.perf_counter()
+        # Post one message over the first socket; the server fans it out
+        await clients[0].send('{"content": "load test"}')
+        await asyncio.gather(*(client.recv() for client in clients))
+        fanout_seconds = time.perf_counter() - started
+
+        await asyncio.gather(*(client.close() for client in clients))
+        return len(clients), connect_seconds, None, fanout_seconds, None
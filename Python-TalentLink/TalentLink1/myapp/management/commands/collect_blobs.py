@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from myapp.models import Message, Profile, StoredBlob
+from myapp.storage import BLOB_GC_BATCH_SIZE, collect_orphaned_blobs, sweep_untracked_blobs
+from myapp.uploads import discard_stale_uploads
+
+
+def reference_count(model, field):
+    """
+    Number of model rows whose field points at the outer StoredBlob.
+    """
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef("name")})
+            .order_by()
+            .values(field)
+            .annotate(total=Count("id"))
+            .values("total")
+        ),
+        0,
+    )
+
+
+class Command(BaseCommand):
+    help = "Delete chat attachment and avatar blobs that nothing references any more, and abandoned chunked uploads"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=BLOB_GC_BATCH_SIZE)
+        parser.add_argument(
+            "--recount",
+            action="store_true",
+            help="First recompute reference counts from Message.file and Profile.avatar "
+                 "(catches changes made with .update() or raw SQL)",
+        )
+
+    def handle(self, *args, **options):
+        if options["recount"]:
+            actual = reference_count(Message, "file") + reference_count(Profile, "avatar")
+            drifted_ids = list(
+                StoredBlob.objects.annotate(actual=actual)
+                .exclude(ref_count=F("actual"))
+                .values_list("id", flat=True)
+            )
+            for start in range(0, len(drifted_ids), options["batch_size"]):
+                StoredBlob.objects.filter(
+                    id__in=drifted_ids[start:start + options["batch_size"]]
+                ).update(ref_count=actual)
+            self.stdout.write(f"Recounted {len(drifted_ids)} blob(s)")
+
+        stale = discard_stale_uploads()
+        if stale:
+            self.stdout.write(f"Discarded {stale} abandoned chunked upload(s)")
+
+        directories = [Message._meta.get_field("file").upload_to, Profile._meta.get_field("avatar").upload_to]
+        untracked = sweep_untracked_blobs(directories, batch_size=options["batch_size"])
+        if untracked:
+            self.stdout.write(f"Removed {untracked} untracked blob file(s) left by rolled-back saves")
+
+        removed = collect_orphaned_blobs(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Removed {removed} orphaned blob(s)"))
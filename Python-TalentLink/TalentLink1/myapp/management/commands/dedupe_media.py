@@ -0,0 +1,57 @@
+import os
+
+from django.core.management.base import BaseCommand
+from myapp.models import Message, Profile, StoredBlob
+from myapp.storage import blob_storage
+
+
+class Command(BaseCommand):
+    help = "Move chat attachments and avatars saved before the blob store into it, removing duplicate copies"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=200)
+
+    def legacy_rows(self, model, field, batch_size):
+        # Stored names that have no StoredBlob row were written by the
+        # old FileSystemStorage with a random suffix per upload.
+        last_id = 0
+        while True:
+            batch = list(
+                model.objects.filter(id__gt=last_id)
+                .exclude(**{f"{field}__in": StoredBlob.objects.values("name")})
+                .exclude(**{field: ""})
+                .exclude(**{f"{field}__isnull": True})
+                .order_by("id")[:batch_size]
+            )
+            if not batch:
+                return
+            last_id = batch[-1].id
+            yield from batch
+
+    def rehome(self, model, field, batch_size):
+        moved = missing = 0
+        for row in self.legacy_rows(model, field, batch_size):
+            old_name = getattr(row, field).name
+            if not blob_storage.exists(old_name):
+                missing += 1
+                self.stderr.write(f"Missing file for {model.__name__} {row.id}: {old_name}")
+                continue
+
+            with blob_storage.open(old_name) as content:
+                new_name = blob_storage.save(old_name, content)
+            updates = {field: new_name}
+            if model is Message and not row.file_name:
+                updates["file_name"] = os.path.basename(old_name)
+            model.objects.filter(id=row.id).update(**updates)
+
+            if not model.objects.filter(**{field: old_name}).exists():
+                blob_storage.delete(old_name)
+            moved += 1
+        return moved, missing
+
+    def handle(self, *args, **options):
+        for model, field in ((Message, "file"), (Profile, "avatar")):
+            moved, missing = self.rehome(model, field, options["batch_size"])
+            self.stdout.write(f"{model.__name__}.{field}: moved {moved}, missing {missing}")
+        blobs = StoredBlob.objects.count()
+        self.stdout.write(self.style.SUCCESS(f"{blobs} unique blob(s) in the store"))
@@ -0,0 +1,103 @@
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+from myapp.models import Profile, Skill
+from myapp.views import FreelancerViewSet
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Time /api/freelancers/ over synthetic freelancer profiles. "
+        "Everything runs in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--profiles", type=int, default=100_000)
+        parser.add_argument("--skills", type=int, default=300)
+        parser.add_argument("--per-profile", type=int, default=5)
+        parser.add_argument("--requests", type=int, default=50, help="Requests per query shape")
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        rng = random.Random(options["seed"])
+        started = time.perf_counter()
+        skills = Skill.objects.bulk_create([Skill(name=f"bench-skill-{i}") for i in range(options["skills"])])
+        users = User.objects.bulk_create(
+            [User(username=f"bench-freelancer-{i}", password="!") for i in range(options["profiles"])],
+            batch_size=2000,
+        )
+        locations = ["Pune", "Delhi", "Mumbai", "Chennai", "Remote", ""]
+        # bulk_create sends no post_save, so the profiles are made here
+        profiles = Profile.objects.bulk_create(
+            [
+                Profile(
+                    user=user,
+                    role="freelancer",
+                    hourly_rate=rng.randint(5, 150),
+                    availability=rng.random() < 0.7,
+                    location=rng.choice(locations),
+                    rating_count=rng.randint(0, 40),
+                    rating_average=round(rng.uniform(1, 5), 2),
+                )
+                for user in users
+            ],
+            batch_size=2000,
+        )
+        # Skill popularity is skewed, as in real listings
+        weights = [1 / rank for rank in range(1, len(skills) + 1)]
+        Profile.skills.through.objects.bulk_create(
+            [
+                Profile.skills.through(profile_id=profile.id, skill_id=skill.id)
+                for profile in profiles
+                for skill in set(rng.choices(skills, weights, k=options["per_profile"]))
+            ],
+            batch_size=5000,
+        )
+        self.stdout.write(f"Seeded {len(profiles)} freelancer(s) in {time.perf_counter() - started:.1f} s")
+
+        client = User.objects.create_user(username="bench-client")
+        view = FreelancerViewSet.as_view({"get": "list"})
+        factory = APIRequestFactory()
+
+        def skill_names(count):
+            return ",".join(skill.name for skill in rng.sample(skills, count))
+
+        shapes = {
+            "default ranking": lambda: {},
+            "available, rate range": lambda: {"available": "true", "min_rate": 20, "max_rate": 60},
+            "location": lambda: {"location": rng.choice(locations[:-1])},
+            "3 skills": lambda: {"skills": skill_names(3)},
+            "3 skills, rate range": lambda: {"skills": skill_names(3), "min_rate": 20, "max_rate": 60},
+        }
+        for label, params in shapes.items():
+            timings, cursor = [], None
+            for i in range(options["requests"]):
+                query = params() if cursor is None else {**query, "cursor": cursor}
+                request = factory.get("/api/freelancers/", query)
+                force_authenticate(request, client)
+                begun = time.perf_counter()
+                response = view(request)
+                timings.append((time.perf_counter() - begun) * 1000)
+                # Every other request follows the cursor to the next page
+                cursor = response.data["next_cursor"] if i % 2 == 0 else None
+            timings.sort()
+            self.stdout.write(
+                f"{label:>22}: median {timings[len(timings) // 2]:.1f} ms, "
+                f"p95 {timings[int(len(timings) * 0.95) - 1]:.1f} ms"
+            )
@@ -0,0 +1,63 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from django.db import connection
+from myapp.models import Project, Proposal, Contract, Review, Message, Notification
+
+
+class Command(BaseCommand):
+    help = "Print the query plan of every dashboard query so index usage can be checked (SQLite and PostgreSQL)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Username to build the queries for (default: first user)")
+        parser.add_argument(
+            "--analyze",
+            action="store_true",
+            help="PostgreSQL only: run EXPLAIN ANALYZE to show real timings",
+        )
+
+    def dashboard_queries(self, user):
+        profile = user.profile
+        contract = Contract.objects.filter(client=profile).first() or Contract.objects.first()
+        contract_id = contract.id if contract else 0
+
+        return [
+            ("client projects", Project.objects.filter(client=user).order_by("-created_at")),
+            ("project feed", Project.objects.order_by("-created_at", "-id")[:21]),
+            ("proposals by project/status", Proposal.objects.filter(project__client=user, status="pending")),
+            ("freelancer proposals", Proposal.objects.filter(freelancer=profile).order_by("-created_at")),
+            ("client contracts", Contract.objects.filter(client=profile, status="ACTIVE")),
+            ("freelancer contracts", Contract.objects.filter(freelancer=profile, status="ACTIVE")),
+            ("contract reviews", Review.objects.filter(project__client=user, reviewer_name=user.username)),
+            ("notification history", Notification.objects.filter(user=user).order_by("-created_at")),
+            ("unread notifications", Notification.objects.filter(user=user, is_read=False).order_by("-created_at")),
+            ("chat history", Message.objects.filter(contract_id=contract_id).order_by("timestamp")),
+        ]
+
+    def handle(self, *args, **options):
+        if options["user"]:
+            user = User.objects.filter(username=options["user"]).first()
+            if user is None:
+                raise CommandError(f"No user named {options['user']!r}")
+        else:
+            user = User.objects.order_by("id").first()
+            if user is None:
+                raise CommandError("No users yet; run seed_data first")
+
+        vendor = connection.vendor
+        explain_options = {}
+        if options["analyze"]:
+            if vendor != "postgresql":
+                raise CommandError("--analyze is only supported on PostgreSQL")
+            explain_options = {"analyze": True, "buffers": True}
+
+        self.stdout.write(f"Query plans on {vendor} for user {user.username}\n")
+
+        for name, queryset in self.dashboard_queries(user):
+            plan = queryset.explain(**explain_options)
+            # SQLite says "SCAN <table>" and PostgreSQL "Seq Scan" when no index is used
+            full_scan = "Seq Scan" in plan or bool(re.search(r"\bSCAN\b(?!.*\bUSING\b)", plan))
+            style = self.style.WARNING if full_scan else self.style.SUCCESS
+            self.stdout.write(style(f"== {name}{' (full scan)' if full_scan else ''}"))
+            self.stdout.write(plan + "\n")
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from myapp.models import Message, Profile
+from myapp.thumbnails import generate_derivatives
+
+
+class Command(BaseCommand):
+    help = (
+        "Render missing avatar and chat image thumbnails in this process "
+        "(uploads queue their own; this backfills older files)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        sources = [
+            ("avatar", Profile.objects.exclude(avatar="").exclude(avatar=None).values_list("avatar", flat=True)),
+            ("chat", Message.objects.exclude(file="").exclude(file=None).values_list("file", flat=True)),
+        ]
+        written = 0
+        for preset, names in sources:
+            # Identical uploads share one blob, and so one set of thumbnails
+            for name in names.order_by().distinct().iterator(chunk_size=options["batch_size"]):
+                if preset == "chat" and not Message(file=name).is_image:
+                    continue
+                written += generate_derivatives(name, preset)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} thumbnail(s)"))
@@ -0,0 +1,59 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from myapp.matching import SkillMatcher
+
+
+class Command(BaseCommand):
+    help = (
+        "Time SkillMatcher.match over synthetic projects held in memory "
+        "(nothing is read from or written to the database)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--projects", type=int, default=200_000)
+        parser.add_argument("--skills", type=int, default=500, help="Size of the skill vocabulary")
+        parser.add_argument("--per-project", type=int, default=5, help="Skills each project needs")
+        parser.add_argument("--per-freelancer", type=int, default=8, help="Skills each freelancer has")
+        parser.add_argument("--k", type=int, default=20)
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        skills = range(1, options["skills"] + 1)
+        # Skill popularity is skewed, as in real listings
+        popularity = [1 / rank for rank in range(1, options["skills"] + 1)]
+        today = timezone.localdate()
+
+        matcher = SkillMatcher()
+        matcher.expire(today)
+        started = time.perf_counter()
+        for project_id in range(1, options["projects"] + 1):
+            matcher.add(
+                project_id,
+                rng.choices(skills, popularity, k=options["per_project"]),
+                budget=rng.choice([None, 50, 500, 5000, 50000]),
+                deadline=rng.choice([None, today + timedelta(days=rng.randint(0, 90))]),
+            )
+        self.stdout.write(
+            f"Indexed {len(matcher)} project(s) in {time.perf_counter() - started:.1f} s"
+        )
+
+        timings = []
+        for _ in range(options["queries"]):
+            freelancer = rng.choices(skills, popularity, k=options["per_freelancer"])
+            started = time.perf_counter()
+            matcher.match(freelancer, options["k"])
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        self.stdout.write(
+            f"match(k={options['k']}) over {options['queries']} freelancer(s): "
+            f"median {statistics.median(timings):.2f} ms, "
+            f"p95 {timings[int(len(timings) * 0.95) - 1]:.2f} ms, "
+            f"max {timings[-1]:.2f} ms"
+        )
@@ -0,0 +1,107 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from myapp.models import Contract, Message, Notification, Project, Proposal
+from myapp.utils import chat_notification_text, mark_notifications_read, notify_chat_message
+
+
+class Rollback(Exception):
+    pass
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulate chat traffic and compare notification table growth with "
+        "per-contract coalescing against one notification per message. "
+        "Everything runs in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--contracts", type=int, default=20)
+        parser.add_argument("--messages", type=int, default=200, help="Messages per contract")
+        parser.add_argument("--burst", type=int, default=10, help="Messages one side sends before the other replies")
+        parser.add_argument(
+            "--read-every",
+            type=int,
+            default=50,
+            help="The receiver reads their notifications after this many messages (0: never)",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{options['contracts']} contract(s) x {options['messages']} message(s), "
+            f"bursts of {options['burst']}, reads every {options['read_every'] or 'never'}"
+        )
+        for label, send in (("per message", self.send_per_message), ("coalesced", self.send_coalesced)):
+            rows, queries, seconds, messages = self.simulate(send, options)
+            self.stdout.write(
+                f"{label:>12}: {rows} notification row(s) for {messages} message(s) "
+                f"({rows / messages:.3f} per message), {queries / messages:.1f} queries per message, "
+                f"{seconds * 1000 / messages:.2f} ms per message"
+            )
+
+    def send_per_message(self, contract, sender, receiver, content):
+        # What send_message did before coalescing
+        Message.objects.create(contract=contract, sender=sender, content=content)
+        Notification.objects.create(
+            user=receiver.user, message=chat_notification_text(sender.user.username, contract.id)
+        )
+
+    def send_coalesced(self, contract, sender, receiver, content):
+        # post_chat_message minus rendering and publishing the message
+        Message.objects.create(contract=contract, sender=sender, content=content)
+        notify_chat_message(receiver.user, contract, sender.user.username)
+
+    def simulate(self, send, options):
+        result = None
+        try:
+            with transaction.atomic():
+                contracts = self.make_contracts(options["contracts"])
+                rows_before = Notification.objects.count()
+                counter = QueryCounter()
+                sent = 0
+                started = time.perf_counter()
+                with connection.execute_wrapper(counter):
+                    for contract in contracts:
+                        parties = (contract.client, contract.freelancer)
+                        for i in range(options["messages"]):
+                            sender = parties[(i // max(options["burst"], 1)) % 2]
+                            receiver = parties[1] if sender is parties[0] else parties[0]
+                            send(contract, sender, receiver, f"message {i}")
+                            sent += 1
+                            if options["read_every"] and (i + 1) % options["read_every"] == 0:
+                                for party in parties:
+                                    mark_notifications_read(party.user)
+                seconds = time.perf_counter() - started
+                rows = Notification.objects.count() - rows_before
+                result = rows, counter.count, seconds, sent
+                raise Rollback
+        except Rollback:
+            pass
+        return result
+
+    def make_contracts(self, count):
+        contracts = []
+        for i in range(count):
+            client = User.objects.create_user(username=f"growth-client-{i}")
+            freelancer = User.objects.create_user(username=f"growth-freelancer-{i}")
+            freelancer.profile.role = "freelancer"
+            freelancer.profile.save()
+            project = Project.objects.create(client=client, title=f"Growth {i}", description="benchmark")
+            proposal = Proposal.objects.create(project=project, freelancer=freelancer.profile)
+            contracts.append(Contract.objects.create(
+                project=project, proposal=proposal,
+                client=client.profile, freelancer=freelancer.profile, status="ACTIVE",
+            ))
+        return contracts
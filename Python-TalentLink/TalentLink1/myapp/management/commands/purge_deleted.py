@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+from myapp.purge import PURGE_BATCH_SIZE, purge_cleared_chats, purge_deleted_projects
+
+
+class Command(BaseCommand):
+    help = (
+        "Remove cleared chat messages and deleted projects in small batches, "
+        "releasing their attachment files"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=PURGE_BATCH_SIZE)
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0.0,
+            help="Seconds to pause between batches to leave room for live traffic",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running, looking for new tombstones every --interval seconds",
+        )
+        parser.add_argument("--interval", type=float, default=30.0)
+
+    def handle(self, *args, **options):
+        while True:
+            messages = purge_cleared_chats(options["batch_size"], options["sleep"])
+            projects, project_messages = purge_deleted_projects(options["batch_size"], options["sleep"])
+            if messages or projects or not options["loop"]:
+                self.stdout.write(
+                    f"Purged {messages} cleared message(s) and {projects} deleted project(s) "
+                    f"with {project_messages} message(s)"
+                )
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
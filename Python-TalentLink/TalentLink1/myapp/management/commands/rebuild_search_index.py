@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from myapp.search import get_project_search
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the project search index from the project table. Saves and "
+        "deletes keep it in sync; this catches bulk updates and raw SQL."
+    )
+
+    def handle(self, *args, **options):
+        backend = get_project_search()
+        indexed = backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {indexed} project(s) with {type(backend).__name__}"
+        ))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+from myapp.models import Profile
+from myapp.utils import unread_count_subquery
+
+
+class Command(BaseCommand):
+    help = "Recompute every profile's unread notification counter from the Notification table"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Only repair this username")
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report how many counters are wrong without fixing them",
+        )
+
+    def handle(self, *args, **options):
+        profiles = Profile.objects.all()
+        if options["user"]:
+            profiles = profiles.filter(user__username=options["user"])
+
+        # One UPDATE ... SET = (subquery) for just the rows that drifted
+        drifted = profiles.annotate(actual=unread_count_subquery()).exclude(
+            unread_notifications=F("actual")
+        )
+        drifted_ids = list(drifted.values_list("id", flat=True))
+
+        if options["dry_run"]:
+            self.stdout.write(f"{len(drifted_ids)} counter(s) out of date")
+            return
+
+        fixed = Profile.objects.filter(id__in=drifted_ids).update(
+            unread_notifications=unread_count_subquery()
+        )
+        self.stdout.write(self.style.SUCCESS(f"Repaired {fixed} unread notification counter(s)"))
@@ -0,0 +1,130 @@
+import time
+from datetime import timedelta
+
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from myapp.models import OutboxEmail
+
+MAX_ATTEMPTS = 5
+# A batch claimed this long ago by a worker that died is picked up again
+STALE_CLAIM = timedelta(minutes=10)
+# A failed email waits RETRY_DELAY, then twice as long after each further
+# failure, up to MAX_RETRY_DELAY
+RETRY_DELAY = timedelta(seconds=30)
+MAX_RETRY_DELAY = timedelta(hours=1)
+
+
+def retry_delay(attempts):
+    return min(RETRY_DELAY * 2 ** max(attempts - 1, 0), MAX_RETRY_DELAY)
+
+
+class MailServerDown(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Send queued OutboxEmail rows in batches over one reused SMTP connection"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running, polling the outbox every --interval seconds",
+        )
+        parser.add_argument("--interval", type=float, default=5.0)
+
+    def claim_batch(self, batch_size):
+        now = timezone.now()
+        with transaction.atomic():
+            ids = list(
+                OutboxEmail.objects.select_for_update(skip_locked=True)
+                .filter(
+                    Q(status="pending", next_attempt_at__isnull=True)
+                    | Q(status="pending", next_attempt_at__lte=now)
+                    | Q(status="sending", claimed_at__lt=now - STALE_CLAIM)
+                )
+                .order_by("id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            OutboxEmail.objects.filter(id__in=ids).update(status="sending", claimed_at=now)
+        return list(OutboxEmail.objects.filter(id__in=ids).order_by("id"))
+
+    def retry_later(self, emails, error):
+        """
+        Puts emails back in the queue after an SMTP connection failure,
+        each waiting as it would after its last failed attempt.
+        """
+        now = timezone.now()
+        by_attempts = {}
+        for email in emails:
+            by_attempts.setdefault(email.attempts, []).append(email.id)
+        for attempts, ids in by_attempts.items():
+            OutboxEmail.objects.filter(id__in=ids).update(
+                status="pending", next_attempt_at=now + retry_delay(attempts), last_error=str(error)[:1000]
+            )
+
+    def send_batch(self, emails):
+        sent = failed = 0
+        connection = get_connection()
+        try:
+            connection.open()
+        except Exception as exc:
+            # Nothing was tried: the batch waits without using an attempt
+            self.retry_later(emails, exc)
+            raise MailServerDown(exc) from exc
+        # One connection (one SMTP login) for the whole batch
+        with connection:
+            for email in emails:
+                message = EmailMessage(
+                    subject=email.subject,
+                    body=email.body,
+                    from_email=email.from_email or None,
+                    to=[email.recipient],
+                    connection=connection,
+                )
+                try:
+                    connection.send_messages([message])
+                except Exception as exc:
+                    failed += 1
+                    attempts = email.attempts + 1
+                    OutboxEmail.objects.filter(id=email.id).update(
+                        status="failed" if attempts >= MAX_ATTEMPTS else "pending",
+                        attempts=attempts,
+                        last_error=str(exc)[:1000],
+                        next_attempt_at=timezone.now() + retry_delay(attempts),
+                    )
+                else:
+                    sent += 1
+                    OutboxEmail.objects.filter(id=email.id).update(
+                        status="sent", attempts=email.attempts + 1, sent_at=timezone.now()
+                    )
+        return sent, failed
+
+    def drain(self, batch_size):
+        total_sent = total_failed = 0
+        while True:
+            emails = self.claim_batch(batch_size)
+            if not emails:
+                return total_sent, total_failed
+            try:
+                sent, failed = self.send_batch(emails)
+            except MailServerDown as exc:
+                # The rest of the outbox would fail the same way; a --loop
+                # worker carries on at its next poll
+                self.stderr.write(f"Mail server unavailable: {exc}")
+                return total_sent, total_failed
+            total_sent += sent
+            total_failed += failed
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = self.drain(options["batch_size"])
+            if sent or failed:
+                self.stdout.write(f"Sent {sent} email(s), {failed} failed")
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,322 @@
+# myapp/matching.py
+import heapq
+import math
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from bitarray import bitarray
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Project
+
+# Budget bucket boundaries; the bucket number (0-3) ranks projects that
+# match a freelancer equally well.
+BUDGET_BUCKETS = (100, 1000, 10000)
+BUDGET_BITS = 2
+# Rarer skills count for more, up to this weight
+MAX_SKILL_WEIGHT = 8
+# Changes committed just before a sync may carry a slightly older
+# updated_at; they are picked up again rather than missed.
+SYNC_OVERLAP = timedelta(seconds=2)
+
+
+def budget_bucket(budget):
+    if budget is None:
+        return 0
+    return sum(budget >= bound for bound in BUDGET_BUCKETS)
+
+
+def _zeros(length):
+    bits = bitarray(length)
+    bits.setall(0)
+    return bits
+
+
+def _add_weighted(planes, bits, weight):
+    """
+    Adds weight to every slot set in bits, on a counter stored bit-sliced
+    in planes (planes[i] holds bit i of every slot's count).
+    """
+    for shift in range(weight.bit_length()):
+        if not weight >> shift & 1:
+            continue
+        while len(planes) < shift:
+            planes.append(_zeros(len(bits)))
+        carry, i = bits, shift
+        while carry.any():
+            if i == len(planes):
+                planes.append(carry.copy())
+                break
+            plane = planes[i]
+            planes[i] = plane ^ carry
+            carry = plane & carry
+            i += 1
+
+
+def _top_slots(planes, candidates, k):
+    """
+    (winners, ties): slots among candidates with one of the k highest
+    values of the bit-sliced counter planes, read from the high bit down.
+    Every winner outranks every tie; the ties share the k-th value and
+    may be more than the places left.
+    """
+    winners = _zeros(len(candidates))
+    equal = candidates
+    for plane in reversed(planes):
+        above = winners | (equal & plane)
+        count = above.count()
+        if count > k:
+            equal = equal & plane
+        elif count == k:
+            return above, _zeros(len(candidates))
+        else:
+            winners = above
+            equal = equal & ~plane
+    return winners, equal
+
+
+class SkillMatcher:
+    """
+    Ranks open projects for a freelancer by the overlap between their
+    skills and the project's, weighted towards rarer skills, then by
+    budget and, among equals, by the nearest deadline.
+
+    Each project is given a slot. postings maps a skill id to a bitarray
+    over the slots of the projects needing it (the inverted index), and
+    every project keeps its own skills as a bitarray over the skill
+    vocabulary. A match adds up the freelancer's postings bit-sliced,
+    a bitarray per bit of the score, and walks those from the top bit to
+    find the best k: a few hundred whole-bitarray operations, so the cost
+    barely grows with the number of projects.
+
+    One instance lives in each process (get_skill_matcher). Changes made
+    in the process reach it through myapp.signals at once, and those of
+    other processes through sync(), by Project.updated_at.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.capacity = 0
+        self.live = bitarray()
+        self.budget_planes = [bitarray() for _ in range(BUDGET_BITS)]
+        self.postings = {}
+        self.slot_of = {}
+        self.project_at = []
+        self.deadline_at = []
+        self.skills_at = []
+        self.free_slots = []
+        self.skill_bit = {}
+        self.skill_ids = []
+        self.expired_before = 0
+        self.synced_at = None
+        self.synced_clock = 0.0
+
+    # ---------------- Index maintenance ----------------
+    def _grow(self):
+        extra = max(1024, self.capacity)
+        padding = _zeros(extra)
+        self.live.extend(padding)
+        for plane in self.budget_planes:
+            plane.extend(padding)
+        for posting in self.postings.values():
+            posting.extend(padding)
+        self.project_at.extend([None] * extra)
+        self.deadline_at.extend([0] * extra)
+        self.skills_at.extend([None] * extra)
+        self.free_slots.extend(range(self.capacity + extra - 1, self.capacity - 1, -1))
+        self.capacity += extra
+
+    def _posting(self, skill_id):
+        posting = self.postings.get(skill_id)
+        if posting is None:
+            posting = self.postings[skill_id] = _zeros(self.capacity)
+            self.skill_bit[skill_id] = len(self.skill_ids)
+            self.skill_ids.append(skill_id)
+        return posting
+
+    def add(self, project_id, skill_ids, budget=None, deadline=None):
+        """
+        Indexes a project, replacing what was indexed for it before.
+        """
+        with self.lock:
+            self.remove(project_id)
+            if deadline is not None and deadline.toordinal() < self.expired_before:
+                return
+            if not self.free_slots:
+                self._grow()
+            slot = self.free_slots.pop()
+            self.slot_of[project_id] = slot
+            self.project_at[slot] = project_id
+            self.deadline_at[slot] = deadline.toordinal() if deadline else 0
+            self.live[slot] = 1
+            bucket = budget_bucket(budget)
+            for i, plane in enumerate(self.budget_planes):
+                plane[slot] = bucket >> i & 1
+
+            for skill_id in set(skill_ids):
+                self._posting(skill_id)[slot] = 1
+            skills = _zeros(len(self.skill_ids))
+            for skill_id in skill_ids:
+                skills[self.skill_bit[skill_id]] = 1
+            self.skills_at[slot] = skills
+
+    def remove(self, project_id):
+        with self.lock:
+            slot = self.slot_of.pop(project_id, None)
+            if slot is None:
+                return
+            for bit in self.skills_at[slot].search(1):
+                self.postings[self.skill_ids[bit]][slot] = 0
+            self.live[slot] = 0
+            for plane in self.budget_planes:
+                plane[slot] = 0
+            self.project_at[slot] = None
+            self.deadline_at[slot] = 0
+            self.skills_at[slot] = None
+            self.free_slots.append(slot)
+
+    def expire(self, today):
+        """
+        Drops projects whose deadline is before today. Runs at most once a
+        day per process, from match().
+        """
+        cutoff = today.toordinal()
+        with self.lock:
+            if cutoff <= self.expired_before:
+                return
+            self.expired_before = cutoff
+            expired = [
+                self.project_at[slot]
+                for slot, ordinal in enumerate(self.deadline_at)
+                if 0 < ordinal < cutoff
+            ]
+            for project_id in expired:
+                self.remove(project_id)
+
+    def __len__(self):
+        return len(self.slot_of)
+
+    # ---------------- Loading from the database ----------------
+    def index_projects(self, projects):
+        """
+        Re-reads the given projects (a queryset over all_objects, so
+        tombstones are dropped) into the index.
+        """
+        rows = list(projects.values_list("id", "budget", "deadline", "deleted_at"))
+        skills = defaultdict(list)
+        through = Project.skills_required.through.objects
+        ids = [row[0] for row in rows]
+        for start in range(0, len(ids), 10000):
+            for project_id, skill_id in through.filter(project_id__in=ids[start:start + 10000]).values_list(
+                "project_id", "skill_id"
+            ):
+                skills[project_id].append(skill_id)
+        for project_id, budget, deadline, deleted_at in rows:
+            if deleted_at is None:
+                self.add(project_id, skills[project_id], budget, deadline)
+            else:
+                self.remove(project_id)
+
+    def load(self):
+        """
+        Indexes every open project: two queries per 10,000 projects.
+        """
+        today = timezone.localdate()
+        with self.lock:
+            self.synced_at, self.synced_clock = timezone.now(), time.monotonic()
+            self.expired_before = today.toordinal()
+            self.index_projects(Project.objects.filter(Q(deadline__isnull=True) | Q(deadline__gte=today)))
+
+    def sync(self):
+        """
+        Picks up projects saved, retagged or deleted since the last load or
+        sync, including by other processes.
+        """
+        with self.lock:
+            since, now = self.synced_at, timezone.now()
+            self.synced_at, self.synced_clock = now, time.monotonic()
+            self.index_projects(Project.all_objects.filter(updated_at__gt=since - SYNC_OVERLAP))
+
+    # ---------------- Matching ----------------
+    def match(self, skill_ids, k=10):
+        """
+        The k best open projects for someone with skill_ids, best first, as
+        (project_id, score) pairs. Scores only order results.
+        """
+        interval = getattr(settings, "SKILL_MATCHER_SYNC_INTERVAL", 5)
+        if self.synced_at is not None and time.monotonic() - self.synced_clock >= interval:
+            self.sync()
+        self.expire(timezone.localdate())
+
+        with self.lock:
+            postings = [self.postings[s] for s in set(skill_ids) if s in self.postings]
+            if not postings or k <= 0:
+                return []
+            projects = len(self.slot_of)
+            candidates = _zeros(self.capacity)
+            overlap = []
+            for posting in postings:
+                with_skill = posting.count()
+                if not with_skill:
+                    continue
+                candidates |= posting
+                weight = min(MAX_SKILL_WEIGHT, 1 + int(math.log2(projects / with_skill)))
+                _add_weighted(overlap, posting, weight)
+            candidates &= self.live
+            # Budget sits in the bits below the overlap: it only decides
+            # between projects matching equally well
+            planes = self.budget_planes + overlap
+            winners, ties = _top_slots(planes, candidates, k)
+
+            def score(slot):
+                return sum(plane[slot] << i for i, plane in enumerate(planes))
+
+            def nearest_deadline(slot):
+                return self.deadline_at[slot] or math.inf, -self.project_at[slot]
+
+            slots = sorted(winners.search(1), key=lambda slot: (-score(slot),) + nearest_deadline(slot))
+            if ties.any():
+                slots += heapq.nsmallest(k - len(slots), ties.search(1), key=nearest_deadline)
+            return [(self.project_at[slot], score(slot)) for slot in slots]
+
+
+_matcher = None
+_matcher_lock = threading.Lock()
+
+
+def get_skill_matcher():
+    """
+    This process's matcher, loaded from the database on first use.
+    """
+    global _matcher
+    if _matcher is None:
+        with _matcher_lock:
+            if _matcher is None:
+                matcher = SkillMatcher()
+                matcher.load()
+                _matcher = matcher
+    return _matcher
+
+
+def loaded_skill_matcher():
+    """
+    The matcher if this process has loaded one; signals update it only
+    then, since a first load reads the current state anyway.
+    """
+    return _matcher
+
+
+def matched_projects(profile, k=10):
+    """
+    The k open projects best matching profile's skills, best first.
+    """
+    skill_ids = list(profile.skills.values_list("id", flat=True))
+    if not skill_ids:
+        return []
+    ranked = get_skill_matcher().match(skill_ids, k)
+    by_id = Project.objects.select_related("client").in_bulk([project_id for project_id, _ in ranked])
+    return [by_id[project_id] for project_id, _ in ranked if project_id in by_id]
@@ -0,0 +1,80 @@
+# Generated by Django 5.2.10 on 2026-10-18 08:40
+
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+FTS_TABLE = 'myapp_message_fts'
+
+SQLITE_FORWARD = [
+    f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        content, file_name, contract_id,
+        content='myapp_message', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON myapp_message BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, content, file_name, contract_id)
+        VALUES (new.id, new.content, new.file_name, new.contract_id);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON myapp_message BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content, file_name, contract_id)
+        VALUES ('delete', old.id, old.content, old.file_name, old.contract_id);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF content, file_name ON myapp_message BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content, file_name, contract_id)
+        VALUES ('delete', old.id, old.content, old.file_name, old.contract_id);
+        INSERT INTO {FTS_TABLE}(rowid, content, file_name, contract_id)
+        VALUES (new.id, new.content, new.file_name, new.contract_id);
+    END
+    """,
+    # Index the messages that already exist
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARD = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+
+# Same expression as myapp.search.MESSAGE_SEARCH_VECTOR
+POSTGRES_INDEX = GinIndex(
+    SearchVector('content', 'file_name', config='english'),
+    name='message_search_idx',
+)
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in SQLITE_FORWARD:
+            schema_editor.execute(sql)
+    elif schema_editor.connection.vendor == 'postgresql':
+        schema_editor.add_index(apps.get_model('myapp', 'Message'), POSTGRES_INDEX)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in SQLITE_BACKWARD:
+            schema_editor.execute(sql)
+    elif schema_editor.connection.vendor == 'postgresql':
+        schema_editor.remove_index(apps.get_model('myapp', 'Message'), POSTGRES_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0011_soft_delete'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.10 on 2026-10-18 08:33
+
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_pointers(apps, schema_editor):
+    # Start with everything read, rather than every old chat lighting up
+    Contract = apps.get_model('myapp', 'Contract')
+    Message = apps.get_model('myapp', 'Message')
+    newest = Coalesce(
+        Subquery(
+            Message.objects.filter(contract_id=OuterRef('id'))
+            .values('contract_id')
+            .annotate(newest=Max('id'))
+            .values('newest')
+        ),
+        0,
+    )
+    Contract.objects.update(last_message_id=newest)
+    Contract.objects.update(
+        client_last_read_id=models.F('last_message_id'),
+        freelancer_last_read_id=models.F('last_message_id'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0013_coalesced_chat_notifications'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contract',
+            name='client_last_read_id',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='contract',
+            name='freelancer_last_read_id',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='contract',
+            name='last_message_id',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['contract', 'id'], name='message_contract_id_idx'),
+        ),
+        migrations.RunPython(backfill_pointers, migrations.RunPython.noop),
+    ]
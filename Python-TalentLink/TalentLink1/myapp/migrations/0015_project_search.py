@@ -0,0 +1,63 @@
+# Generated by Django 5.2.10 on 2026-10-18 10:12
+
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+FTS_TABLE = 'myapp_project_fts'
+
+# Unlike the message index this table keeps its own copy of the text:
+# myapp.signals re-indexes a project from the saved instance, without
+# needing the old values an external-content table would.
+SQLITE_FORWARD = [
+    f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        title, description,
+        prefix='2 3',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    INSERT INTO {FTS_TABLE}(rowid, title, description)
+    SELECT id, title, description FROM myapp_project WHERE deleted_at IS NULL
+    """,
+]
+
+SQLITE_BACKWARD = [
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+
+# Same expression as myapp.search.PROJECT_SEARCH_VECTOR
+POSTGRES_INDEX = GinIndex(
+    SearchVector('title', weight='A', config='english')
+    + SearchVector('description', weight='B', config='english'),
+    name='project_search_idx',
+)
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in SQLITE_FORWARD:
+            schema_editor.execute(sql)
+    elif schema_editor.connection.vendor == 'postgresql':
+        schema_editor.add_index(apps.get_model('myapp', 'Project'), POSTGRES_INDEX)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in SQLITE_BACKWARD:
+            schema_editor.execute(sql)
+    elif schema_editor.connection.vendor == 'postgresql':
+        schema_editor.remove_index(apps.get_model('myapp', 'Project'), POSTGRES_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0014_chat_read_pointers'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.10 on 2026-10-18 08:55
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Avg, Count, DecimalField, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Round
+
+# Skill searches count the matching rows per freelancer straight from this
+# index, without reading the join table itself. The auto-created through
+# model can't declare indexes, hence the SQL.
+SKILL_PROFILE_INDEX = 'profile_skills_skill_profile_idx'
+
+
+def backfill_ratings(apps, schema_editor):
+    # Same aggregates as myapp.utils.refresh_freelancer_ratings
+    Profile = apps.get_model('myapp', 'Profile')
+    Review = apps.get_model('myapp', 'Review')
+
+    def rating(aggregate):
+        reviews = (
+            Review.objects.filter(
+                project__contract__freelancer=OuterRef('pk'),
+                reviewer_name=F('project__contract__client__user__username'),
+            )
+            .order_by()
+            .values('project__contract__freelancer')
+            .annotate(value=aggregate)
+            .values('value')
+        )
+        return Coalesce(Subquery(reviews), Value(0), output_field=DecimalField())
+
+    Profile.objects.filter(role='freelancer').update(
+        rating_count=rating(Count('id')),
+        rating_average=rating(Round(Avg('rating'), 2)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0016_project_updated_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='rating_average',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=3),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(condition=models.Q(('role', 'freelancer')), fields=['-availability', '-rating_average', '-id', 'hourly_rate'], name='freelancer_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(django.db.models.functions.text.Lower('location'), models.OrderBy(models.F('availability'), descending=True), models.OrderBy(models.F('rating_average'), descending=True), models.OrderBy(models.F('id'), descending=True), condition=models.Q(('role', 'freelancer')), name='freelancer_location_idx'),
+        ),
+        migrations.RunSQL(
+            f'CREATE INDEX {SKILL_PROFILE_INDEX} ON myapp_profile_skills (skill_id, profile_id)',
+            f'DROP INDEX {SKILL_PROFILE_INDEX}',
+        ),
+        migrations.RunPython(backfill_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.10 on 2026-10-18 09:01
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+def merge_duplicate_skills(apps, schema_editor):
+    """
+    Folds skills that only differ by case or whitespace into the oldest
+    one, moving their profile and project links over, then stores the
+    survivors' names trimmed.
+    """
+    Skill = apps.get_model('myapp', 'Skill')
+    Profile = apps.get_model('myapp', 'Profile')
+    Project = apps.get_model('myapp', 'Project')
+    links = [
+        (Profile.skills.through, 'profile_id'),
+        (Project.skills_required.through, 'project_id'),
+    ]
+
+    canonical = {}
+    for skill in Skill.objects.order_by('id'):
+        name = ' '.join(skill.name.split())[:100]
+        keeper = canonical.setdefault(name.lower(), skill)
+        if keeper is skill:
+            if skill.name != name:
+                Skill.objects.filter(id=skill.id).update(name=name)
+            continue
+        for through, owner in links:
+            linked = through.objects.filter(skill_id=keeper.id).values(owner)
+            # Owners already linked to the keeper just lose the duplicate
+            through.objects.filter(skill_id=skill.id, **{f'{owner}__in': linked}).delete()
+            through.objects.filter(skill_id=skill.id).update(skill_id=keeper.id)
+        skill.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0017_freelancer_discovery'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_skills, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='skill',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('name'), name='skill_name_ci_unique'),
+        ),
+    ]
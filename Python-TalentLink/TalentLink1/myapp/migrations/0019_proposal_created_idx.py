@@ -0,0 +1,17 @@
+# Generated by Django 5.2.10 on 2026-10-18 09:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0018_canonical_skills'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='proposal',
+            index=models.Index(fields=['-created_at', '-id'], name='proposal_created_idx'),
+        ),
+    ]
@@ -1,15 +1,83 @@
+import uuid
+
 from django.db import models
 from django.conf import settings
+from django.db.models import F
+from django.db.models.functions import Lower
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
+from .storage import blob_storage
+
+class LiveManager(models.Manager):
+    """
+    Default manager for models with a deleted_at tombstone: rows waiting
+    for the purger (see myapp.purge) are left out. all_objects sees them.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 # ---------------- Skills ----------------
+class SkillQuerySet(models.QuerySet):
+    def resolve(self, names):
+        """
+        The canonical Skill of each name (deduplicated, in first-seen
+        order), creating the missing ones: a lookup, one INSERT that skips
+        the rows a concurrent request created first, and a re-read of
+        those, whatever the number of names.
+        """
+        wanted = {}
+        for name in names:
+            name = Skill.canonical(name)
+            if name:
+                wanted.setdefault(name.lower(), name)
+        if not wanted:
+            return []
+
+        def lookup():
+            # name__in also finds non-ASCII names that the database's
+            # LOWER() leaves alone
+            rows = self.alias(key=Lower("name")).filter(
+                models.Q(key__in=wanted) | models.Q(name__in=wanted.values())
+            )
+            return {skill.name.lower(): skill for skill in rows}
+
+        found = lookup()
+        missing = [name for key, name in wanted.items() if key not in found]
+        if missing:
+            self.bulk_create([Skill(name=name) for name in missing], ignore_conflicts=True)
+            found = lookup()
+        return [found[key] for key in wanted if key in found]
+
+
 class Skill(models.Model):
     name = models.CharField(max_length=100)
 
+    objects = SkillQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # One row per skill whatever the case: "Python" is "python"
+            models.UniqueConstraint(Lower('name'), name='skill_name_ci_unique'),
+        ]
+
     def __str__(self):
         return self.name
 
+    @staticmethod
+    def canonical(name):
+        """
+        name as stored: trimmed, inner whitespace collapsed, and cut to
+        the column length.
+        """
+        return " ".join(name.split())[:100]
+
+    def save(self, *args, **kwargs):
+        self.name = self.canonical(self.name)
+        super().save(*args, **kwargs)
+
 
 # ---------------- Profile ----------------
 class Profile(models.Model):
@@ -27,7 +95,44 @@ class Profile(models.Model):
     hourly_rate = models.DecimalField(max_digits=8, decimal_places=2, blank=True, null=True)
     availability = models.BooleanField(default=True)
     location = models.CharField(max_length=255, blank=True)
-    avatar = models.ImageField(upload_to='avatars/', blank=True, null=True)
+    avatar = models.ImageField(upload_to='avatars/', storage=blob_storage, blank=True, null=True)
+
+    # Denormalized counters, maintained with F() updates (see myapp.utils).
+    # A plain save() never writes them, so a stale in-memory profile
+    # can't overwrite a concurrent increment.
+    unread_notifications = models.PositiveIntegerField(default=0)
+    # Reviews of this freelancer, recomputed whenever one changes
+    # (myapp.utils.refresh_freelancer_ratings)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_average = models.DecimalField(max_digits=3, decimal_places=2, default=0)
+
+    COUNTER_FIELDS = ('unread_notifications', 'rating_count', 'rating_average')
+
+    class Meta:
+        indexes = [
+            # Freelancer discovery (/api/freelancers/): the ranking is read
+            # off this index and hourly_rate filtered from it. Partial, so
+            # a skill search is still driven from the skills table (see
+            # migration 0017) rather than by walking every freelancer.
+            models.Index(
+                fields=['-availability', '-rating_average', '-id', 'hourly_rate'],
+                condition=models.Q(role='freelancer'),
+                name='freelancer_rank_idx',
+            ),
+            models.Index(
+                Lower('location'), F('availability').desc(), F('rating_average').desc(), F('id').desc(),
+                condition=models.Q(role='freelancer'),
+                name='freelancer_location_idx',
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.user.username
@@ -54,6 +159,22 @@ class Project(models.Model):
     duration = models.IntegerField(blank=True, null=True, help_text='Duration in days')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Set by delete_project; the purge_deleted worker removes the rows
+    deleted_at = models.DateTimeField(blank=True, null=True)
+
+    objects = LiveManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the freelancer project feed
+            models.Index(fields=['-created_at', '-id'], name='project_feed_idx'),
+            models.Index(fields=['client', '-created_at'], name='project_client_created_idx'),
+            # Other processes' skill matchers catch up by updated_at
+            models.Index(fields=['updated_at'], name='project_updated_idx'),
+            # Only tombstones: what the purger scans
+            models.Index(fields=['deleted_at'], condition=models.Q(deleted_at__isnull=False), name='project_deleted_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -78,6 +199,19 @@ class Proposal(models.Model):
     bid_amount = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
+    # Copied from the project, so listings don't need the join
+    deleted_at = models.DateTimeField(blank=True, null=True)
+
+    objects = LiveManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['project', 'status'], name='proposal_project_status_idx'),
+            models.Index(fields=['freelancer', '-created_at'], name='proposal_freelancer_idx'),
+            # Keyset pages of /api/proposals/
+            models.Index(fields=['-created_at', '-id'], name='proposal_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.freelancer.user.username} → {self.project.title}"
@@ -98,6 +232,43 @@ class Contract(models.Model):
     freelancer = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='freelancer_contracts', null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
     created_at = models.DateTimeField(auto_now_add=True)
+    # Copied from the project, so listings don't need the join
+    deleted_at = models.DateTimeField(blank=True, null=True)
+    # Chat tombstone: messages with an id up to this one were cleared and
+    # are hidden until the purger gets to them.
+    chat_cleared_through = models.BigIntegerField(default=0)
+    chat_purge_pending = models.BooleanField(default=False)
+    # Read pointers: the newest message id in the chat, and the newest
+    # each side has read (see myapp.chat.mark_chat_read).
+    last_message_id = models.BigIntegerField(default=0)
+    client_last_read_id = models.BigIntegerField(default=0)
+    freelancer_last_read_id = models.BigIntegerField(default=0)
+
+    objects = LiveManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['client', 'status'], name='contract_client_status_idx'),
+            models.Index(fields=['freelancer', 'status'], name='contract_freelancer_status_idx'),
+            models.Index(fields=['id'], condition=models.Q(chat_purge_pending=True), name='contract_chat_purge_idx'),
+        ]
+
+    def has_party(self, profile):
+        """
+        True when profile is this contract's client or freelancer; the
+        check every contract action and chat endpoint authorizes with.
+        """
+        return profile is not None and profile.pk in (self.client_id, self.freelancer_id)
+
+    def visible_messages(self):
+        return self.messages.filter(id__gt=self.chat_cleared_through)
+
+    def read_pointer_field(self, profile):
+        return 'client_last_read_id' if profile.pk == self.client_id else 'freelancer_last_read_id'
+
+    def has_unread(self, profile):
+        return self.last_message_id > getattr(self, self.read_pointer_field(profile))
 
 
     
@@ -108,6 +279,17 @@ class Review(models.Model):
     comment = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Covers the dashboard badge/rating lookups on PostgreSQL;
+            # other backends build it as a plain composite index.
+            models.Index(
+                fields=['project', 'reviewer_name'],
+                include=['rating'],
+                name='review_project_reviewer_idx',
+            ),
+        ]
+
 
 # ---------------- Task ----------------
 class Task(models.Model):
@@ -137,9 +319,18 @@ class Message(models.Model):
     )
     sender = models.ForeignKey("Profile", on_delete=models.CASCADE)
     content = models.TextField(blank=True)
-    file = models.FileField(upload_to="chat_files/", blank=True, null=True)  # <-- add this
+    file = models.FileField(upload_to="chat_files/", storage=blob_storage, blank=True, null=True)  # <-- add this
+    # Name the file was uploaded with; the stored name is its content hash
+    file_name = models.CharField(max_length=255, blank=True)
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['contract', 'timestamp'], name='message_contract_time_idx'),
+            # Messages after a read pointer or ?after_id= in one contract
+            models.Index(fields=['contract', 'id'], name='message_contract_id_idx'),
+        ]
+
     @property
     def is_image(self):
         if self.file:
@@ -158,10 +349,143 @@ class Notification(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
     message = models.TextField()
     is_read = models.BooleanField(default=False)
+    # For chat notifications, coalesced per contract (see
+    # myapp.utils.notify_chat_message): count messages so far, and
+    # created_at moves to the latest one's time.
+    contract = models.ForeignKey(
+        'Contract', on_delete=models.CASCADE, blank=True, null=True, related_name='notifications'
+    )
+    count = models.PositiveIntegerField(default=1)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            # At most one unread chat notification per user and contract;
+            # also the index the coalescing UPDATE finds it with.
+            models.UniqueConstraint(
+                fields=['user', 'contract'],
+                condition=models.Q(is_read=False, contract__isnull=False),
+                name='notif_unread_chat_uniq',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='notif_user_created_idx'),
+            # Only unread rows: small, and exactly what the badge/poll reads
+            models.Index(
+                fields=['user', '-created_at'],
+                condition=models.Q(is_read=False),
+                name='notif_user_unread_idx',
+            ),
+        ]
+
     def __str__(self):
         return f"{self.user.username}: {self.message[:20]}"
+
+
+class NotificationArchive(models.Model):
+    """
+    Read notifications past the retention window, moved here by the
+    archive_notifications command so the live table stays small.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_notifications')
+    message = models.TextField()
+    is_read = models.BooleanField(default=True)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='notif_archive_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username}: {self.message[:20]}"
+
+
+# ---------------- Attachment blobs ----------------
+class StoredBlob(models.Model):
+    """
+    One file in the content-addressed blob store (myapp.storage) and the
+    number of Message.file / Profile.avatar values pointing at it.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    sha256 = models.CharField(max_length=64)
+    size = models.BigIntegerField(default=0)
+    ref_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Only orphans: what the garbage collector scans
+            models.Index(fields=['id'], condition=models.Q(ref_count__lte=0), name='blob_orphan_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count})"
+
+
+class ChunkedUpload(models.Model):
+    """
+    A chat attachment being uploaded in pieces (see myapp.uploads). The
+    bytes received so far live in a .part file; offset is how many.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chunked_uploads')
+    contract = models.ForeignKey('Contract', on_delete=models.CASCADE, related_name='chunked_uploads')
+    file_name = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at'], name='chunked_upload_updated_idx'),
+        ]
+
+    @property
+    def complete(self):
+        return self.offset >= self.size
+
+    def __str__(self):
+        return f"{self.file_name} ({self.offset}/{self.size})"
+
+
+# ---------------- Email outbox ----------------
+class OutboxEmail(models.Model):
+    """
+    An email waiting to be sent. Requests only insert rows here; the
+    send_outbox_emails worker drains them over one SMTP connection.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    recipient = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.EmailField(blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(blank=True, null=True)
+    # Set after a failure: not claimed again before then (backoff)
+    next_attempt_at = models.DateTimeField(blank=True, null=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id'], name='outbox_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.recipient}: {self.subject} ({self.status})"
+
+
 # myapp/models.py
 from django.db import models
 from django.contrib.auth.models import User
@@ -0,0 +1,126 @@
+# myapp/purge.py
+import time
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .cache import bump_projects_version, invalidate_dashboards
+from .models import ChunkedUpload, Contract, Message, Notification, Project, Proposal
+from .matching import loaded_skill_matcher
+from .search import get_project_search
+from .uploads import discard_upload
+from .utils import delete_notifications
+
+PURGE_BATCH_SIZE = 500
+
+
+# ---------------- Tombstones ----------------
+def clear_chat_history(contract):
+    """
+    Hides every message the contract's chat has so far with one UPDATE of
+    its tombstone; purge_deleted removes the rows later. The contract's
+    own last_message_id marks "so far": it is read under the row lock
+    that post_chat_message's UPDATE also takes, so a message being posted
+    meanwhile is either counted in or sent after the clear.
+    """
+    with transaction.atomic():
+        through = Contract.all_objects.select_for_update().filter(id=contract.id).values_list(
+            "last_message_id", flat=True
+        ).first() or 0
+        # Nothing cleared is left to read, for either side
+        Contract.all_objects.filter(id=contract.id, chat_cleared_through__lt=through).update(
+            chat_cleared_through=through,
+            chat_purge_pending=True,
+            client_last_read_id=Greatest(F("client_last_read_id"), F("last_message_id")),
+            freelancer_last_read_id=Greatest(F("freelancer_last_read_id"), F("last_message_id")),
+        )
+    contract.chat_cleared_through = max(contract.chat_cleared_through, through)
+    invalidate_dashboards(*Contract.all_objects.filter(id=contract.id).values_list(
+        "client__user_id", "freelancer__user_id"
+    ).first() or ())
+
+
+def soft_delete_project(project):
+    """
+    Tombstones the project with its proposals and contracts, which hides
+    them everywhere (their default managers skip deleted rows). The
+    messages, reviews and tasks underneath are left for the purger.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        Project.all_objects.filter(id=project.id).update(deleted_at=now, updated_at=now)
+        Proposal.all_objects.filter(project_id=project.id).update(deleted_at=now)
+        Contract.all_objects.filter(project_id=project.id).update(deleted_at=now)
+        get_project_search().remove(project.id)
+    matcher = loaded_skill_matcher()
+    if matcher is not None:
+        matcher.remove(project.id)
+    project.deleted_at = now
+
+    # .update() sends no signals; mirror myapp.signals.project_changed
+    user_ids = {project.client_id}
+    for parties in Contract.all_objects.filter(project_id=project.id).values_list(
+        "client__user_id", "freelancer__user_id"
+    ):
+        user_ids.update(parties)
+    user_ids.update(
+        Proposal.all_objects.filter(project_id=project.id).values_list("freelancer__user_id", flat=True)
+    )
+    bump_projects_version()
+    invalidate_dashboards(*user_ids)
+
+
+# ---------------- Purger ----------------
+def purge_messages(messages, batch_size=PURGE_BATCH_SIZE, sleep=0.0):
+    """
+    Deletes messages oldest first, batch_size rows per transaction, so no
+    lock is held for long. Attachment blobs are released as each batch
+    commits. Returns the number of rows deleted.
+    """
+    removed = 0
+    while True:
+        ids = list(messages.order_by("id").values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return removed
+        with transaction.atomic():
+            Message.objects.filter(id__in=ids).delete()
+        removed += len(ids)
+        if sleep:
+            time.sleep(sleep)
+
+
+def purge_cleared_chats(batch_size=PURGE_BATCH_SIZE, sleep=0.0):
+    removed = 0
+    pending = Contract.all_objects.filter(chat_purge_pending=True).values_list("id", "chat_cleared_through")
+    for contract_id, through in pending:
+        removed += purge_messages(
+            Message.objects.filter(contract_id=contract_id, id__lte=through), batch_size, sleep
+        )
+        # A clear that landed meanwhile keeps the flag for the next run
+        Contract.all_objects.filter(id=contract_id, chat_cleared_through=through).update(
+            chat_purge_pending=False
+        )
+    return removed
+
+
+def purge_deleted_projects(batch_size=PURGE_BATCH_SIZE, sleep=0.0):
+    """
+    Removes tombstoned projects. Their messages go first, in batches; the
+    cascade that deletes the project itself is then down to a handful of
+    proposal, contract, review and task rows. Returns (projects, messages).
+    """
+    projects = messages = 0
+    for project in Project.all_objects.filter(deleted_at__isnull=False).order_by("deleted_at"):
+        contract_ids = list(Contract.all_objects.filter(project=project).values_list("id", flat=True))
+        messages += purge_messages(Message.objects.filter(contract_id__in=contract_ids), batch_size, sleep)
+        for upload in ChunkedUpload.objects.filter(contract_id__in=contract_ids):
+            discard_upload(upload)
+        with transaction.atomic():
+            # The cascade would take the contracts' chat notifications
+            # without moving their owners' unread counters
+            delete_notifications(Notification.objects.filter(contract_id__in=contract_ids))
+            project.delete()
+        projects += 1
+    return projects, messages
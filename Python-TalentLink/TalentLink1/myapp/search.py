@@ -0,0 +1,248 @@
+# myapp/search.py
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.module_loading import import_string
+
+from .models import Message, Project
+
+# SQLite: external-content FTS5 table over myapp_message, created and
+# kept in sync by triggers in migration 0012. contract_id is indexed as a
+# token so the MATCH itself narrows to one contract instead of ranking
+# every chat's hits.
+MESSAGE_FTS_TABLE = "myapp_message_fts"
+
+# PostgreSQL: the GIN index (migration 0012) is on exactly this
+# expression, so the planner can use it for the @@ match.
+SEARCH_CONFIG = "english"
+MESSAGE_SEARCH_VECTOR = SearchVector("content", "file_name", config=SEARCH_CONFIG)
+
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+MAX_TERMS = 10
+
+
+def search_terms(text):
+    """
+    The words of a user's query, with any search syntax dropped, so input
+    never reaches the database as a query language.
+    """
+    return _TERM_RE.findall(text or "")[:MAX_TERMS]
+
+
+def search_messages(contract, text, page=1, page_size=20):
+    """
+    Messages of contract matching every word of text (the last one as a
+    prefix, for search-as-you-type), best match first. Returns
+    (messages, has_more) for the 1-based page.
+    """
+    terms = search_terms(text)
+    if not terms:
+        return [], False
+    offset = (page - 1) * page_size
+    visible = Q(contract=contract, id__gt=contract.chat_cleared_through)
+
+    if connection.vendor == "sqlite":
+        ids = _fts5_ids(contract, terms, offset, page_size + 1)
+        by_id = Message.objects.select_related("sender__user").filter(visible).in_bulk(ids)
+        rows = [by_id[pk] for pk in ids if pk in by_id]
+    elif connection.vendor == "postgresql":
+        tsquery = " & ".join(terms[:-1] + [f"{terms[-1]}:*"])
+        query = SearchQuery(tsquery, config=SEARCH_CONFIG, search_type="raw")
+        rows = list(
+            Message.objects.select_related("sender__user")
+            .annotate(search=MESSAGE_SEARCH_VECTOR)
+            .filter(visible, search=query)
+            .annotate(rank=SearchRank(MESSAGE_SEARCH_VECTOR, query))
+            .order_by("-rank", "-id")[offset:offset + page_size + 1]
+        )
+    else:
+        matches = Q()
+        for term in terms:
+            matches &= Q(content__icontains=term) | Q(file_name__icontains=term)
+        rows = list(
+            Message.objects.select_related("sender__user")
+            .filter(visible, matches)
+            .order_by("-id")[offset:offset + page_size + 1]
+        )
+    return rows[:page_size], len(rows) > page_size
+
+
+def _fts5_ids(contract, terms, offset, limit):
+    words = " ".join(f'"{term}"' for term in terms[:-1])
+    match = f'contract_id : "{contract.id}" AND {{content file_name}} : ({words} "{terms[-1]}"*)'
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT rowid FROM {MESSAGE_FTS_TABLE}
+            WHERE {MESSAGE_FTS_TABLE} MATCH %s AND rowid > %s
+            ORDER BY bm25({MESSAGE_FTS_TABLE}, 10.0, 5.0, 0.0), rowid DESC
+            LIMIT %s OFFSET %s
+            """,
+            [match, contract.chat_cleared_through, limit, offset],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+# ---------------- Project search ----------------
+# SQLite: an FTS5 table of project titles and descriptions, created by
+# migration 0015 and kept in sync from Project signals (myapp.signals).
+PROJECT_FTS_TABLE = "myapp_project_fts"
+
+# PostgreSQL: migration 0015 puts a GIN index on exactly this expression.
+PROJECT_SEARCH_VECTOR = (
+    SearchVector("title", weight="A", config=SEARCH_CONFIG)
+    + SearchVector("description", weight="B", config=SEARCH_CONFIG)
+)
+
+# Snippets come back from the database with these around each hit, and
+# are escaped before the markers become <mark> tags.
+SNIPPET_START = "\x02"
+SNIPPET_END = "\x03"
+SNIPPET_WORDS = 16
+
+
+def highlight(snippet):
+    """
+    HTML for a search snippet: the text escaped, the hits in <mark>.
+    """
+    if snippet is None:
+        return None
+    return escape(snippet).replace(SNIPPET_START, "<mark>").replace(SNIPPET_END, "</mark>")
+
+
+class ProjectSearchBackend:
+    """
+    Matches projects on every word of the query in the title or
+    description, the last word as a prefix. This base version runs
+    icontains lookups, for databases without full-text search; it has no
+    ranking or snippets.
+
+    search() annotates search_snippet where the backend can make one and,
+    when ranked, orders best match first. index() and remove() are called
+    from the Project save and delete signals.
+    """
+
+    def search(self, queryset, terms, ranked=True):
+        for term in terms:
+            queryset = queryset.filter(Q(title__icontains=term) | Q(description__icontains=term))
+        return queryset
+
+    def index(self, project):
+        pass
+
+    def remove(self, project_id):
+        pass
+
+    def rebuild(self):
+        """
+        Re-indexes every live project; returns how many there are.
+        """
+        return Project.objects.count()
+
+
+class SQLiteProjectSearch(ProjectSearchBackend):
+    """
+    FTS5 with bm25 ranking, title hits weighted above description hits.
+    Signals keep the table in sync with saves and deletes made through
+    the ORM; after bulk .update() calls or raw SQL, run
+    rebuild_search_index.
+    """
+
+    table = PROJECT_FTS_TABLE
+
+    def search(self, queryset, terms, ranked=True):
+        words = " ".join(f'"{term}"' for term in terms[:-1])
+        queryset = queryset.extra(
+            select={
+                "search_rank": f"bm25({self.table}, 10.0, 1.0)",
+                "search_snippet": f"snippet({self.table}, -1, %s, %s, '…', %s)",
+            },
+            select_params=[SNIPPET_START, SNIPPET_END, SNIPPET_WORDS],
+            tables=[self.table],
+            where=[f"{self.table}.rowid = {Project._meta.db_table}.id", f"{self.table} MATCH %s"],
+            params=[f'{words} "{terms[-1]}"*'],
+        )
+        # bm25 is lower for better matches
+        return queryset.order_by("search_rank", "-id") if ranked else queryset
+
+    def index(self, project):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [project.id])
+            cursor.execute(
+                f"INSERT INTO {self.table}(rowid, title, description) VALUES (%s, %s, %s)",
+                [project.id, project.title, project.description],
+            )
+
+    def remove(self, project_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [project_id])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+            cursor.execute(
+                f"""
+                INSERT INTO {self.table}(rowid, title, description)
+                SELECT id, title, description FROM {Project._meta.db_table}
+                WHERE deleted_at IS NULL
+                """
+            )
+            return cursor.rowcount
+
+
+class PostgresProjectSearch(ProjectSearchBackend):
+    """
+    tsvector match on the GIN-indexed PROJECT_SEARCH_VECTOR, ranked by
+    ts_rank with title weighted above description. The index is an
+    expression index, so PostgreSQL maintains it on every write.
+    """
+
+    index_name = "project_search_idx"
+
+    def search(self, queryset, terms, ranked=True):
+        tsquery = " & ".join(terms[:-1] + [f"{terms[-1]}:*"])
+        query = SearchQuery(tsquery, config=SEARCH_CONFIG, search_type="raw")
+        queryset = (
+            queryset.annotate(search=PROJECT_SEARCH_VECTOR)
+            .filter(search=query)
+            .annotate(
+                search_rank=SearchRank(PROJECT_SEARCH_VECTOR, query),
+                search_snippet=SearchHeadline(
+                    "description", query, config=SEARCH_CONFIG,
+                    start_sel=SNIPPET_START, stop_sel=SNIPPET_END,
+                    max_words=SNIPPET_WORDS, min_words=SNIPPET_WORDS // 2,
+                ),
+            )
+        )
+        return queryset.order_by("-search_rank", "-id") if ranked else queryset
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"REINDEX INDEX {self.index_name}")
+        return super().rebuild()
+
+
+PROJECT_SEARCH_BACKENDS = {
+    "sqlite": "myapp.search.SQLiteProjectSearch",
+    "postgresql": "myapp.search.PostgresProjectSearch",
+}
+
+_project_search = None
+
+
+def get_project_search():
+    """
+    The project search backend, built once from the PROJECT_SEARCH_BACKEND
+    setting or, by default, picked for the database in use.
+    """
+    global _project_search
+    if _project_search is None:
+        path = getattr(settings, "PROJECT_SEARCH_BACKEND", None) or PROJECT_SEARCH_BACKENDS.get(
+            connection.vendor, "myapp.search.ProjectSearchBackend"
+        )
+        _project_search = import_string(path)()
+    return _project_search
@@ -1,28 +1,179 @@
+from django.contrib.auth.models import User
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
 from rest_framework import serializers
 from .models import Task, Project, Proposal, Contract, Message, Review, Profile, Skill
+from .search import highlight
+
+
+def query_list(request, name):
+    """
+    The comma-separated values of ?name=, or None when it isn't given.
+    """
+    if request is None or name not in request.query_params:
+        return None
+    return [value.strip() for value in request.query_params[name].split(",") if value.strip()]
+
+
+class SparseFieldsMixin:
+    """
+    ModelSerializer mixin for ?fields= and ?expand= on the top-level
+    serializer of a request (nested ones take fields= as an argument).
+
+    ?fields=id,title keeps only those fields; unknown names are ignored.
+    ?expand=client renders a relation named in Meta.expandable_fields
+    with its serializer instead of as a primary key.
+
+    optimize_queryset() narrows a queryset to what the fields read: a
+    .only() of their columns when ?fields= is given, select_related for
+    the forward relations they follow and prefetch_related for the
+    many-valued ones, so a page costs a fixed number of queries.
+    """
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        self.requested_fields = fields
+        self.requested_expand = expand
+        super().__init__(*args, **kwargs)
+
+    def is_top_level(self):
+        parent = self.parent
+        return parent is None or (isinstance(parent, serializers.ListSerializer) and parent.parent is None)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get("request") if self.is_top_level() else None
+        wanted = self.requested_fields or query_list(request, "fields")
+        expand = self.requested_expand or query_list(request, "expand") or ()
+
+        expandable = getattr(self.Meta, "expandable_fields", {})
+        for name in expand:
+            if name in expandable and name in fields:
+                serializer_class, options = expandable[name]
+                fields[name] = serializer_class(read_only=True, **options)
+        if wanted:
+            fields = {name: field for name, field in fields.items() if name in wanted} or fields
+        return fields
+
+    @property
+    def narrowed(self):
+        request = self.context.get("request") if self.is_top_level() else None
+        return bool(self.requested_fields or query_list(request, "fields"))
+
+    def optimize_queryset(self, queryset, keep=()):
+        """
+        queryset with the loading the fields need. keep names columns the
+        caller reads besides them, e.g. the ordering of a keyset page.
+        """
+        only, select, prefetch = [], [], []
+        self._plan(queryset.model, self, "", only, select, prefetch)
+
+        done = {getattr(lookup, "prefetch_to", lookup) for lookup in queryset._prefetch_related_lookups}
+        select = [path for path in select if path not in done and path.split("__")[0] not in done]
+        prefetch = [
+            lookup for lookup in prefetch if getattr(lookup, "prefetch_to", lookup) not in done
+        ]
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        if self.narrowed:
+            for name in keep:
+                try:
+                    if queryset.model._meta.get_field(name).concrete:
+                        only.append(name)
+                except FieldDoesNotExist:
+                    pass
+            # Relations that are prefetched, not joined, still need their key
+            only = [path for path in only if path.split("__")[0] not in done or "__" not in path]
+            queryset = queryset.only(*only)
+        return queryset
+
+    @classmethod
+    def _plan(cls, model, serializer, prefix, only, select, prefetch):
+        for field in serializer.fields.values():
+            if field.write_only or field.source == "*":
+                continue
+            attrs = field.source_attrs
+            current, path = model, prefix
+            for depth, attr in enumerate(attrs):
+                try:
+                    model_field = current._meta.get_field(attr)
+                except FieldDoesNotExist:
+                    # A property or method: nothing to load for it
+                    break
+                if model_field.many_to_many or model_field.one_to_many:
+                    prefetch.append(cls._prefetch(field, path + attr))
+                    break
+                if not model_field.is_relation:
+                    only.append(path + attr)
+                    break
+                if model_field.concrete:
+                    only.append(path + attr)
+                last = depth == len(attrs) - 1
+                if last and not isinstance(field, serializers.BaseSerializer):
+                    # Rendered as its primary key: the column is enough
+                    break
+                select.append(path + attr)
+                current, path = model_field.related_model, f"{path}{attr}__"
+                if last:
+                    cls._plan(current, field, path, only, select, prefetch)
+
+    @staticmethod
+    def _prefetch(field, lookup):
+        child = getattr(field, "child", None)
+        if isinstance(child, SparseFieldsMixin):
+            model = child.Meta.model
+            return Prefetch(lookup, queryset=child.optimize_queryset(model._default_manager.all()))
+        return lookup
+
+
+class UserSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ['id', 'username']
+
 
 class SkillSerializer(serializers.ModelSerializer):
     class Meta:
         model = Skill
         fields = '__all__'
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     skills = SkillSerializer(many=True, read_only=True)
 
     class Meta:
         model = Profile
-        fields = '__all__'
+        exclude = ['unread_notifications']
+        expandable_fields = {'user': (UserSummarySerializer, {})}
+
+
+class FreelancerSerializer(ProfileSerializer):
+    username = serializers.ReadOnlyField(source='user.username')
+    # How many of the requested ?skills= the freelancer has
+    matched_skills = serializers.SerializerMethodField()
+
+    def get_matched_skills(self, obj):
+        return getattr(obj, 'matched', None)
 
 class TaskSerializer(serializers.ModelSerializer):
     class Meta:
         model = Task
         fields = '__all__'
 
-class ProjectSerializer(serializers.ModelSerializer):
-   
+class ProjectSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    # Matched text with hits in <mark>, on ?search= results only
+    search_snippet = serializers.SerializerMethodField()
+
     class Meta:
         model = Project
         fields = '__all__'
+        expandable_fields = {
+            'client': (UserSummarySerializer, {}),
+            'skills_required': (SkillSerializer, {'many': True}),
+        }
+
+    def get_search_snippet(self, obj):
+        return highlight(getattr(obj, "search_snippet", None))
 
 
 
@@ -40,9 +191,12 @@ class ReviewSerializer(serializers.ModelSerializer):
     class Meta:
         model = Review
         fields = '__all__'
-class ProposalSerializer(serializers.ModelSerializer):
-    freelancer = serializers.ReadOnlyField(source='freelancer.username')
+class ProposalSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    freelancer = serializers.ReadOnlyField(source='freelancer.user.username')
 
     class Meta:
         model = Proposal
         fields = '__all__'
+        expandable_fields = {
+            'project': (ProjectSerializer, {'fields': ['id', 'title', 'budget', 'deadline']}),
+        }
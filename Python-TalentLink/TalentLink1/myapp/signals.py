@@ -0,0 +1,192 @@
+# myapp/signals.py
+from django.db import transaction
+from django.utils import timezone
+from django.db.models.signals import post_init, post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .cache import invalidate_dashboards, bump_projects_version
+from .utils import adjust_unread_count, refresh_freelancer_ratings
+from .events import hub
+from .storage import release_blobs
+from .matching import loaded_skill_matcher
+from .search import get_project_search
+from .thumbnails import schedule_derivatives
+from .models import Project, Proposal, Contract, Review, Notification, Profile, Message
+
+
+def _profile_user_ids(*profile_ids):
+    profile_ids = [pk for pk in profile_ids if pk is not None]
+    if not profile_ids:
+        return []
+    return list(Profile.objects.filter(id__in=profile_ids).values_list("user_id", flat=True))
+
+
+# ---------------- Dashboard cache invalidation ----------------
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def project_changed(sender, instance, **kwargs):
+    bump_projects_version()
+    invalidate_dashboards(instance.client_id)
+
+
+# ---------------- Project search index ----------------
+@receiver(post_save, sender=Project)
+def index_project(sender, instance, **kwargs):
+    get_project_search().index(instance)
+
+
+@receiver(post_delete, sender=Project)
+def unindex_project(sender, instance, **kwargs):
+    get_project_search().remove(instance.id)
+
+
+# ---------------- Skill matcher ----------------
+def _rematch(project_ids):
+    matcher = loaded_skill_matcher()
+    if matcher is not None:
+        transaction.on_commit(lambda: matcher.index_projects(Project.all_objects.filter(id__in=project_ids)))
+
+
+@receiver(post_save, sender=Project)
+def rematch_project(sender, instance, **kwargs):
+    _rematch([instance.id])
+
+
+@receiver(post_delete, sender=Project)
+def unmatch_project(sender, instance, **kwargs):
+    matcher = loaded_skill_matcher()
+    if matcher is not None:
+        # A rolled-back delete must leave the project matchable
+        project_id = instance.id
+        transaction.on_commit(lambda: matcher.remove(project_id))
+
+
+@receiver(m2m_changed, sender=Project.skills_required.through)
+def rematch_retagged_projects(sender, instance, action, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    project_ids = [instance.id] if isinstance(instance, Project) else list(pk_set or ())
+    if project_ids:
+        # Other processes' matchers pick projects up by updated_at
+        Project.all_objects.filter(id__in=project_ids).update(updated_at=timezone.now())
+        _rematch(project_ids)
+
+
+@receiver(m2m_changed, sender=Project.skills_required.through)
+def project_skills_changed(sender, instance, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear") and isinstance(instance, Project):
+        bump_projects_version()
+        invalidate_dashboards(instance.client_id)
+
+
+@receiver(m2m_changed, sender=Profile.skills.through)
+def profile_skills_changed(sender, instance, action, **kwargs):
+    # The freelancer project feed is filtered by the profile's skills
+    if action in ("post_add", "post_remove", "post_clear") and isinstance(instance, Profile):
+        invalidate_dashboards(instance.user_id)
+
+
+@receiver(post_save, sender=Proposal)
+@receiver(post_delete, sender=Proposal)
+def proposal_changed(sender, instance, **kwargs):
+    client_id = Project.objects.filter(id=instance.project_id).values_list("client_id", flat=True).first()
+    invalidate_dashboards(client_id, *_profile_user_ids(instance.freelancer_id))
+
+
+@receiver(post_save, sender=Contract)
+@receiver(post_delete, sender=Contract)
+def contract_changed(sender, instance, **kwargs):
+    invalidate_dashboards(*_profile_user_ids(instance.client_id, instance.freelancer_id))
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def review_changed(sender, instance, **kwargs):
+    # Reviews are keyed by project, so every party to a contract on it is affected
+    user_ids = set(Project.objects.filter(id=instance.project_id).values_list("client_id", flat=True))
+    for client_user_id, freelancer_user_id in Contract.objects.filter(
+        project_id=instance.project_id
+    ).values_list("client__user_id", "freelancer__user_id"):
+        user_ids.update([client_user_id, freelancer_user_id])
+    invalidate_dashboards(*user_ids)
+
+
+# ---------------- Freelancer rating aggregates ----------------
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def rerate_freelancers(sender, instance, **kwargs):
+    freelancer_ids = list(Contract.all_objects.filter(
+        project_id=instance.project_id, client__user__username=instance.reviewer_name
+    ).values_list("freelancer_id", flat=True))
+    if freelancer_ids:
+        refresh_freelancer_ratings(freelancer_ids)
+
+
+@receiver(post_save, sender=Notification)
+def notification_changed(sender, instance, **kwargs):
+    invalidate_dashboards(instance.user_id)
+
+
+# ---------------- Unread notification counter ----------------
+@receiver(post_save, sender=Notification)
+def count_new_notification(sender, instance, created, **kwargs):
+    # Reads and deletes go through myapp.utils helpers that adjust the
+    # counter themselves; only inserts are counted here.
+    if created and not instance.is_read:
+        adjust_unread_count(instance.user_id, 1)
+
+
+# ---------------- Live notification push ----------------
+@receiver(post_save, sender=Notification)
+def push_new_notification(sender, instance, created, **kwargs):
+    if created:
+        user_id = instance.user_id
+        payload = {"id": instance.id, "message": instance.message}
+        transaction.on_commit(lambda: hub.publish(user_id, payload))
+
+
+# ---------------- Avatar blob references ----------------
+@receiver(post_init, sender=Profile)
+def remember_avatar(sender, instance, **kwargs):
+    # A deferred avatar (a ?fields= list) isn't loaded just for this
+    if "avatar" not in instance.get_deferred_fields():
+        instance._stored_avatar = instance.avatar.name if instance.avatar else None
+
+
+@receiver(post_save, sender=Profile)
+def release_replaced_avatar(sender, instance, **kwargs):
+    if not hasattr(instance, "_stored_avatar"):
+        if "avatar" in instance.get_deferred_fields():
+            # Deferred fields aren't saved
+            return
+        # Loaded after the instance: its previous value is unknown, so
+        # nothing is released (a blob kept too long, never one lost)
+        instance._stored_avatar = instance.avatar.name if instance.avatar else None
+    current = instance.avatar.name if instance.avatar else None
+    if instance._stored_avatar and instance._stored_avatar != current:
+        release_blobs([instance._stored_avatar])
+    if current and current != instance._stored_avatar:
+        transaction.on_commit(lambda: schedule_derivatives(current, "avatar"))
+    instance._stored_avatar = current
+
+
+@receiver(post_delete, sender=Profile)
+def release_deleted_avatar(sender, instance, **kwargs):
+    release_blobs([getattr(instance, "_stored_avatar", None)])
+
+
+# ---------------- Attachment blob references ----------------
+@receiver(post_delete, sender=Message)
+def release_deleted_attachment(sender, instance, **kwargs):
+    # Sent for every row the Collector removes, so messages that go with
+    # their contract or sender (or from the admin) are released too
+    if instance.file:
+        release_blobs([instance.file.name])
+
+
+# ---------------- Thumbnails ----------------
+@receiver(post_save, sender=Message)
+def render_image_thumbnails(sender, instance, created, **kwargs):
+    if created and instance.is_image:
+        name = instance.file.name
+        transaction.on_commit(lambda: schedule_derivatives(name, "chat"))
@@ -0,0 +1,240 @@
+# myapp/storage.py
+import hashlib
+import os
+import re
+import tempfile
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+
+BLOB_GC_BATCH_SIZE = 500
+# Blob files no StoredBlob row tracks are swept once this old; younger
+# ones may belong to a transaction that hasn't committed yet
+UNTRACKED_BLOB_GRACE = timedelta(hours=1)
+_EXTENSION_RE = re.compile(r"^\.[a-z0-9]{1,10}$")
+_HASH_NAME_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores every upload under the SHA-256 of its content, so identical
+    files are written to disk once no matter how often they're uploaded.
+
+    Upload "chat_files/report.pdf" becomes
+    "chat_files/ab/cd/abcd...ef.pdf": the upload_to directory and the
+    extension are kept, the rest is the hash. The content is hashed while
+    it is copied to a temporary file (or in place, when it is already a
+    file on disk), so large uploads are never held in memory.
+
+    Each save adds one reference to the blob's StoredBlob row.
+    release_blobs() drops references when a message or avatar stops
+    pointing at a blob, and collect_orphaned_blobs() deletes blobs that
+    nobody references any more.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # The final name depends on the content, see _save()
+        return name
+
+    def _save(self, name, content):
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        if not _EXTENSION_RE.match(extension):
+            extension = ""
+
+        if hasattr(content, "temporary_file_path"):
+            # Already on local disk (large Django uploads, assembled
+            # chunked uploads): hash it in place and move it, no copy.
+            source = content.temporary_file_path()
+            owned = False
+            digest, size = _hash_file(source)
+        else:
+            source, digest, size = self._spool(content)
+            owned = True
+
+        sha256 = digest.hexdigest()
+        blob_name = "/".join(filter(None, [directory, sha256[:2], sha256[2:4], sha256 + extension]))
+        # Take the reference before touching the file: once it is counted
+        # the garbage collector leaves the blob alone. Should the caller's
+        # transaction roll back, sweep_untracked_blobs() removes the file.
+        retain_blob(blob_name, sha256=sha256, size=size)
+        if self.exists(blob_name):
+            if owned:
+                os.unlink(source)
+        else:
+            full_path = self.path(blob_name)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            file_move_safe(source, full_path, allow_overwrite=True)
+            if self.file_permissions_mode is not None:
+                os.chmod(full_path, self.file_permissions_mode)
+        return blob_name
+
+    def _spool(self, content):
+        """
+        Copies content to a temporary file next to the blobs while hashing
+        it. Returns (path, digest, size).
+        """
+        incoming = self.path(".incoming")
+        os.makedirs(incoming, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        if hasattr(content, "seek") and content.seekable():
+            content.seek(0)
+        with tempfile.NamedTemporaryFile(dir=incoming, delete=False) as tmp:
+            try:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    tmp.write(chunk)
+                    size += len(chunk)
+            except BaseException:
+                tmp.close()
+                os.unlink(tmp.name)
+                raise
+        return tmp.name, digest, size
+
+
+def _hash_file(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest, size
+
+
+blob_storage = ContentAddressedStorage()
+
+
+def content_key(name):
+    """
+    A stable key for the content stored under name: the SHA-256 a blob is
+    named after, or, for files that predate the blob store (unique names
+    that are never re-used), a hash of the name itself.
+    """
+    stem = os.path.splitext(os.path.basename(name))[0]
+    if _HASH_NAME_RE.match(stem):
+        return stem
+    return hashlib.sha256(name.encode()).hexdigest()
+
+
+def retain_blob(name, sha256="", size=0):
+    from .models import StoredBlob
+
+    if not StoredBlob.objects.filter(name=name).update(ref_count=F("ref_count") + 1):
+        blob, created = StoredBlob.objects.get_or_create(
+            name=name, defaults={"sha256": sha256, "size": size, "ref_count": 1}
+        )
+        if not created:
+            StoredBlob.objects.filter(id=blob.id).update(ref_count=F("ref_count") + 1)
+
+
+def release_blobs(names):
+    """
+    Drops one reference per occurrence of each name and schedules the
+    blobs that hit zero for deletion once the transaction commits.
+    Files that predate the blob store have no StoredBlob row and are
+    never touched.
+    """
+    from .models import StoredBlob
+
+    per_name = Counter(name for name in names if name)
+    if not per_name:
+        return
+    by_count = {}
+    for name, count in per_name.items():
+        by_count.setdefault(count, []).append(name)
+    for count, same_count in by_count.items():
+        for batch in _chunks(same_count, BLOB_GC_BATCH_SIZE):
+            StoredBlob.objects.filter(name__in=batch).update(ref_count=F("ref_count") - count)
+
+    released = list(per_name)
+    transaction.on_commit(lambda: collect_orphaned_blobs(released))
+
+
+def collect_orphaned_blobs(names=None, batch_size=BLOB_GC_BATCH_SIZE):
+    """
+    Deletes unreferenced blobs (all of them, or only those in names) in
+    batches of batch_size. Returns the number of blobs removed.
+    """
+    from .models import StoredBlob
+
+    orphans = StoredBlob.objects.filter(ref_count__lte=0)
+    if names is not None:
+        return sum(
+            _collect_orphans(orphans.filter(name__in=batch), batch_size)
+            for batch in _chunks(list(names), batch_size)
+        )
+    return _collect_orphans(orphans, batch_size)
+
+
+def _collect_orphans(orphans, batch_size):
+    from .models import StoredBlob
+    from .thumbnails import discard_derivatives
+
+    removed = 0
+    last_id = 0
+    while True:
+        batch = list(orphans.filter(id__gt=last_id).order_by("id").values_list("id", "name")[:batch_size])
+        if not batch:
+            return removed
+        last_id = batch[-1][0]
+        ids = [blob_id for blob_id, _ in batch]
+        with transaction.atomic():
+            # Re-check under the lock: an upload may have re-used a blob
+            # between the scan and now.
+            doomed = list(
+                StoredBlob.objects.select_for_update()
+                .filter(id__in=ids, ref_count__lte=0)
+                .values_list("id", "name")
+            )
+            StoredBlob.objects.filter(id__in=[blob_id for blob_id, _ in doomed]).delete()
+            for _, name in doomed:
+                blob_storage.delete(name)
+                discard_derivatives(name)
+        removed += len(doomed)
+
+
+def sweep_untracked_blobs(directories, grace=UNTRACKED_BLOB_GRACE, batch_size=BLOB_GC_BATCH_SIZE):
+    """
+    Deletes blob files under directories that no StoredBlob row tracks.
+    A save counts its reference before the row owning it exists, so when
+    that transaction rolls back the count goes with it but a newly
+    written file stays. Each such file gets an unreferenced row, and
+    collect_orphaned_blobs removes it under the usual lock, so an upload
+    re-using the content meanwhile keeps it. Returns the number removed.
+    """
+    from .models import StoredBlob
+
+    cutoff = time.time() - grace.total_seconds()
+    found = []
+    for directory in directories:
+        for dirpath, _, filenames in os.walk(blob_storage.path(directory)):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                stem = os.path.splitext(filename)[0]
+                # Legacy files keep their names and are never swept
+                if _HASH_NAME_RE.match(stem) and os.path.getmtime(path) < cutoff:
+                    name = os.path.relpath(path, blob_storage.location).replace(os.sep, "/")
+                    found.append((name, stem, os.path.getsize(path)))
+
+    untracked = []
+    for batch in _chunks(found, batch_size):
+        tracked = set(StoredBlob.objects.filter(name__in=[name for name, _, _ in batch]).values_list("name", flat=True))
+        fresh = [
+            StoredBlob(name=name, sha256=sha256, size=size, ref_count=0)
+            for name, sha256, size in batch if name not in tracked
+        ]
+        StoredBlob.objects.bulk_create(fresh, ignore_conflicts=True)
+        untracked += [blob.name for blob in fresh]
+    return collect_orphaned_blobs(untracked, batch_size) if untracked else 0
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
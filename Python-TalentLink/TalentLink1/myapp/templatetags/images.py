@@ -0,0 +1,40 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from myapp.thumbnails import FORMATS, derivative_urls
+
+register = template.Library()
+
+
+@register.simple_tag
+def thumbnail(source, preset, size, alt="", **attrs):
+    """
+    Responsive <picture> for an avatar or a chat image, WebP first with a
+    JPEG fallback. size is the CSS width in pixels the image is shown at;
+    the browser picks the derivative for the screen's pixel density.
+
+    Usage in template:
+    {% load images %}
+    {% thumbnail profile.avatar "avatar" 50 alt="Avatar" class="avatar-img" %}
+    {% thumbnail msg "chat" 320 %}
+    """
+    extra = format_html_join("", ' {}="{}"', ((key.replace("_", "-"), value) for key, value in attrs.items()))
+    urls = derivative_urls(source, preset)
+    if urls is None:
+        return format_html('<img src="{}" alt="{}"{}>', source.url, alt, extra)
+
+    def srcset(fmt):
+        return ", ".join(f"{url} {width}w" for url, width in urls[fmt])
+
+    sizes = f"{size}px"
+    # Smallest derivative that covers size at 1x, for browsers without srcset
+    fallback = next((url for url, width in urls["jpg"] if width >= size), urls["jpg"][-1][0])
+    sources = format_html_join(
+        "",
+        '<source type="{}" srcset="{}" sizes="{}">',
+        ((FORMATS[fmt][1], srcset(fmt), sizes) for fmt in FORMATS if fmt != "jpg"),
+    )
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" alt="{}" loading="lazy"{}></picture>',
+        sources, fallback, srcset("jpg"), sizes, alt, extra,
+    )
@@ -151,3 +151,2002 @@ class TalentLinkFullTests(TestCase):
         notif = Notification.objects.filter(user=self.freelancer_user).first()
         self.assertIsNotNone(notif)
         self.assertIn("ACCEPTED", notif.message)
+
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from myapp.utils import contract_review_map, mark_notifications_read
+
+
+class DashboardQueryBudgetTests(TestCase):
+    """
+    Dashboards must issue a fixed number of queries no matter how many
+    contracts (and reviews) the user has.
+    """
+    def setUp(self):
+        cache.clear()
+        self.client_user = User.objects.create_user(username="client", password="pass")
+        self.freelancer_user = User.objects.create_user(username="freelancer", password="pass")
+        self.client_user.profile.role = "client"
+        self.client_user.profile.save()
+        self.freelancer_user.profile.role = "freelancer"
+        self.freelancer_user.profile.save()
+
+    def make_contracts(self, count):
+        for i in range(count):
+            project = Project.objects.create(
+                title=f"Project {i}", description="Demo", budget=100, client=self.client_user
+            )
+            proposal = Proposal.objects.create(
+                project=project, freelancer=self.freelancer_user.profile, bid_amount=90
+            )
+            Contract.objects.create(
+                project=project,
+                proposal=proposal,
+                client=self.client_user.profile,
+                freelancer=self.freelancer_user.profile,
+                status="COMPLETED",
+            )
+            Review.objects.create(project=project, reviewer_name="client", rating=5)
+
+    def count_queries(self, url_name):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse(url_name))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def assert_flat_budget(self, username, url_name, budget):
+        self.client.login(username=username, password="pass")
+        self.make_contracts(2)
+        small = self.count_queries(url_name)
+        self.make_contracts(20)
+        large = self.count_queries(url_name)
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, budget)
+
+    def test_client_dashboard_query_budget(self):
+        self.assert_flat_budget("client", "client_dashboard", budget=12)
+
+    def test_freelancer_dashboard_query_budget(self):
+        self.assert_flat_budget("freelancer", "freelancer_dashboard", budget=10)
+
+    def test_profile_view_query_budget(self):
+        self.assert_flat_budget("client", "profile_view", budget=12)
+
+    def test_contract_review_map(self):
+        self.make_contracts(3)
+        contracts = Contract.objects.filter(client=self.client_user.profile).select_related("client__user")
+        with self.assertNumQueries(3):
+            by_client = contract_review_map(contracts, reviewer_name="client")
+            by_contract_client = contract_review_map(contracts)
+        self.assertEqual(len(by_client), 3)
+        for contract in contracts:
+            self.assertEqual(by_client[contract.id].project_id, contract.project_id)
+            self.assertEqual(by_contract_client[contract.id], by_client[contract.id])
+        self.assertEqual(set(contract_review_map(contracts, reviewer_name="nobody").values()), {None})
+
+
+class DashboardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client_user = User.objects.create_user(username="client", password="pass")
+        self.freelancer_user = User.objects.create_user(username="freelancer", password="pass")
+        self.freelancer_user.profile.role = "freelancer"
+        self.freelancer_user.profile.save()
+        self.project = Project.objects.create(
+            title="Test Project", description="Demo", budget=1000, client=self.client_user
+        )
+
+    def count_queries(self, url_name):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse(url_name))
+        self.assertEqual(response.status_code, 200)
+        return response, len(ctx.captured_queries)
+
+    def test_second_hit_is_served_from_cache(self):
+        self.client.login(username="client", password="pass")
+        _, cold = self.count_queries("client_dashboard")
+        _, warm = self.count_queries("client_dashboard")
+        self.assertLess(warm, cold)
+
+    def test_notification_invalidates_only_that_user(self):
+        self.client.login(username="client", password="pass")
+        response, _ = self.count_queries("client_dashboard")
+        self.assertEqual(response.context["unread_count"], 0)
+
+        other = User.objects.create_user(username="other", password="pass")
+        Notification.objects.create(user=other, message="Not for the client")
+        _, warm = self.count_queries("client_dashboard")
+
+        Notification.objects.create(user=self.client_user, message="Hello")
+        response, cold = self.count_queries("client_dashboard")
+        self.assertEqual(response.context["unread_count"], 1)
+        self.assertLess(warm, cold)
+
+    def test_new_project_reaches_cached_freelancer_dashboard(self):
+        self.client.login(username="freelancer", password="pass")
+        response, _ = self.count_queries("freelancer_dashboard")
+        self.assertEqual(len(response.context["projects"]), 1)
+
+        Project.objects.create(title="Another", description="Demo", client=self.client_user)
+        response, _ = self.count_queries("freelancer_dashboard")
+        self.assertEqual(len(response.context["projects"]), 2)
+
+    def test_proposal_invalidates_client_and_freelancer(self):
+        self.client.login(username="freelancer", password="pass")
+        self.client.get(reverse("freelancer_dashboard"))
+        Proposal.objects.create(project=self.project, freelancer=self.freelancer_user.profile, bid_amount=900)
+        response = self.client.get(reverse("freelancer_dashboard"))
+        self.assertEqual(len(response.context["proposals"]), 1)
+
+
+from myapp.models import Skill
+
+
+class ProjectFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client_user = User.objects.create_user(username="client", password="pass")
+        self.freelancer_user = User.objects.create_user(username="freelancer", password="pass")
+        self.freelancer_user.profile.role = "freelancer"
+        self.freelancer_user.profile.save()
+        self.python = Skill.objects.create(name="Python")
+        self.react = Skill.objects.create(name="React")
+
+    def make_projects(self, count, skill):
+        for i in range(count):
+            project = Project.objects.create(
+                title=f"{skill.name} {i}", description="Demo", client=self.client_user
+            )
+            project.skills_required.add(skill)
+
+    def fetch_all(self, **params):
+        titles, cursor = [], None
+        while True:
+            query = dict(params, limit=5)
+            if cursor:
+                query["cursor"] = cursor
+            data = self.client.get(reverse("project_feed"), query).json()
+            titles += [p["title"] for p in data["projects"]]
+            cursor = data["next_cursor"]
+            if not cursor:
+                return titles
+
+    def test_dashboard_renders_first_page_only(self):
+        self.make_projects(25, self.python)
+        self.client.login(username="freelancer", password="pass")
+        response = self.client.get(reverse("freelancer_dashboard"))
+        self.assertEqual(len(response.context["projects"]), 20)
+        self.assertIsNotNone(response.context["projects_next_cursor"])
+
+    def test_load_more_walks_every_project_once_newest_first(self):
+        self.make_projects(12, self.python)
+        self.client.login(username="freelancer", password="pass")
+        titles = self.fetch_all()
+        self.assertEqual(titles, [f"Python {i}" for i in reversed(range(12))])
+
+    def test_feed_filters_by_freelancer_skills(self):
+        self.make_projects(3, self.python)
+        self.make_projects(4, self.react)
+        self.freelancer_user.profile.skills.add(self.react)
+        self.client.login(username="freelancer", password="pass")
+        self.assertEqual(len(self.fetch_all()), 4)
+        self.assertEqual(len(self.fetch_all(all="1")), 7)
+
+    def test_deep_page_costs_the_same_as_first_page(self):
+        self.make_projects(30, self.python)
+        self.client.login(username="freelancer", password="pass")
+        first = self.client.get(reverse("project_feed"), {"limit": 5}).json()
+        with CaptureQueriesContext(connection) as first_ctx:
+            self.client.get(reverse("project_feed"), {"limit": 5})
+        deep_cursor = first["next_cursor"]
+        for _ in range(4):
+            deep_cursor = self.client.get(
+                reverse("project_feed"), {"limit": 5, "cursor": deep_cursor}
+            ).json()["next_cursor"]
+        with CaptureQueriesContext(connection) as deep_ctx:
+            self.client.get(reverse("project_feed"), {"limit": 5, "cursor": deep_cursor})
+        self.assertEqual(len(first_ctx.captured_queries), len(deep_ctx.captured_queries))
+        self.assertNotIn("OFFSET", deep_ctx.captured_queries[-1]["sql"])
+
+
+from io import StringIO
+from django.core.management import call_command
+
+
+class ExplainDashboardsCommandTests(TestCase):
+    def test_dashboard_queries_use_indexes(self):
+        user = User.objects.create_user(username="client", password="pass")
+        Notification.objects.create(user=user, message="Hello")
+        out = StringIO()
+        call_command("explain_dashboards", user="client", stdout=out)
+        output = out.getvalue()
+        self.assertIn("notif_user_unread_idx", output)
+        self.assertIn("contract_client_status_idx", output)
+        self.assertNotIn("(full scan)", output)
+
+
+class UnreadNotificationCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="client", password="pass")
+        self.client.login(username="client", password="pass")
+
+    def counter(self):
+        return Profile.objects.get(user=self.user).unread_notifications
+
+    def test_counter_follows_create_read_and_clear(self):
+        notifs = [Notification.objects.create(user=self.user, message=f"n{i}") for i in range(3)]
+        self.assertEqual(self.counter(), 3)
+
+        response = self.client.post(reverse("mark_notification_read", args=[notifs[0].id]))
+        self.assertEqual(response.json()["unread_count"], 2)
+        self.client.post(reverse("mark_notification_read", args=[notifs[0].id]))
+        self.assertEqual(self.counter(), 2)
+
+        response = self.client.post(reverse("mark_all_notifications_read"))
+        self.assertEqual(response.json()["unread_count"], 0)
+
+        Notification.objects.create(user=self.user, message="late")
+        response = self.client.post(reverse("clear_all_notifications"))
+        self.assertEqual(response.json()["unread_count"], 0)
+        self.assertFalse(Notification.objects.filter(user=self.user).exists())
+
+    def test_profile_save_does_not_clobber_counter(self):
+        profile = self.user.profile
+        Notification.objects.create(user=self.user, message="Hello")
+        profile.bio = "Updated"
+        profile.save()
+        self.assertEqual(self.counter(), 1)
+
+    def test_dashboard_reads_counter_without_counting(self):
+        Notification.objects.create(user=self.user, message="Hello")
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("client_dashboard"))
+        self.assertEqual(response.context["unread_count"], 1)
+        self.assertFalse(any("COUNT" in q["sql"] and "myapp_notification" in q["sql"] for q in ctx.captured_queries))
+
+    def test_repair_command(self):
+        Notification.objects.create(user=self.user, message="Hello")
+        Profile.objects.filter(user=self.user).update(unread_notifications=7)
+        out = StringIO()
+        call_command("repair_notification_counters", stdout=out)
+        self.assertIn("Repaired 1", out.getvalue())
+        self.assertEqual(self.counter(), 1)
+
+
+import asyncio
+from myapp.events import hub, notification_events
+
+
+class NotificationStreamTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="client", password="pass")
+
+    def test_created_notification_is_published_after_commit(self):
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+
+        async def subscribe():
+            return hub.subscribe(self.user.id)
+
+        queue = loop.run_until_complete(subscribe())
+        self.addCleanup(hub.unsubscribe, self.user.id, queue)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            notif = Notification.objects.create(user=self.user, message="Hello")
+
+        event = loop.run_until_complete(asyncio.wait_for(queue.get(), 1))
+        self.assertEqual(event, {"id": notif.id, "message": "Hello"})
+
+    def test_event_stream_waits_without_queries_and_unsubscribes(self):
+        async def scenario():
+            stream = notification_events(self.user.id)
+            self.assertEqual(await anext(stream), "retry: 5000\n\n")
+            pending = asyncio.ensure_future(anext(stream))
+            await asyncio.sleep(0)
+            self.assertEqual(hub.subscriber_count(self.user.id), 1)
+            hub.publish(self.user.id, {"id": 7, "message": "Hi"})
+            chunk = await asyncio.wait_for(pending, 1)
+            await stream.aclose()
+            return chunk
+
+        with CaptureQueriesContext(connection) as ctx:
+            chunk = asyncio.run(scenario())
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertIn("event: notification", chunk)
+        self.assertIn('"message": "Hi"', chunk)
+        self.assertEqual(hub.subscriber_count(self.user.id), 0)
+
+    def test_wsgi_requests_fall_back_to_polling(self):
+        self.client.login(username="client", password="pass")
+        response = self.client.get(reverse("notification_stream"))
+        self.assertEqual(response.status_code, 204)
+
+    async def test_asgi_request_gets_event_stream(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse("notification_stream"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b"retry: 5000\n\n")
+        await response.streaming_content.aclose()
+
+
+class NotificationConditionalGetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="client", password="pass")
+        self.client.login(username="client", password="pass")
+        self.first = Notification.objects.create(user=self.user, message="first")
+
+    def test_unchanged_state_returns_304_without_reading_rows(self):
+        response = self.client.get(reverse("get_notifications"))
+        etag = response["ETag"]
+        self.assertEqual(response.json()["unread_count"], 1)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("get_notifications"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(any(
+            q["sql"].lstrip().startswith('SELECT "myapp_notification"."id", "myapp_notification"."user_id"')
+            for q in ctx.captured_queries
+        ))
+
+    def test_etag_changes_on_new_and_read_notifications(self):
+        etag = self.client.get(reverse("get_notifications"))["ETag"]
+        Notification.objects.create(user=self.user, message="second")
+        response = self.client.get(reverse("get_notifications"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response["ETag"]
+        mark_notifications_read(self.user, ids=[self.first.id])
+        response = self.client.get(reverse("get_notifications"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["unread_count"], 1)
+
+    def test_since_id_returns_only_newer_notifications(self):
+        second = Notification.objects.create(user=self.user, message="second")
+        data = self.client.get(reverse("get_notifications"), {"since_id": self.first.id}).json()
+        self.assertEqual([n["id"] for n in data["notifications"]], [second.id])
+        self.assertEqual(data["latest_id"], second.id)
+        self.assertEqual(data["unread_count"], 2)
+
+
+from django.core import mail
+from django.test import override_settings
+from myapp.models import OutboxEmail
+from myapp.utils import send_bulk_notification, send_notification, notify_matching_freelancers
+
+
+@override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+class NotificationFanOutTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client_user = User.objects.create_user(username="client", password="pass", email="c@x.com")
+        self.freelancers = []
+        for i in range(5):
+            user = User.objects.create_user(username=f"free{i}", password="pass", email=f"f{i}@x.com")
+            user.profile.role = "freelancer"
+            user.profile.save()
+            self.freelancers.append(user)
+
+    def test_bulk_notification_is_one_insert(self):
+        with CaptureQueriesContext(connection) as ctx:
+            send_bulk_notification(self.freelancers, "Hello", email=True)
+        inserts = [q for q in ctx.captured_queries if q["sql"].startswith('INSERT INTO "myapp_notification"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(Notification.objects.filter(message="Hello").count(), 5)
+        self.assertEqual(OutboxEmail.objects.filter(status="pending").count(), 5)
+        for user in self.freelancers:
+            self.assertEqual(Profile.objects.get(user=user).unread_notifications, 1)
+
+    def test_matching_freelancers_only(self):
+        python = Skill.objects.create(name="Python")
+        self.freelancers[0].profile.skills.add(python)
+        self.freelancers[1].profile.skills.add(python)
+        self.freelancers[1].profile.availability = False
+        self.freelancers[1].profile.save()
+        project = Project.objects.create(client=self.client_user, title="API", description="d", budget=100)
+        project.skills_required.add(python)
+
+        notify_matching_freelancers(project)
+        self.assertEqual(
+            list(Notification.objects.values_list("user__username", flat=True)), ["free0"]
+        )
+
+    def test_send_notification_queues_email(self):
+        send_notification(self.client_user, "Queued", email_placeholder=True)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertTrue(OutboxEmail.objects.filter(recipient="c@x.com", status="pending").exists())
+
+    def test_worker_sends_outbox_and_marks_rows(self):
+        send_bulk_notification(self.freelancers, "Hello", email=True)
+        out = StringIO()
+        call_command("send_outbox_emails", "--batch-size", "2", stdout=out)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), [f"f{i}@x.com" for i in range(5)])
+        self.assertEqual(OutboxEmail.objects.filter(status="sent").count(), 5)
+        self.assertIn("Sent 5", out.getvalue())
+
+        call_command("send_outbox_emails", stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 5)
+
+
+from datetime import timedelta
+from django.utils import timezone
+from myapp.models import NotificationArchive
+
+
+class NotificationRetentionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="client", password="pass")
+        self.client.login(username="client", password="pass")
+
+    def make(self, message, days_old, is_read):
+        notif = Notification.objects.create(user=self.user, message=message, is_read=is_read)
+        Notification.objects.filter(id=notif.id).update(created_at=timezone.now() - timedelta(days=days_old))
+        return notif
+
+    def test_archive_moves_only_old_read_notifications(self):
+        self.make("old read", 100, True)
+        self.make("old read 2", 200, True)
+        self.make("old unread", 100, False)
+        self.make("new read", 1, True)
+
+        out = StringIO()
+        call_command("archive_notifications", "--days", "90", "--batch-size", "1", stdout=out)
+        self.assertIn("Archived 2", out.getvalue())
+        self.assertEqual(
+            sorted(Notification.objects.values_list("message", flat=True)), ["new read", "old unread"]
+        )
+        archived = NotificationArchive.objects.get(message="old read 2")
+        self.assertLess(archived.created_at, timezone.now() - timedelta(days=199))
+        self.assertEqual(Profile.objects.get(user=self.user).unread_notifications, 1)
+
+    def test_dry_run_moves_nothing(self):
+        self.make("old read", 100, True)
+        out = StringIO()
+        call_command("archive_notifications", "--dry-run", stdout=out)
+        self.assertIn("1 notification(s)", out.getvalue())
+        self.assertEqual(NotificationArchive.objects.count(), 0)
+
+    def test_history_is_keyset_paginated(self):
+        for i in range(5):
+            self.make(f"n{i}", i, True)
+        url = reverse("notification_history")
+        response = self.client.get(url, {"limit": 2})
+        self.assertEqual([n.message for n in response.context["notifications"]], ["n0", "n1"])
+
+        seen = []
+        cursor = response.context["next_cursor"]
+        while cursor:
+            response = self.client.get(url, {"limit": 2, "cursor": cursor})
+            seen += [n.message for n in response.context["notifications"]]
+            cursor = response.context["next_cursor"]
+        self.assertEqual(seen, ["n2", "n3", "n4"])
+
+    def test_history_shows_archive(self):
+        self.make("old read", 100, True)
+        call_command("archive_notifications", stdout=StringIO())
+        response = self.client.get(reverse("notification_history"), {"archived": "1"})
+        self.assertContains(response, "old read")
+
+    def test_dashboard_caps_notifications(self):
+        Notification.objects.bulk_create(
+            [Notification(user=self.user, message=f"n{i}") for i in range(30)]
+        )
+        response = self.client.get(reverse("client_dashboard"))
+        self.assertEqual(len(response.context["notifications"]), 20)
+
+    def dashboard_messages(self):
+        return [n.message for n in self.client.get(reverse("client_dashboard")).context["notifications"]]
+
+    def test_archiving_drops_cached_dashboard(self):
+        self.make("old read", 100, True)
+        self.assertEqual(self.dashboard_messages(), ["old read"])
+        call_command("archive_notifications", stdout=StringIO())
+        self.assertEqual(self.dashboard_messages(), [])
+
+    def test_clearing_read_notifications_drops_cached_dashboard(self):
+        self.make("read", 1, True)
+        self.assertEqual(self.dashboard_messages(), ["read"])
+        self.client.post(reverse("clear_all_notifications"))
+        self.assertEqual(self.dashboard_messages(), [])
+
+
+from myapp.models import Message
+
+
+class ChatHistoryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        client_user = User.objects.create_user(username="client", password="pass")
+        freelancer_user = User.objects.create_user(username="free", password="pass")
+        User.objects.create_user(username="outsider", password="pass")
+        project = Project.objects.create(client=client_user, title="Chat", description="d", budget=100)
+        proposal = Proposal.objects.create(
+            project=project, freelancer=freelancer_user.profile, cover_letter="c", bid_amount=50
+        )
+        self.contract = Contract.objects.create(
+            project=project, proposal=proposal,
+            client=client_user.profile, freelancer=freelancer_user.profile, status="ACTIVE",
+        )
+        # Same timestamp for every message so the id tie-break is exercised
+        now = timezone.now()
+        for i in range(120):
+            sender = client_user.profile if i % 2 else freelancer_user.profile
+            Message.objects.create(contract=self.contract, sender=sender, content=f"m{i}")
+        Message.objects.filter(contract=self.contract).update(timestamp=now)
+        self.client.login(username="client", password="pass")
+
+    def test_chat_renders_newest_window_with_constant_queries(self):
+        url = reverse("contract_chat", args=[self.contract.id])
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        contents = [m.content for m in response.context["messages"]]
+        self.assertEqual(contents, [f"m{i}" for i in range(70, 120)])
+        self.assertIsNotNone(response.context["older_cursor"])
+        self.assertLess(len(ctx.captured_queries), 10)
+
+    def test_scroll_back_reaches_first_message(self):
+        cursor = self.client.get(reverse("contract_chat", args=[self.contract.id])).context["older_cursor"]
+        seen = []
+        while cursor:
+            data = self.client.get(reverse("chat_history", args=[self.contract.id]), {"cursor": cursor}).json()
+            seen = [m["content"] for m in data["messages"]] + seen
+            cursor = data["next_cursor"]
+        self.assertEqual(seen, [f"m{i}" for i in range(70)])
+
+    def test_updates_after_id(self):
+        last = Message.objects.filter(contract=self.contract).order_by("-id")[1]
+        data = self.client.get(reverse("chat_updates", args=[self.contract.id]), {"after_id": last.id}).json()
+        self.assertEqual([m["content"] for m in data["messages"]], ["m119"])
+        self.assertFalse(data["has_more"])
+
+        data = self.client.get(reverse("chat_updates", args=[self.contract.id]), {"after_id": 0, "limit": 5}).json()
+        self.assertEqual(len(data["messages"]), 5)
+        self.assertTrue(data["has_more"])
+
+    def test_outsider_is_forbidden(self):
+        self.client.login(username="outsider", password="pass")
+        for name in ("contract_chat", "chat_history", "chat_updates"):
+            response = self.client.get(reverse(name, args=[self.contract.id]))
+            self.assertEqual(response.status_code, 403)
+
+
+import os
+import shutil
+import tempfile
+import time
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import transaction
+from myapp.models import StoredBlob
+from myapp.storage import blob_storage
+
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        client_user = User.objects.create_user(username="client", password="pass")
+        freelancer_user = User.objects.create_user(username="free", password="pass")
+        self.profile = client_user.profile
+        project = Project.objects.create(client=client_user, title="Chat", description="d", budget=100)
+        proposal = Proposal.objects.create(
+            project=project, freelancer=freelancer_user.profile, cover_letter="c", bid_amount=50
+        )
+        self.contract = Contract.objects.create(
+            project=project, proposal=proposal,
+            client=client_user.profile, freelancer=freelancer_user.profile, status="ACTIVE",
+        )
+        self.client.login(username="client", password="pass")
+
+    def send(self, name, data):
+        return self.client.post(reverse("send_message"), {
+            "contract_id": self.contract.id,
+            "file": SimpleUploadedFile(name, data),
+        }).json()
+
+    def blob(self, name):
+        return StoredBlob.objects.get(name=name)
+
+    def test_identical_uploads_share_one_blob(self):
+        first = self.send("yoga.PDF", b"same bytes")
+        second = self.send("copy.pdf", b"same bytes")
+        other = self.send("other.pdf", b"different")
+
+        names = list(Message.objects.order_by("id").values_list("file", flat=True))
+        self.assertEqual(names[0], names[1])
+        self.assertNotEqual(names[0], names[2])
+        self.assertTrue(names[0].startswith("chat_files/") and names[0].endswith(".pdf"))
+        self.assertEqual(self.blob(names[0]).ref_count, 2)
+        self.assertEqual((first["file_name"], second["file_name"], other["file_name"]),
+                         ("yoga.PDF", "copy.pdf", "other.pdf"))
+        with blob_storage.open(names[0]) as f:
+            self.assertEqual(f.read(), b"same bytes")
+        self.assertEqual(os.listdir(os.path.join(self.media_root, ".incoming")), [])
+
+    def test_deleting_messages_collects_orphans(self):
+        self.send("a.txt", b"shared")
+        self.send("b.txt", b"shared")
+        self.send("c.txt", b"only once")
+        shared, _, single = Message.objects.order_by("id").values_list("file", flat=True)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Message.objects.filter(file=shared).first().delete()
+        self.assertEqual(self.blob(shared).ref_count, 1)
+        self.assertTrue(blob_storage.exists(shared))
+
+        # Clearing only hides the messages; the purger deletes them
+        self.client.post(reverse("clear_chat", args=[self.contract.id]))
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("purge_deleted", stdout=StringIO())
+        self.assertFalse(StoredBlob.objects.exists())
+        self.assertFalse(blob_storage.exists(shared))
+        self.assertFalse(blob_storage.exists(single))
+
+    def test_replacing_avatar_releases_old_blob(self):
+        self.profile.avatar.save("me.png", ContentFile(b"old avatar"))
+        old = self.profile.avatar.name
+        profile = Profile.objects.get(id=self.profile.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.avatar.save("me.png", ContentFile(b"new avatar"))
+        self.assertFalse(StoredBlob.objects.filter(name=old).exists())
+        self.assertFalse(blob_storage.exists(old))
+        self.assertEqual(self.blob(profile.avatar.name).ref_count, 1)
+
+    def test_cascaded_deletes_release_blobs(self):
+        self.send("a.txt", b"cascade")
+        name = Message.objects.get().file.name
+        with self.captureOnCommitCallbacks(execute=True):
+            self.contract.delete()
+        self.assertFalse(StoredBlob.objects.filter(name=name).exists())
+        self.assertFalse(blob_storage.exists(name))
+
+    def test_deleting_the_sender_releases_blobs(self):
+        self.send("b.txt", b"sender")
+        name = Message.objects.get().file.name
+        with self.captureOnCommitCallbacks(execute=True):
+            self.profile.user.delete()
+        self.assertFalse(blob_storage.exists(name))
+
+    def test_files_of_rolled_back_saves_are_swept(self):
+        class Abort(Exception):
+            pass
+
+        kept = Message.objects.get(id=self.send("kept.txt", b"kept")["id"]).file.name
+        try:
+            with transaction.atomic():
+                lost = Message.objects.create(
+                    contract=self.contract, sender=self.profile, file=ContentFile(b"rolled back", name="r.txt")
+                ).file.name
+                raise Abort
+        except Abort:
+            pass
+        self.assertTrue(blob_storage.exists(lost))
+        self.assertFalse(StoredBlob.objects.filter(name=lost).exists())
+
+        # Too recent: its transaction might still be open
+        call_command("collect_blobs", stdout=StringIO())
+        self.assertTrue(blob_storage.exists(lost))
+
+        two_hours_ago = time.time() - 2 * 3600
+        for name in (kept, lost):
+            os.utime(blob_storage.path(name), (two_hours_ago, two_hours_ago))
+        out = StringIO()
+        call_command("collect_blobs", stdout=out)
+        self.assertIn("Removed 1 untracked", out.getvalue())
+        self.assertFalse(blob_storage.exists(lost))
+        self.assertTrue(blob_storage.exists(kept))
+        self.assertEqual(self.blob(kept).ref_count, 1)
+
+    def test_recount_repairs_raw_updates(self):
+        self.send("a.txt", b"raw")
+        name = Message.objects.get().file.name
+        # .update() sends no signals
+        Message.objects.update(file="")
+        self.assertEqual(self.blob(name).ref_count, 1)
+
+        out = StringIO()
+        call_command("collect_blobs", "--recount", stdout=out)
+        self.assertIn("Removed 1", out.getvalue())
+        self.assertFalse(blob_storage.exists(name))
+
+    def test_dedupe_media_moves_legacy_copies(self):
+        for suffix in ("", "_abc", "_def"):
+            legacy = f"chat_files/yoga{suffix}"
+            path = os.path.join(self.media_root, legacy)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(b"legacy bytes")
+            Message.objects.create(contract=self.contract, sender=self.profile, file=legacy)
+
+        call_command("dedupe_media", stdout=StringIO(), stderr=StringIO())
+        names = set(Message.objects.values_list("file", flat=True))
+        self.assertEqual(len(names), 1)
+        self.assertEqual(self.blob(names.pop()).ref_count, 3)
+        leftovers = [n for n in os.listdir(os.path.join(self.media_root, "chat_files")) if n.startswith("yoga")]
+        self.assertEqual(leftovers, [])
+        self.assertEqual(Message.objects.first().file_name, "yoga")
+
+
+class ChatSendTests(TestCase):
+    setUp = ChatHistoryTests.setUp
+
+    def send(self, content):
+        return self.client.post(reverse("send_message"), {"contract_id": self.contract.id, "content": content})
+
+    def test_send_returns_fragment_with_constant_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.send("<b>hi</b>").json()
+        self.assertEqual(data["status"], "success")
+        self.assertIn(f'data-id="{data["id"]}"', data["html"])
+        self.assertIn("&lt;b&gt;hi&lt;/b&gt;", data["html"])
+        self.assertFalse(any("myapp_message" in q["sql"] and q["sql"].startswith("SELECT")
+                             for q in ctx.captured_queries))
+
+    def test_other_side_fetches_new_messages_since_id(self):
+        last_id = self.client.get(reverse("contract_chat", args=[self.contract.id])).context["last_message_id"]
+        self.send("fresh")
+        self.client.login(username="free", password="pass")
+        data = self.client.get(reverse("chat_updates", args=[self.contract.id]), {"after_id": last_id}).json()
+        self.assertEqual([m["content"] for m in data["messages"]], ["fresh"])
+        self.assertIn("fresh", data["messages"][0]["html"])
+
+    def test_outsider_cannot_send(self):
+        self.client.login(username="outsider", password="pass")
+        self.assertEqual(self.send("intrusion").status_code, 403)
+        self.assertFalse(Message.objects.filter(content="intrusion").exists())
+
+
+import json
+from asgiref.sync import sync_to_async
+from django.test import TransactionTestCase
+from myapp.chat import chat_socket
+from myapp.events import get_chat_layer
+
+
+class ChatSocketTests(TransactionTestCase):
+    # Real commits: the socket publishes on transaction.on_commit
+
+    def setUp(self):
+        ChatHistoryTests.setUp(self)
+
+    def headers_for(self, username):
+        # A fresh client per user: logging in over an existing session flushes it
+        client = self.client_class()
+        client.login(username=username, password="pass")
+        cookie = f"sessionid={client.cookies['sessionid'].value}"
+        return [(b"cookie", cookie.encode()), (b"host", b"testserver")]
+
+    async def open_socket(self, headers, contract_id=None):
+        from myapp.management.commands.chat_socket_load import FakeSocket
+
+        socket = FakeSocket(f"/ws/contract/{contract_id or self.contract.id}/chat/", headers)
+        task = asyncio.ensure_future(chat_socket(socket.scope, socket.receive, socket.send))
+        event = await asyncio.wait_for(socket.outgoing.get(), 5)
+        return socket, task, event
+
+    def test_parties_connect_and_messages_fan_out(self):
+        client_headers = self.headers_for("client")
+        freelancer_headers = self.headers_for("free")
+
+        async def scenario():
+            client, client_task, accepted = await self.open_socket(client_headers)
+            self.assertEqual(accepted["type"], "websocket.accept")
+            free, free_task, _ = await self.open_socket(freelancer_headers)
+
+            client.incoming.put_nowait({"type": "websocket.receive", "text": json.dumps({"content": "over ws"})})
+            frames = [
+                json.loads((await asyncio.wait_for(s.outgoing.get(), 5))["text"])
+                for s in (client, free)
+            ]
+            for s in (client, free):
+                s.incoming.put_nowait({"type": "websocket.disconnect", "code": 1000})
+            await asyncio.gather(client_task, free_task)
+            return frames
+
+        frames = asyncio.run(scenario())
+        self.assertEqual([f["message"]["content"] for f in frames], ["over ws", "over ws"])
+        self.assertTrue(Message.objects.filter(content="over ws").exists())
+        self.assertEqual(get_chat_layer().subscriber_count(), 0)
+
+    def test_send_message_view_reaches_sockets(self):
+        headers = self.headers_for("free")
+
+        async def scenario():
+            socket, task, _ = await self.open_socket(headers)
+            await sync_to_async(self.client.login)(username="client", password="pass")
+            await sync_to_async(self.client.post)(
+                reverse("send_message"), {"contract_id": self.contract.id, "content": "from view"}
+            )
+            frame = json.loads((await asyncio.wait_for(socket.outgoing.get(), 5))["text"])
+            socket.incoming.put_nowait({"type": "websocket.disconnect", "code": 1000})
+            await task
+            return frame
+
+        self.assertEqual(asyncio.run(scenario())["message"]["content"], "from view")
+
+    def test_outsiders_and_anonymous_are_refused(self):
+        outsider = self.headers_for("outsider")
+        cross_site = self.headers_for("client") + [(b"origin", b"https://evil.example")]
+
+        async def scenario():
+            results = []
+            for headers in (outsider, [(b"host", b"testserver")], cross_site):
+                _, task, event = await self.open_socket(headers)
+                await task
+                results.append(event)
+            return results
+
+        for event in asyncio.run(scenario()):
+            self.assertEqual(event, {"type": "websocket.close", "code": 4403})
+
+    def test_load_command(self):
+        out = StringIO()
+        call_command("chat_socket_load", "--sockets", "200", "--contract", str(self.contract.id), stdout=out)
+        self.assertIn("Opened 200 socket(s)", out.getvalue())
+        self.assertIn("Queries while idle: 0", out.getvalue())
+
+
+from django.test import SimpleTestCase
+from myapp.events import RedisChannelLayer
+
+
+class FakeRedis:
+    """
+    Stands in for both Redis connections of RedisChannelLayer: PUBLISH
+    reaches the pubsub when its channel is subscribed.
+    """
+
+    def __init__(self):
+        self.channels = set()
+        self.log = []
+        self.messages = asyncio.Queue()
+
+    def publish(self, channel, data):
+        if channel in self.channels:
+            self.messages.put_nowait({"type": "message", "channel": channel.encode(), "data": data})
+
+    async def subscribe(self, channel):
+        await asyncio.sleep(0)
+        self.channels.add(channel)
+        self.log.append(("subscribe", channel))
+
+    async def unsubscribe(self, channel):
+        # Slower than subscribe, as a reordering would need
+        await asyncio.sleep(0.01)
+        self.channels.discard(channel)
+        self.log.append(("unsubscribe", channel))
+
+    async def get_message(self, ignore_subscribe_messages=False, timeout=0.0):
+        try:
+            return await asyncio.wait_for(self.messages.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class FakeRedisChannelLayer(RedisChannelLayer):
+    POLL_TIMEOUT = 0.02
+
+    def _connect(self):
+        self.redis = FakeRedis()
+        return self.redis
+
+    def _connect_pubsub(self):
+        return self.redis
+
+
+class RedisChannelLayerTests(SimpleTestCase):
+    async def receive(self, layer, queue, event):
+        await asyncio.sleep(0.05)
+        layer.publish(7, event)
+        return await asyncio.wait_for(queue.get(), 1)
+
+    def test_forwarding_survives_the_last_socket_closing(self):
+        async def scenario():
+            layer = FakeRedisChannelLayer()
+            queue = layer.subscribe(7)
+            first = await self.receive(layer, queue, {"n": 1})
+            layer.unsubscribe(7, queue)
+            await asyncio.sleep(0.1)
+            self.assertEqual(layer.redis.channels, set())
+            self.assertTrue(layer._listener.done())
+
+            queue = layer.subscribe(7)
+            second = await self.receive(layer, queue, {"n": 2})
+            layer.unsubscribe(7, queue)
+            await asyncio.sleep(0.1)
+            return first, second
+
+        self.assertEqual(asyncio.run(scenario()), ({"n": 1}, {"n": 2}))
+
+    def test_close_then_reopen_stays_subscribed(self):
+        async def scenario():
+            layer = FakeRedisChannelLayer()
+            queue = layer.subscribe(7)
+            await asyncio.sleep(0.05)
+            layer.unsubscribe(7, queue)
+            queue = layer.subscribe(7)
+            event = await self.receive(layer, queue, {"n": 3})
+            self.assertEqual(layer.redis.channels, {"talentlink:7"})
+            layer.unsubscribe(7, queue)
+            await asyncio.sleep(0.1)
+            return event
+
+        self.assertEqual(asyncio.run(scenario()), {"n": 3})
+
+
+from io import BytesIO
+from myapp.models import ChunkedUpload
+from myapp.uploads import ChunkConflict, append_chunk, part_path
+
+
+class ChunkedUploadTests(TestCase):
+    setUp = ContentAddressedStorageTests.setUp
+
+    data = bytes(range(256)) * 40  # 10240 bytes
+
+    def start(self, size=None):
+        response = self.client.post(reverse("start_upload"), {
+            "contract_id": self.contract.id, "file_name": "report.pdf", "size": size or len(self.data),
+        })
+        return response.json()["upload_id"]
+
+    def put(self, upload_id, start, end):
+        return self.client.put(
+            reverse("upload_chunk", args=[upload_id]),
+            data=self.data[start:end + 1],
+            content_type="application/octet-stream",
+            headers={"Content-Range": f"bytes {start}-{end}/{len(self.data)}"},
+        )
+
+    def upload(self):
+        upload_id = self.start()
+        for start in range(0, len(self.data), 4096):
+            self.put(upload_id, start, min(start + 4096, len(self.data)) - 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse("complete_upload", args=[upload_id]), {"content": "see file"}).json()
+
+    def test_chunks_assemble_into_message(self):
+        data = self.upload()
+        self.assertEqual(data["status"], "success")
+        self.assertEqual(data["file_name"], "report.pdf")
+        message = Message.objects.get(id=data["id"])
+        self.assertEqual(message.content, "see file")
+        with blob_storage.open(message.file.name) as f:
+            self.assertEqual(f.read(), self.data)
+        self.assertFalse(ChunkedUpload.objects.exists())
+        self.assertEqual(os.listdir(os.path.join(self.media_root, ".incoming", "uploads")), [])
+
+    def test_out_of_order_chunk_is_rejected_and_resumable(self):
+        upload_id = self.start()
+        self.assertEqual(self.put(upload_id, 0, 999).json()["offset"], 1000)
+        response = self.put(upload_id, 2000, 2999)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["offset"], 1000)
+        # A retried chunk is refused too, so it can't be appended twice
+        self.assertEqual(self.put(upload_id, 0, 999).status_code, 409)
+        self.assertEqual(self.client.get(reverse("upload_chunk", args=[upload_id])).json()["offset"], 1000)
+
+        response = self.client.post(reverse("complete_upload", args=[upload_id]))
+        self.assertEqual(response.status_code, 409)
+
+    def test_concurrent_copy_of_a_chunk_is_rejected(self):
+        upload_id = self.start()
+        chunk = self.data[:1000]
+
+        class RacedStream(BytesIO):
+            # The other copy of the chunk commits while this one streams
+            def read(self, size=-1):
+                ChunkedUpload.objects.filter(id=upload_id).update(offset=len(chunk))
+                return super().read(size)
+
+        with self.assertRaises(ChunkConflict) as conflict:
+            append_chunk(upload_id, 0, len(chunk), RacedStream(chunk))
+        self.assertEqual(conflict.exception.offset, 1000)
+
+        self.assertEqual(self.put(upload_id, 1000, len(self.data) - 1).json()["offset"], len(self.data))
+        with open(part_path(ChunkedUpload.objects.get(id=upload_id)), "rb") as part:
+            self.assertEqual(part.read(), self.data)
+
+    def test_limits_and_ownership(self):
+        with override_settings(CHAT_UPLOAD_MAX_SIZE=100):
+            response = self.client.post(reverse("start_upload"), {
+                "contract_id": self.contract.id, "file_name": "big.bin", "size": 101,
+            })
+        self.assertEqual(response.status_code, 400)
+
+        upload_id = self.start()
+        self.client.login(username="free", password="pass")
+        self.assertEqual(self.put(upload_id, 0, 99).status_code, 404)
+
+    def test_download_full_and_ranges(self):
+        url = self.upload()["file_url"]
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), self.data)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertIn('filename="report.pdf"', response["Content-Disposition"])
+
+        response = self.client.get(url, headers={"Range": "bytes=100-199"})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes 100-199/{len(self.data)}")
+        self.assertEqual(b"".join(response.streaming_content), self.data[100:200])
+
+        response = self.client.get(url, headers={"Range": "bytes=-10"})
+        self.assertEqual(b"".join(response.streaming_content), self.data[-10:])
+
+        response = self.client.get(url, headers={"Range": f"bytes={len(self.data)}-"})
+        self.assertEqual(response.status_code, 416)
+
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, headers={"If-None-Match": etag}).status_code, 304)
+
+    def test_download_requires_contract_party(self):
+        url = self.upload()["file_url"]
+        self.client.login(username="free", password="pass")
+        self.assertEqual(self.client.get(url).status_code, 200)
+        User.objects.create_user(username="outsider", password="pass")
+        self.client.login(username="outsider", password="pass")
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_proxy_handoff(self):
+        data = self.upload()
+        name = Message.objects.get(id=data["id"]).file.name
+        with override_settings(MEDIA_X_ACCEL_REDIRECT_PREFIX="/protected-media/"):
+            response = self.client.get(data["file_url"])
+        self.assertEqual(response["X-Accel-Redirect"], f"/protected-media/{name}")
+        self.assertEqual(response.content, b"")
+
+        with override_settings(MEDIA_X_SENDFILE=True):
+            response = self.client.get(data["file_url"])
+        self.assertEqual(response["X-Sendfile"], blob_storage.path(name))
+
+
+import time
+from io import BytesIO
+from PIL import Image
+from django.template import Context, Template
+from myapp.thumbnails import derivative_name, derivatives_ready, generate_derivatives
+
+
+def image_bytes(size=(800, 400), fmt="JPEG", exif=True):
+    image = Image.new("RGB", size, (200, 30, 30))
+    buffer = BytesIO()
+    if exif:
+        tags = Image.Exif()
+        tags[0x010F] = "Camera Maker"  # Make
+        tags[0x0112] = 6  # Orientation: rotate 90° clockwise
+        image.save(buffer, fmt, exif=tags)
+    else:
+        image.save(buffer, fmt)
+    return buffer.getvalue()
+
+
+class ThumbnailTests(TestCase):
+    setUp = ContentAddressedStorageTests.setUp
+    send = ContentAddressedStorageTests.send
+
+    def wait_for(self, name, preset):
+        deadline = time.monotonic() + 10
+        while not derivatives_ready(name, preset):
+            self.assertLess(time.monotonic(), deadline, "thumbnails were never rendered")
+            time.sleep(0.01)
+
+    def save_avatar(self):
+        self.profile.avatar.save("me.jpg", ContentFile(image_bytes()))
+        return self.profile.avatar.name
+
+    def test_derivatives_are_fixed_size_and_stripped(self):
+        name = self.save_avatar()
+        self.assertEqual(generate_derivatives(name, "avatar"), 6)
+        self.assertEqual(generate_derivatives(name, "avatar"), 0)  # cached on disk
+
+        for width in (64, 128, 256):
+            for fmt, pil_format in (("webp", "WEBP"), ("jpg", "JPEG")):
+                with blob_storage.open(derivative_name(name, "avatar", width, fmt)) as f, Image.open(f) as thumb:
+                    self.assertEqual((thumb.format, thumb.size), (pil_format, (width, width)))
+                    self.assertEqual(len(thumb.getexif()), 0)
+                    self.assertNotIn("icc_profile", thumb.info)
+
+        # Chat images keep their aspect ratio, after the EXIF rotation
+        generate_derivatives(name, "chat")
+        with blob_storage.open(derivative_name(name, "chat", 320, "jpg")) as f, Image.open(f) as thumb:
+            self.assertEqual(thumb.size, (320, 640))
+
+    def test_derivatives_are_keyed_by_content(self):
+        name = self.save_avatar()
+        other = self.send("photo.jpg", image_bytes())
+        message = Message.objects.get(id=other["id"])
+        self.assertNotEqual(message.file.name, name)
+        generate_derivatives(name, "avatar")
+        self.assertTrue(derivatives_ready(message.file.name, "avatar"))
+
+    def test_unreadable_image_is_skipped(self):
+        self.profile.avatar.save("broken.png", ContentFile(b"not an image"))
+        with self.assertLogs("myapp.thumbnails", "WARNING"):
+            self.assertEqual(generate_derivatives(self.profile.avatar.name, "avatar"), 0)
+
+    def test_tag_falls_back_until_rendered(self):
+        name = self.save_avatar()
+        template = Template('{% load images %}{% thumbnail avatar "avatar" 50 alt="Me" class="avatar-img" %}')
+
+        html = template.render(Context({"avatar": self.profile.avatar}))
+        self.assertEqual(html, f'<img src="/media/{name}" alt="Me" class="avatar-img">')
+
+        # The fallback queued the render on a background thread
+        self.wait_for(name, "avatar")
+
+        html = template.render(Context({"avatar": self.profile.avatar}))
+        self.assertIn('<source type="image/webp" srcset="/media/', html)
+        self.assertIn("avatar-64.webp 64w, ", html)
+        self.assertIn(f'src="/media/{derivative_name(name, "avatar", 64, "jpg")}"', html)
+        self.assertIn('sizes="50px"', html)
+
+    def test_upload_queues_render_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            data = self.send("photo.png", image_bytes(fmt="PNG", exif=False))
+        message = Message.objects.get(id=data["id"])
+        self.assertIn("/thumbnail/320.webp", data["html"])
+
+        self.assertFalse(derivatives_ready(message.file.name, "chat"))
+        for callback in callbacks:
+            callback()
+        self.wait_for(message.file.name, "chat")
+
+    def test_thumbnail_view(self):
+        data = self.send("photo.jpg", image_bytes())
+        message = Message.objects.get(id=data["id"])
+        url = reverse("attachment_thumbnail", args=[message.id, 320, "webp"])
+
+        # Not rendered yet: the original is sent inline
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Disposition"], 'inline; filename="photo.jpg"')
+
+        generate_derivatives(message.file.name, "chat")
+        response = self.client.get(url)
+        self.assertEqual(response["Content-Type"], "image/webp")
+        self.assertEqual(response["Content-Disposition"], 'inline; filename="photo-320.webp"')
+        self.assertNotEqual(response["ETag"], self.client.get(
+            reverse("attachment_thumbnail", args=[message.id, 640, "webp"])
+        )["ETag"])
+
+        self.assertEqual(self.client.get(reverse("attachment_thumbnail", args=[message.id, 100, "webp"])).status_code, 404)
+        self.assertEqual(self.client.get(reverse("attachment_thumbnail", args=[message.id, 320, "gif"])).status_code, 404)
+        User.objects.create_user(username="outsider", password="pass")
+        self.client.login(username="outsider", password="pass")
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_orphaned_blob_takes_its_thumbnails(self):
+        name = self.save_avatar()
+        generate_derivatives(name, "avatar")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.profile.avatar = None
+            self.profile.save()
+        self.assertFalse(blob_storage.exists(name))
+        self.assertFalse(derivatives_ready(name, "avatar"))
+
+
+from myapp.chat import post_chat_message
+from myapp.models import Task
+from myapp.purge import clear_chat_history, purge_cleared_chats, purge_deleted_projects, soft_delete_project
+from myapp.utils import unread_notification_count
+
+
+class SoftDeleteTests(TestCase):
+    setUp = ContentAddressedStorageTests.setUp
+    send = ContentAddressedStorageTests.send
+
+    def chat(self):
+        return self.client.get(reverse("chat_updates", args=[self.contract.id])).json()["messages"]
+
+    def test_clear_chat_hides_then_purges_in_batches(self):
+        names = [
+            Message.objects.get(id=self.send(f"f{i}.pdf", f"file {i}".encode())["id"]).file.name
+            for i in range(3)
+        ]
+        for i in range(4):
+            post_chat_message(self.contract, self.profile, f"hello {i}")
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse("clear_chat", args=[self.contract.id]))
+        self.assertEqual(response.json(), {"status": "success"})
+        # session, user, contract, profile, then the locked read and update
+        # in a savepoint (2 + 2), parties
+        self.assertLessEqual(len(queries), 9)
+        self.assertEqual(Message.objects.count(), 7)
+        self.assertEqual(self.chat(), [])
+        attachment = Message.objects.filter(file__isnull=False).exclude(file="").first()
+        self.assertEqual(self.client.get(reverse("download_attachment", args=[attachment.id])).status_code, 404)
+
+        # Sent after the clear: stays
+        kept = post_chat_message(self.contract, self.profile, "after")
+        self.assertEqual([m["id"] for m in self.chat()], [kept.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(purge_cleared_chats(batch_size=2), 7)
+        self.assertEqual(list(Message.objects.values_list("id", flat=True)), [kept.id])
+        self.assertFalse(any(blob_storage.exists(name) for name in names))
+        self.assertFalse(Contract.objects.get(id=self.contract.id).chat_purge_pending)
+        self.assertEqual(purge_cleared_chats(), 0)
+
+    def test_delete_project_hides_then_purges(self):
+        name = Message.objects.get(id=self.send("f.pdf", b"attachment")["id"]).file.name
+        project = self.contract.project
+        Task.objects.create(title="t", project=project)
+        Review.objects.create(project=project, reviewer_name="client", rating=5)
+
+        response = self.client.post(reverse("delete_project", args=[project.id]))
+        self.assertRedirects(response, reverse("client_dashboard"), fetch_redirect_response=False)
+        self.assertFalse(Project.objects.filter(id=project.id).exists())
+        self.assertFalse(Proposal.objects.filter(project_id=project.id).exists())
+        self.assertFalse(Contract.objects.filter(id=self.contract.id).exists())
+        self.assertEqual(self.client.get(reverse("contract_chat", args=[self.contract.id])).status_code, 404)
+        self.assertTrue(Project.all_objects.filter(id=project.id).exists())
+        self.assertEqual(Message.objects.count(), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(purge_deleted_projects(batch_size=1), (1, 1))
+        self.assertFalse(Project.all_objects.exists())
+        self.assertFalse(Contract.all_objects.exists())
+        self.assertFalse(Message.objects.exists() or Task.objects.exists() or Review.objects.exists())
+        self.assertFalse(blob_storage.exists(name))
+
+    def test_clear_uses_the_contracts_own_last_message(self):
+        mine = post_chat_message(self.contract, self.profile, "mine")
+        project = Project.objects.create(client=self.profile.user, title="Other", description="d")
+        other = Contract.objects.create(
+            project=project, proposal=Proposal.objects.create(project=project, freelancer=self.contract.freelancer),
+            client=self.profile, freelancer=self.contract.freelancer,
+        )
+        post_chat_message(other, self.profile, "elsewhere")
+
+        clear_chat_history(self.contract)
+        self.assertEqual(Contract.objects.get(id=self.contract.id).chat_cleared_through, mine.id)
+        self.assertEqual(Contract.objects.get(id=other.id).chat_cleared_through, 0)
+
+    def test_purge_drops_chat_notifications_from_the_counter(self):
+        freelancer = self.contract.freelancer.user
+        post_chat_message(self.contract, self.contract.client, "hello")
+        send_notification(freelancer, "Unrelated")
+        self.assertEqual(unread_notification_count(freelancer), 2)
+
+        soft_delete_project(self.contract.project)
+        purge_deleted_projects()
+        self.assertEqual(list(Notification.objects.filter(user=freelancer).values_list("message", flat=True)), [
+            "Unrelated",
+        ])
+        self.assertEqual(unread_notification_count(freelancer), 1)
+
+    def test_api_delete_is_soft(self):
+        project = self.contract.project
+        url = reverse("projects-detail", args=[project.id])
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertIsNotNone(Project.all_objects.get(id=project.id).deleted_at)
+
+
+from myapp.purge import clear_chat_history
+
+
+class ChatSearchTests(TestCase):
+    setUp = ContentAddressedStorageTests.setUp
+    send = ContentAddressedStorageTests.send
+
+    def search(self, q, **params):
+        return self.client.get(reverse("chat_search", args=[self.contract.id]), {"q": q, **params}).json()
+
+    def ids(self, q, **params):
+        return [m["id"] for m in self.search(q, **params)["messages"]]
+
+    def test_ranked_prefix_search_within_contract(self):
+        weak = post_chat_message(self.contract, self.profile, "the invoice is attached below, plus notes on delivery")
+        strong = post_chat_message(self.contract, self.profile, "invoice invoice")
+        post_chat_message(self.contract, self.profile, "nothing to see")
+        other_project = Project.objects.create(client=self.profile.user, title="Other", description="d")
+        other = Contract.objects.create(
+            project=other_project, proposal=Proposal.objects.create(project=other_project, freelancer=self.contract.freelancer),
+            client=self.profile, freelancer=self.contract.freelancer,
+        )
+        post_chat_message(other, self.profile, "invoice elsewhere")
+
+        self.assertEqual(self.ids("invoice"), [strong.id, weak.id])
+        self.assertEqual(self.ids("Invoi"), [strong.id, weak.id])  # last word is a prefix
+        self.assertEqual(self.ids("delivery invoice"), [weak.id])
+        self.assertEqual(self.ids('invoice" OR * NEAR(('), [])  # syntax is dropped, not passed on
+        self.assertEqual(self.search("")["messages"], [])
+
+    def test_attachment_names_and_index_stays_in_sync(self):
+        data = self.send("Quarterly-Report.pdf", b"pdf bytes")
+        self.assertEqual(self.ids("quarterly"), [data["id"]])
+
+        message = post_chat_message(self.contract, self.profile, "draft copy")
+        Message.objects.filter(id=message.id).update(content="final copy")
+        self.assertEqual(self.ids("draft"), [])
+        self.assertEqual(self.ids("final"), [message.id])
+
+        Message.objects.filter(id=message.id).delete()
+        self.assertEqual(self.ids("final"), [])
+
+        clear_chat_history(self.contract)
+        self.assertEqual(self.ids("quarterly"), [])
+
+    def test_pages(self):
+        sent = [post_chat_message(self.contract, self.profile, f"status update {i}").id for i in range(5)]
+        first = self.search("status", limit=2)
+        self.assertEqual(first["next_page"], 2)
+        second = self.search("status", limit=2, page=2)
+        third = self.search("status", limit=2, page=3)
+        self.assertIsNone(third["next_page"])
+        found = [m["id"] for page in (first, second, third) for m in page["messages"]]
+        self.assertEqual(sorted(found), sent)
+
+    def test_outsider_is_refused(self):
+        User.objects.create_user(username="outsider", password="pass")
+        self.client.login(username="outsider", password="pass")
+        response = self.client.get(reverse("chat_search", args=[self.contract.id]), {"q": "x"})
+        self.assertEqual(response.status_code, 403)
+
+
+from myapp.utils import unread_notification_count
+
+
+class CoalescedChatNotificationTests(TestCase):
+    setUp = ContentAddressedStorageTests.setUp
+
+    def test_contract_without_freelancer(self):
+        Contract.all_objects.filter(id=self.contract.id).update(freelancer=None)
+        self.contract.refresh_from_db()
+        message = post_chat_message(self.contract, self.contract.client, "anyone there?")
+        self.assertEqual(message.content, "anyone there?")
+        self.assertFalse(Notification.objects.filter(contract=self.contract).exists())
+
+    def notifications(self, user):
+        return list(Notification.objects.filter(user=user).order_by("id").values_list("message", "count", "is_read"))
+
+    def test_burst_updates_one_unread_notification(self):
+        freelancer = self.contract.freelancer
+        for i in range(3):
+            post_chat_message(self.contract, self.contract.client, f"hi {i}")
+        name = self.contract.client.user.username
+        self.assertEqual(self.notifications(freelancer.user), [
+            (f"3 new messages from {name} in contract {self.contract.id}", 3, False),
+        ])
+        self.assertEqual(unread_notification_count(freelancer.user), 1)
+
+        # Once read, the next message starts a new one
+        mark_notifications_read(freelancer.user)
+        post_chat_message(self.contract, self.contract.client, "again")
+        self.assertEqual(self.notifications(freelancer.user)[-1], (
+            f"New message from {name} in contract {self.contract.id}", 1, False,
+        ))
+        self.assertEqual(unread_notification_count(freelancer.user), 1)
+
+        post_chat_message(self.contract, freelancer, "reply")
+        self.assertEqual(len(self.notifications(self.contract.client.user)), 1)
+
+    def test_pollers_see_coalesced_updates(self):
+        user = self.contract.freelancer.user
+        post_chat_message(self.contract, self.contract.client, "first")
+        self.client.force_login(user)
+        response = self.client.get(reverse("get_notifications"))
+        etag, latest_at = response["ETag"], response.json()["latest_at"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            post_chat_message(self.contract, self.contract.client, "second")
+        response = self.client.get(reverse("get_notifications"), {"since": latest_at}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        [notification] = response.json()["notifications"]
+        self.assertEqual(notification["count"], 2)
+        self.assertEqual(self.client.get(reverse("get_notifications"), {"since": "2026-99-99T00:00"}).status_code, 200)
+
+
+from myapp.chat import mark_chat_read, unread_chat_counts
+
+
+class ChatReadPointerTests(TestCase):
+    setUp = ContentAddressedStorageTests.setUp
+
+    def unread(self, profile):
+        return unread_chat_counts(profile).get(self.contract.id, 0)
+
+    def test_sending_and_viewing_move_pointers(self):
+        client, freelancer = self.contract.client, self.contract.freelancer
+        for i in range(3):
+            post_chat_message(self.contract, client, f"hi {i}")
+        self.assertEqual(self.unread(freelancer), 3)
+        self.assertEqual(self.unread(client), 0)
+        self.contract.refresh_from_db()
+        self.assertTrue(self.contract.has_unread(freelancer))
+        self.assertFalse(self.contract.has_unread(client))
+
+        self.client.force_login(freelancer.user)
+        self.client.get(reverse("contract_chat", args=[self.contract.id]))
+        self.contract.refresh_from_db()
+        self.assertEqual(self.unread(freelancer), 0)
+        self.assertFalse(self.contract.has_unread(freelancer))
+        # Reading the chat reads its notification too
+        self.assertFalse(Notification.objects.filter(user=freelancer.user, is_read=False).exists())
+
+    def test_read_endpoint_only_moves_forward(self):
+        freelancer = self.contract.freelancer
+        first = post_chat_message(self.contract, self.contract.client, "one")
+        second = post_chat_message(self.contract, self.contract.client, "two")
+        self.client.force_login(freelancer.user)
+        url = reverse("chat_read", args=[self.contract.id])
+
+        self.assertTrue(self.client.post(url, {"last_id": first.id}).json()["moved"])
+        self.assertEqual(self.unread(freelancer), 1)
+        self.assertFalse(self.client.post(url, {"last_id": first.id - 1}).json()["moved"])
+        # Clamped to the newest message
+        self.client.post(url, {"last_id": second.id + 1000})
+        self.contract.refresh_from_db()
+        self.assertEqual(self.contract.freelancer_last_read_id, second.id)
+
+        outsider = User.objects.create_user(username="outsider", password="pass")
+        self.client.force_login(outsider)
+        self.assertEqual(self.client.post(url, {"last_id": second.id}).status_code, 403)
+
+    def test_counts_are_one_grouped_query(self):
+        freelancer = self.contract.freelancer
+        for i in range(3):
+            proposal = Proposal.objects.create(
+                project=self.contract.project, freelancer=freelancer, cover_letter="c", bid_amount=50
+            )
+            other = Contract.objects.create(
+                project=self.contract.project, proposal=proposal,
+                client=self.contract.client, freelancer=freelancer, status="ACTIVE",
+            )
+            for _ in range(i + 1):
+                post_chat_message(other, other.client, "hello")
+        post_chat_message(self.contract, freelancer, "mine")
+        with self.assertNumQueries(1):
+            counts = unread_chat_counts(freelancer)
+        self.assertEqual(sorted(counts.values()), [1, 2, 3])
+        self.assertNotIn(self.contract.id, counts)
+
+    def test_dashboard_badge(self):
+        freelancer = self.contract.freelancer
+        freelancer.role = "freelancer"
+        freelancer.save()
+        post_chat_message(self.contract, self.contract.client, "ping")
+        self.client.force_login(freelancer.user)
+        response = self.client.get(reverse("freelancer_dashboard"))
+        self.assertEqual(response.context["unread_chats"], 1)
+        self.assertEqual(response.context["chat_unread"], {self.contract.id: 1})
+
+        self.client.get(reverse("contract_chat", args=[self.contract.id]))
+        response = self.client.get(reverse("freelancer_dashboard"))
+        self.assertEqual(response.context["unread_chats"], 0)
+
+    def test_clearing_leaves_nothing_unread(self):
+        post_chat_message(self.contract, self.contract.client, "gone")
+        clear_chat_history(self.contract)
+        self.contract.refresh_from_db()
+        self.assertFalse(self.contract.has_unread(self.contract.freelancer))
+        self.assertEqual(self.unread(self.contract.freelancer), 0)
+        self.assertFalse(mark_chat_read(self.contract, self.contract.freelancer, 10 ** 9))
+
+
+from rest_framework.test import APIRequestFactory, force_authenticate
+from myapp.purge import soft_delete_project
+from myapp.views import ProjectViewSet
+
+
+class ProjectSearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="searcher", password="pass")
+        self.logo = Project.objects.create(
+            client=self.user, title="Logo design", description="A new logo for a bakery", budget=100
+        )
+        self.site = Project.objects.create(
+            client=self.user, title="Bakery website", description="Needs a logo & a <b>shop</b>", budget=900
+        )
+        Project.objects.create(client=self.user, title="Mobile app", description="iOS and Android", budget=500)
+
+    def search(self, **params):
+        request = APIRequestFactory().get("/api/projects/", params)
+        force_authenticate(request, self.user)
+        return ProjectViewSet.as_view({"get": "list"})(request).data["results"]
+
+    def titles(self, **params):
+        return [row["title"] for row in self.search(**params)]
+
+    def test_ranked_prefix_search_with_snippets(self):
+        # Title hits outrank description hits; the last word is a prefix
+        self.assertEqual(self.titles(search="logo"), ["Logo design", "Bakery website"])
+        self.assertEqual(self.titles(search="bakery web"), ["Bakery website"])
+        self.assertEqual(self.titles(search="logo", ordering="-budget"), ["Bakery website", "Logo design"])
+        self.assertEqual(self.titles(search="  "), ["Mobile app", "Bakery website", "Logo design"])
+
+        [row] = self.search(search="shop")
+        self.assertIn("<mark>shop</mark>", row["search_snippet"])
+        self.assertIn("&lt;b&gt;", row["search_snippet"])
+        self.assertIsNone(self.search()[0]["search_snippet"])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.logo.title = "Brand refresh"
+        self.logo.description = "Colours"
+        self.logo.save()
+        self.assertEqual(self.titles(search="logo"), ["Bakery website"])
+        self.assertEqual(self.titles(search="brand"), ["Brand refresh"])
+
+        soft_delete_project(self.site)
+        self.assertEqual(self.titles(search="bakery"), [])
+        self.logo.delete()
+        self.assertEqual(self.titles(search="brand"), [])
+
+    def test_rebuild_command(self):
+        Project.objects.filter(id=self.logo.id).update(title="Mascot drawing")
+        self.assertEqual(self.titles(search="mascot"), [])
+        out = StringIO()
+        call_command("rebuild_search_index", stdout=out)
+        self.assertIn("Indexed 3 project(s)", out.getvalue())
+        self.assertEqual(self.titles(search="mascot"), ["Mascot drawing"])
+
+
+from datetime import date
+from myapp import matching
+from myapp.matching import SkillMatcher, get_skill_matcher, matched_projects
+
+
+class SkillMatcherTests(TestCase):
+    def setUp(self):
+        matching._matcher = None
+        self.addCleanup(setattr, matching, "_matcher", None)
+        self.client_user = User.objects.create_user(username="poster", password="pass")
+        self.python, self.django, self.css, self.rare = (
+            Skill.objects.create(name=name) for name in ("Python", "Django", "CSS", "Rust")
+        )
+        freelancer = User.objects.create_user(username="coder", password="pass")
+        self.profile = freelancer.profile
+        self.profile.role = "freelancer"
+        self.profile.save()
+        self.profile.skills.add(self.python, self.django, self.rare)
+
+    def project(self, title, skills, budget=None, deadline=None):
+        project = Project.objects.create(
+            client=self.client_user, title=title, description="d", budget=budget, deadline=deadline
+        )
+        project.skills_required.add(*skills)
+        return project
+
+    def test_ranks_by_weighted_overlap_then_budget_then_deadline(self):
+        for i in range(4):
+            self.project(f"filler {i}", [self.python])
+        both = self.project("both", [self.python, self.django])
+        rare = self.project("rare", [self.rare])
+        rich = self.project("rich", [self.python], budget=5000)
+        soon = self.project("soon", [self.python], deadline=date(2999, 1, 1))
+        self.project("css only", [self.css])
+        self.project("expired", [self.python, self.django, self.rare], deadline=date(2000, 1, 1))
+
+        titles = [p.title for p in matched_projects(self.profile, k=5)]
+        # A rare skill outweighs a common one, whatever the budget
+        self.assertEqual(titles, ["both", "rare", "rich", "soon", "filler 3"])
+        self.assertEqual(matched_projects(self.profile, k=0), [])
+
+    def test_signals_keep_a_loaded_matcher_current(self):
+        project = self.project("later", [self.css])
+        get_skill_matcher()
+        self.assertEqual(matched_projects(self.profile), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            project.skills_required.add(self.django)
+        self.assertEqual(matched_projects(self.profile), [project])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            project.deadline = date(2000, 1, 1)
+            project.save()
+        self.assertEqual(matched_projects(self.profile), [])
+
+        fresh = self.project("fresh", [self.python])
+        with self.captureOnCommitCallbacks(execute=True):
+            fresh.save()
+        self.assertEqual(matched_projects(self.profile), [fresh])
+        soft_delete_project(fresh)
+        self.assertEqual(get_skill_matcher().match([self.python.id]), [])
+
+    def test_hard_delete_unmatches_on_commit(self):
+        project = self.project("doomed", [self.python])
+        get_skill_matcher()
+
+        class Abort(Exception):
+            pass
+
+        try:
+            with transaction.atomic():
+                Project.all_objects.get(id=project.id).delete()
+                raise Abort
+        except Abort:
+            pass
+        self.assertEqual(matched_projects(self.profile), [project])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            project.delete()
+        self.assertEqual(matched_projects(self.profile), [])
+
+    def test_sync_picks_up_other_processes(self):
+        matcher = SkillMatcher()
+        matcher.load()
+        project = self.project("elsewhere", [self.python])
+        self.assertEqual(matcher.match([self.python.id]), [])
+        matcher.sync()
+        self.assertEqual([pid for pid, _ in matcher.match([self.python.id])], [project.id])
+
+        Project.objects.filter(id=project.id).update(deleted_at=timezone.now(), updated_at=timezone.now())
+        matcher.sync()
+        self.assertEqual(len(matcher), 0)
+
+    def test_dashboard_shows_best_matches(self):
+        project = self.project("match", [self.django])
+        self.client.login(username="coder", password="pass")
+        response = self.client.get(reverse("freelancer_dashboard"))
+        self.assertEqual(response.context["best_matches"], [project])
+        self.assertContains(response, "Best matches for your skills")
+
+
+class MatchBenchmarkCommandTests(TestCase):
+    def test_runs(self):
+        out = StringIO()
+        call_command("match_benchmark", projects=2000, queries=5, stdout=out)
+        self.assertIn("Indexed 2000 project(s)", out.getvalue())
+
+
+from decimal import Decimal
+from myapp.views import FreelancerViewSet
+
+
+class FreelancerDiscoveryTests(TestCase):
+    def setUp(self):
+        self.hirer = User.objects.create_user(username="hirer", password="pass")
+        self.python, self.django = Skill.objects.create(name="Python"), Skill.objects.create(name="Django")
+        self.ann = self.freelancer("ann", [self.python, self.django], rate=40, location="Pune")
+        self.bob = self.freelancer("bob", [self.python], rate=25, location="Delhi")
+        self.cat = self.freelancer("cat", [self.python], rate=60, location="pune")
+        self.dan = self.freelancer("dan", [self.python], rate=30, available=False)
+        self.eve = self.freelancer("eve", [], rate=20)
+
+    def freelancer(self, username, skills, rate, location="", available=True):
+        profile = User.objects.create_user(username=username, password="pass").profile
+        profile.role, profile.hourly_rate = "freelancer", rate
+        profile.location, profile.availability = location, available
+        profile.save()
+        profile.skills.add(*skills)
+        return profile
+
+    def review(self, freelancer, rating):
+        project = Project.objects.create(client=self.hirer, title="Job", description="d")
+        proposal = Proposal.objects.create(project=project, freelancer=freelancer, cover_letter="c", bid_amount=1)
+        Contract.objects.create(
+            project=project, proposal=proposal, client=self.hirer.profile, freelancer=freelancer, status="COMPLETED"
+        )
+        return Review.objects.create(project=project, reviewer_name="hirer", rating=rating)
+
+    def get(self, **params):
+        request = APIRequestFactory().get("/api/freelancers/", params)
+        force_authenticate(request, self.hirer)
+        return FreelancerViewSet.as_view({"get": "list"})(request).data
+
+    def usernames(self, **params):
+        return [row["username"] for row in self.get(**params)["results"]]
+
+    def test_ratings_are_precomputed_from_reviews(self):
+        self.review(self.cat, 5)
+        review = self.review(self.cat, 4)
+        self.cat.refresh_from_db()
+        self.assertEqual((self.cat.rating_count, self.cat.rating_average), (2, Decimal("4.50")))
+
+        review.rating = 2
+        review.save()
+        review.delete()
+        self.cat.refresh_from_db()
+        self.assertEqual((self.cat.rating_count, self.cat.rating_average), (1, Decimal("5.00")))
+
+        # A plain save can't overwrite the aggregates
+        stale = Profile.objects.get(id=self.cat.id)
+        self.review(self.cat, 1)
+        stale.save()
+        self.assertEqual(Profile.objects.get(id=self.cat.id).rating_count, 2)
+
+    def test_ranking_and_filters(self):
+        self.review(self.bob, 3)
+        self.review(self.cat, 5)
+        # Available first, then best rated
+        self.assertEqual(self.usernames(), ["cat", "bob", "eve", "ann", "dan"])
+        # Skill matches first; freelancers matching none are left out
+        self.assertEqual(self.usernames(skills="python,DJANGO"), ["ann", "cat", "bob", "dan"])
+        self.assertEqual(self.usernames(skills=str(self.django.id)), ["ann"])
+        self.assertEqual(self.usernames(skills="cobol"), [])
+        self.assertEqual(self.usernames(min_rate=25, max_rate=40), ["bob", "ann", "dan"])
+        self.assertEqual(self.usernames(location=" PUNE", available="true"), ["cat", "ann"])
+
+        [ann] = self.get(skills="python,django")["results"][:1]
+        self.assertEqual(ann["matched_skills"], 2)
+        self.assertEqual({s["name"] for s in ann["skills"]}, {"Python", "Django"})
+        self.assertNotIn("unread_notifications", ann)
+
+    def test_keyset_pages_without_n_plus_one(self):
+        self.review(self.bob, 3)
+        for params in ({}, {"skills": "python"}):
+            seen, cursor = [], None
+            while True:
+                with self.assertNumQueries(4 if params else 3):
+                    page = self.get(page_size=2, **params, **({"cursor": cursor} if cursor else {}))
+                seen += [row["username"] for row in page["results"]]
+                cursor = page["next_cursor"]
+                if not cursor:
+                    break
+            self.assertEqual(seen, self.usernames(page_size=10, **params))
+        self.assertEqual(self.usernames(cursor="bogus"), self.usernames())
+
+
+from importlib import import_module
+from django.apps import apps as global_apps
+from django.db import IntegrityError, transaction
+from myapp.forms import ProfileForm
+
+
+class CanonicalSkillTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="skilled", password="pass")
+        self.profile = self.user.profile
+
+    def test_names_differing_by_case_share_a_row(self):
+        Skill.objects.create(name="  Python ")
+        self.assertEqual(Skill.objects.get().name, "Python")
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Skill.objects.create(name="python")
+
+    def test_resolve_reuses_and_creates_in_order(self):
+        python = Skill.objects.create(name="Python")
+        skills = Skill.objects.resolve(["python ", "Machine  Learning", "PYTHON", "", "machine learning"])
+        self.assertEqual([s.name for s in skills], ["Python", "Machine Learning"])
+        self.assertEqual(skills[0], python)
+        self.assertEqual(Skill.objects.count(), 2)
+
+    def test_profile_form_updates_skills_in_bulk(self):
+        names = [f"Skill {i}" for i in range(15)]
+        self.profile.skills.set(Skill.objects.resolve(names[:10]))
+        form = ProfileForm(
+            data={"name": "S", "skills_text": ", ".join(names[5:]), "availability": "on"},
+            instance=self.profile,
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        # profile UPDATE, resolve (3) and the set difference (4)
+        with self.assertNumQueries(8):
+            form.save()
+        self.assertEqual(sorted(self.profile.skills.values_list("name", flat=True)), sorted(names[5:]))
+
+    def test_create_project_resolves_skills(self):
+        Skill.objects.create(name="Django")
+        self.client.login(username="skilled", password="pass")
+        self.client.post(reverse("create_project"), {
+            "title": "Shop", "description": "d", "budget": "100", "skills_text": "django, Django , React",
+        })
+        project = Project.objects.get(title="Shop")
+        self.assertEqual(sorted(project.skills_required.values_list("name", flat=True)), ["Django", "React"])
+        self.assertEqual(Skill.objects.count(), 2)
+
+    def test_migration_merges_duplicates(self):
+        migration = import_module("myapp.migrations.0018_canonical_skills")
+        # bulk_create skips save(), so these slip past the index as they
+        # did before it; case-only duplicates are folded the same way
+        first = Skill.objects.create(name="Python")
+        second = Skill.objects.bulk_create([Skill(name="python "), Skill(name=" PYTHON")])
+        other = User.objects.create_user(username="other").profile
+        self.profile.skills.add(first, second[0])
+        other.skills.add(second[1])
+        project = Project.objects.create(client=self.user, title="P", description="d")
+        project.skills_required.add(second[0])
+
+        migration.merge_duplicate_skills(global_apps, None)
+
+        self.assertEqual(list(Skill.objects.values_list("id", "name")), [(first.id, "Python")])
+        self.assertEqual(list(self.profile.skills.all()), [first])
+        self.assertEqual(list(other.skills.all()), [first])
+        self.assertEqual(list(project.skills_required.all()), [first])
+
+
+from datetime import date
+from myapp.views import ProposalViewSet
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="pager", password="pass")
+        budgets = [None, 50, 300, 300, None, 80, 1000]
+        self.projects = [
+            Project.objects.create(
+                client=self.user, title=f"P{i}", description="d", budget=budget,
+                deadline=date(2030, 1, 1 + i % 3) if i % 2 else None,
+            )
+            for i, budget in enumerate(budgets)
+        ]
+
+    def page(self, viewset=ProjectViewSet, **params):
+        request = APIRequestFactory().get("/api/", params)
+        force_authenticate(request, self.user)
+        return viewset.as_view({"get": "list"})(request).data
+
+    def walk(self, **params):
+        titles, cursor = [], None
+        while True:
+            page = self.page(**params, **({"cursor": cursor} if cursor else {}))
+            titles += [row["title"] for row in page["results"]]
+            cursor = page["next_cursor"]
+            if not cursor:
+                return titles
+
+    def test_default_is_newest_first(self):
+        page = self.page(page_size=3)
+        self.assertEqual([row["title"] for row in page["results"]], ["P6", "P5", "P4"])
+        self.assertNotIn("count", page)
+        self.assertEqual(self.walk(page_size=3), [f"P{i}" for i in range(6, -1, -1)])
+
+    def test_ordering_fields_with_nulls_last(self):
+        def expected(field, descending):
+            values = [(getattr(p, field), p.id, p.title) for p in self.projects]
+            present = sorted((v for v in values if v[0] is not None), reverse=descending)
+            missing = sorted((v for v in values if v[0] is None), reverse=descending)
+            return [title for _, _, title in present + missing]
+
+        for field in ("budget", "deadline", "created_at"):
+            for direction in ("", "-"):
+                with self.subTest(ordering=direction + field):
+                    self.assertEqual(
+                        self.walk(ordering=direction + field, page_size=2), expected(field, direction == "-")
+                    )
+
+    def test_page_size_is_bounded_and_count_opt_in(self):
+        for i in range(110):
+            Proposal.objects.create(project=self.projects[0], freelancer=self.user.profile)
+        page = self.page(ProposalViewSet, page_size=1000, count="true")
+        self.assertEqual(len(page["results"]), 100)
+        self.assertEqual(page["count"], 110)
+        with CaptureQueriesContext(connection) as ctx:
+            rest = self.page(ProposalViewSet, cursor=page["next_cursor"], page_size=1000)
+        # Seeks past the cursor instead of skipping rows
+        self.assertNotIn("OFFSET", ctx.captured_queries[0]["sql"])
+        self.assertIn('"myapp_proposal"."created_at" <', ctx.captured_queries[0]["sql"])
+        self.assertEqual(len(rest["results"]), 10)
+        self.assertIsNone(rest["next_cursor"])
+
+    def test_ranked_search_pages_by_offset(self):
+        for i in range(3):
+            Project.objects.create(client=self.user, title=f"Logo {i}", description="d")
+        first = self.page(search="logo", page_size=2)
+        second = self.page(search="logo", page_size=2, cursor=first["next_cursor"])
+        titles = [row["title"] for row in first["results"] + second["results"]]
+        self.assertEqual(sorted(titles), ["Logo 0", "Logo 1", "Logo 2"])
+        self.assertIsNone(second["next_cursor"])
+
+
+import json
+from myapp.views import FreelancerViewSet
+
+
+class SparseFieldsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="sparse", password="pass")
+        self.profile = self.user.profile
+        self.skills = Skill.objects.resolve(["Python", "Django", "CSS"])
+        for i in range(6):
+            project = Project.objects.create(
+                client=self.user, title=f"Project {i}", description="Long brief. " * 200, budget=100 + i
+            )
+            project.skills_required.add(*self.skills[:1 + i % 3])
+            Proposal.objects.create(project=project, freelancer=self.profile)
+
+    def get(self, viewset, **params):
+        request = APIRequestFactory().get("/api/", params)
+        force_authenticate(request, self.user)
+        response = viewset.as_view({"get": "list"})(request)
+        response.render()
+        return response
+
+    def test_fields_narrow_the_payload_and_the_select(self):
+        full = self.get(ProjectViewSet)
+        with CaptureQueriesContext(connection) as ctx:
+            narrow = self.get(ProjectViewSet, fields="id,title,budget")
+        rows = json.loads(narrow.content)["results"]
+        self.assertEqual(set(rows[0]), {"id", "title", "budget"})
+        self.assertEqual(rows[0]["title"], "Project 5")
+        self.assertLess(len(narrow.content) * 10, len(full.content))
+        self.assertNotIn('"description"', " ".join(q["sql"] for q in ctx.captured_queries))
+
+    def test_expand_loads_relations_in_fixed_queries(self):
+        def queries(**params):
+            with CaptureQueriesContext(connection) as ctx:
+                data = json.loads(self.get(ProjectViewSet, **params).content)["results"]
+            return len(ctx.captured_queries), data
+
+        count, data = queries(fields="id,client,skills_required", expand="client,skills_required")
+        self.assertEqual(data[0]["client"], {"id": self.user.id, "username": "sparse"})
+        self.assertEqual([s["name"] for s in data[0]["skills_required"]], ["Python", "Django", "CSS"])
+        Project.objects.create(client=self.user, title="More", description="d").skills_required.add(self.skills[0])
+        self.assertEqual(queries(fields="id,client,skills_required", expand="client,skills_required")[0], count)
+        # Unexpanded relations render as keys, still without a query per row
+        self.assertEqual(queries()[0], count)
+
+    def test_proposals_expand_project(self):
+        with self.assertNumQueries(1):
+            rows = json.loads(self.get(ProposalViewSet, expand="project", fields="id,freelancer,project").content)
+        row = rows["results"][0]
+        self.assertEqual(row["freelancer"], "sparse")
+        self.assertEqual(set(row["project"]), {"id", "title", "budget", "deadline"})
+
+    def test_freelancer_fields_keep_the_cursor(self):
+        for i in range(3):
+            profile = User.objects.create_user(username=f"free{i}").profile
+            profile.role = "freelancer"
+            profile.save()
+            profile.skills.add(self.skills[i])
+        first = self.get(FreelancerViewSet, fields="username,skills", page_size=2).data
+        self.assertEqual(set(first["results"][0]), {"username", "skills"})
+        second = self.get(FreelancerViewSet, fields="username", page_size=2, cursor=first["next_cursor"]).data
+        names = [row["username"] for row in first["results"] + second["results"]]
+        self.assertEqual(sorted(names), ["free0", "free1", "free2"])
+
+
+from smtplib import SMTPException
+from django.core.mail.backends import locmem
+from myapp.utils import queue_email
+
+
+class FailingSendBackend(locmem.EmailBackend):
+    def send_messages(self, messages):
+        raise SMTPException("mailbox unavailable")
+
+
+class UnreachableBackend(locmem.EmailBackend):
+    def open(self):
+        raise ConnectionRefusedError("connection refused")
+
+
+class OutboxRetryTests(TestCase):
+    def setUp(self):
+        self.email = queue_email("x@x.com", "Hi", "Body")
+
+    def drain(self):
+        err = StringIO()
+        call_command("send_outbox_emails", stdout=StringIO(), stderr=err)
+        self.email.refresh_from_db()
+        return err.getvalue()
+
+    @override_settings(EMAIL_BACKEND="myapp.tests.FailingSendBackend")
+    def test_failed_send_backs_off(self):
+        self.drain()
+        self.assertEqual((self.email.status, self.email.attempts), ("pending", 1))
+        first_wait = self.email.next_attempt_at - timezone.now()
+        self.assertGreater(first_wait, timedelta(seconds=20))
+
+        # Not retried before its time
+        self.drain()
+        self.assertEqual(self.email.attempts, 1)
+
+        OutboxEmail.objects.update(next_attempt_at=timezone.now())
+        self.drain()
+        self.assertEqual(self.email.attempts, 2)
+        self.assertGreater(self.email.next_attempt_at - timezone.now(), first_wait)
+
+    @override_settings(EMAIL_BACKEND="myapp.tests.UnreachableBackend")
+    def test_unreachable_server_requeues_the_batch(self):
+        self.assertIn("Mail server unavailable", self.drain())
+        self.assertEqual((self.email.status, self.email.attempts), ("pending", 0))
+        self.assertGreater(self.email.next_attempt_at, timezone.now())
+        self.assertIn("connection refused", self.email.last_error)
+
+        with override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend"):
+            OutboxEmail.objects.update(next_attempt_at=timezone.now())
+            self.drain()
+        self.assertEqual(self.email.status, "sent")
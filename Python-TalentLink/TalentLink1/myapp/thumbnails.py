@@ -0,0 +1,170 @@
+# myapp/thumbnails.py
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.urls import reverse
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .storage import blob_storage, content_key
+
+logger = logging.getLogger(__name__)
+
+# preset -> (widths to render, square crop?)
+PRESETS = {
+    "avatar": ((64, 128, 256), True),
+    "chat": ((320, 640), False),
+}
+# Preferred first; templates offer WebP with a JPEG fallback
+FORMATS = {"webp": ("WEBP", "image/webp"), "jpg": ("JPEG", "image/jpeg")}
+QUALITY = 80
+
+_executor = None
+_executor_lock = threading.Lock()
+_in_flight = set()
+
+
+def derivative_dir(name):
+    # Keyed by the source's content hash: identical uploads share thumbnails
+    key = content_key(name)
+    return f"derivatives/{key[:2]}/{key}"
+
+
+def derivative_name(name, preset, width, fmt):
+    return f"{derivative_dir(name)}/{preset}-{width}.{fmt}"
+
+
+def derivatives_ready(name, preset):
+    # generate_derivatives() writes the widest JPEG last
+    widths, _ = PRESETS[preset]
+    return blob_storage.exists(derivative_name(name, preset, widths[-1], "jpg"))
+
+
+def discard_derivatives(name):
+    shutil.rmtree(blob_storage.path(derivative_dir(name)), ignore_errors=True)
+
+
+def generate_derivatives(name, preset):
+    """
+    Renders every width and format of preset for stored image name.
+    EXIF orientation is applied, then all metadata (EXIF, ICC, XMP) is
+    left behind. Returns the number of files written; unreadable or
+    oversized images are logged and skipped.
+    """
+    widths, crop = PRESETS[preset]
+    missing = [
+        (width, fmt) for width in widths for fmt in FORMATS
+        if not blob_storage.exists(derivative_name(name, preset, width, fmt))
+    ]
+    if not missing:
+        return 0
+
+    try:
+        with blob_storage.open(name) as source, Image.open(source) as image:
+            image = ImageOps.exif_transpose(image)
+            image.load()
+    except FileNotFoundError:
+        # Collected before the queued render got to it
+        return 0
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as exc:
+        logger.warning("Cannot make thumbnails of %s: %s", name, exc)
+        return 0
+
+    if image.mode not in ("RGB", "RGBA"):
+        has_alpha = "transparency" in image.info or image.mode in ("LA", "PA")
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+    written = 0
+    for width, fmt in missing:
+        if crop:
+            resized = ImageOps.fit(image, (width, width), Image.Resampling.LANCZOS)
+        else:
+            resized = image.copy()
+            resized.thumbnail((width, width * 4), Image.Resampling.LANCZOS)
+        pil_format, _ = FORMATS[fmt]
+        if pil_format == "JPEG" and resized.mode == "RGBA":
+            background = Image.new("RGB", resized.size, (255, 255, 255))
+            background.paste(resized, mask=resized.getchannel("A"))
+            resized = background
+        _write(derivative_name(name, preset, width, fmt), resized, pil_format)
+        written += 1
+    return written
+
+
+def _write(name, image, pil_format):
+    # A fresh Image carries no exif/icc, and none are passed to save()
+    path = blob_storage.path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    options = {"quality": QUALITY}
+    if pil_format == "JPEG":
+        options.update(optimize=True, progressive=True)
+    else:
+        options.update(method=4)
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), delete=False) as tmp:
+        try:
+            image.save(tmp, pil_format, **options)
+        except BaseException:
+            tmp.close()
+            os.unlink(tmp.name)
+            raise
+    os.replace(tmp.name, path)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "THUMBNAIL_WORKERS", 2),
+                thread_name_prefix="thumbnails",
+            )
+        return _executor
+
+
+def schedule_derivatives(name, preset):
+    """
+    Generates the derivatives on a background thread so no request waits
+    on Pillow. Returns the Future, or None when the job is already queued.
+    """
+    job = (name, preset)
+    with _executor_lock:
+        if job in _in_flight:
+            return None
+        _in_flight.add(job)
+
+    def run():
+        try:
+            return generate_derivatives(name, preset)
+        finally:
+            with _executor_lock:
+                _in_flight.discard(job)
+
+    return _get_executor().submit(run)
+
+
+def derivative_urls(source, preset):
+    """
+    {fmt: [(url, width), ...]} for a Message image or an avatar
+    FieldFile, or None when the avatar's thumbnails aren't rendered yet
+    (they are queued, and the caller should fall back to the original).
+
+    Message images are private to the contract, so their thumbnails go
+    through attachment_thumbnail, which does its own fallback; avatars
+    are served straight from MEDIA_URL.
+    """
+    widths, _ = PRESETS[preset]
+    if hasattr(source, "contract_id"):
+        def url(width, fmt):
+            return reverse("attachment_thumbnail", args=[source.id, width, fmt])
+    else:
+        if not derivatives_ready(source.name, preset):
+            schedule_derivatives(source.name, preset)
+            return None
+
+        def url(width, fmt):
+            return blob_storage.url(derivative_name(source.name, preset, width, fmt))
+    return {fmt: [(url(width, fmt), width) for width in widths] for fmt in FORMATS}
@@ -0,0 +1,220 @@
+# myapp/uploads.py
+import mimetypes
+import os
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils import timezone
+from django.utils.encoding import iri_to_uri
+from django.utils.http import content_disposition_header
+
+from .models import ChunkedUpload
+from .storage import blob_storage, content_key
+
+STREAM_BLOCK_SIZE = 64 * 1024
+CONTENT_RANGE_RE = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class ChunkConflict(Exception):
+    """
+    The chunk doesn't start where the upload left off; the client should
+    resume from offset.
+    """
+
+    def __init__(self, offset):
+        super().__init__(f"Expected a chunk starting at byte {offset}")
+        self.offset = offset
+
+
+class PartFile(File):
+    """
+    An assembled upload on local disk. Exposing its path lets the blob
+    storage hash and move it instead of copying it again.
+    """
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+# ---------------- Chunked uploads ----------------
+def part_path(upload):
+    return blob_storage.path(f".incoming/uploads/{upload.id}.part")
+
+
+def parse_content_range(header):
+    """
+    (start, end, total) from "bytes start-end/total", or None.
+    """
+    match = CONTENT_RANGE_RE.match(header or "")
+    if not match:
+        return None
+    start, end, total = (int(group) for group in match.groups())
+    if start > end or end >= total:
+        return None
+    return start, end, total
+
+
+def append_chunk(upload_id, start, length, stream):
+    """
+    Writes length bytes read from stream at byte start of the upload,
+    STREAM_BLOCK_SIZE at a time, and returns the upload with its new
+    offset. Raises ChunkConflict unless start is the current offset, so
+    a retried or duplicated chunk can never corrupt the file.
+
+    No transaction is open while the body streams in: the chunk is
+    written in place first, then offset moves from start to start +
+    length only if nothing else moved it meanwhile. Of two copies of the
+    same chunk one wins; the other wrote the same bytes to the same range.
+    """
+    upload = ChunkedUpload.objects.get(id=upload_id)
+    if start != upload.offset or start + length > upload.size:
+        raise ChunkConflict(upload.offset)
+
+    path = part_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Never truncated: past offset there may be a concurrent copy of this
+    # chunk, or the next one, being written; bytes left by a request that
+    # died midway are overwritten when the range is sent again
+    with os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT, 0o666), "wb") as part:
+        part.seek(start)
+        remaining = length
+        while remaining:
+            block = stream.read(min(STREAM_BLOCK_SIZE, remaining))
+            if not block:
+                raise ChunkConflict(upload.offset)
+            part.write(block)
+            remaining -= len(block)
+
+    now = timezone.now()
+    if not ChunkedUpload.objects.filter(id=upload.id, offset=start).update(offset=start + length, updated_at=now):
+        upload.refresh_from_db(fields=["offset"])
+        raise ChunkConflict(upload.offset)
+    upload.offset = start + length
+    upload.updated_at = now
+    return upload
+
+
+def discard_upload(upload):
+    try:
+        os.unlink(part_path(upload))
+    except FileNotFoundError:
+        pass
+    upload.delete()
+
+
+def discard_stale_uploads(max_age=timedelta(days=1)):
+    stale = list(ChunkedUpload.objects.filter(updated_at__lt=timezone.now() - max_age))
+    for upload in stale:
+        discard_upload(upload)
+    return len(stale)
+
+
+# ---------------- Downloads ----------------
+class RangedFile:
+    """
+    Read-only view of length bytes of an open file from its current
+    position, for FileResponse to stream.
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b""
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """
+    (start, end) for a single "bytes=" range, None to send the whole file
+    (no header, or several ranges), or "invalid" when it can't be satisfied.
+    """
+    if not header:
+        return None
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if first == "" and last == "":
+        return None
+    if first == "":
+        length = int(last)
+        if length == 0:
+            return "invalid"
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return "invalid"
+    return start, end
+
+
+def blob_response(request, name, download_name, as_attachment=True):
+    """
+    Sends stored file name as an attachment called download_name (or
+    inline, for images shown in the page).
+
+    With MEDIA_X_ACCEL_REDIRECT_PREFIX (nginx) or MEDIA_X_SENDFILE
+    (Apache/lighttpd) the front proxy streams the file and handles Range
+    itself. Otherwise FileResponse streams it here, honouring a single
+    Range. Blob names are content hashes, so they double as strong ETags.
+    """
+    etag = f'"{content_key(name)}"'
+    if request.headers.get("If-None-Match") == etag:
+        return HttpResponseNotModified()
+
+    content_type = mimetypes.guess_type(download_name)[0] or "application/octet-stream"
+    accel_prefix = getattr(settings, "MEDIA_X_ACCEL_REDIRECT_PREFIX", "")
+    if accel_prefix or getattr(settings, "MEDIA_X_SENDFILE", False):
+        response = HttpResponse(content_type=content_type)
+        if accel_prefix:
+            response["X-Accel-Redirect"] = iri_to_uri(f"{accel_prefix.rstrip('/')}/{name}")
+        else:
+            response["X-Sendfile"] = blob_storage.path(name)
+        response["Content-Disposition"] = content_disposition_header(as_attachment, download_name)
+    else:
+        path = blob_storage.path(name)
+        size = os.path.getsize(path)
+        byte_range = parse_range(request.headers.get("Range"), size)
+        if_range = request.headers.get("If-Range")
+        if if_range and if_range != etag:
+            byte_range = None
+
+        if byte_range == "invalid":
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+
+        file = open(path, "rb")
+        if byte_range is None:
+            response = FileResponse(file, as_attachment=as_attachment, filename=download_name, content_type=content_type)
+        else:
+            start, end = byte_range
+            file.seek(start)
+            response = FileResponse(
+                RangedFile(file, end - start + 1),
+                status=206,
+                as_attachment=as_attachment,
+                filename=download_name,
+                content_type=content_type,
+            )
+            response["Content-Range"] = f"bytes {start}-{end}/{size}"
+            response["Content-Length"] = str(end - start + 1)
+        response["Accept-Ranges"] = "bytes"
+
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, max-age=3600"
+    return response
@@ -17,6 +17,7 @@ router.register("projects", ProjectViewSet, basename="projects")
 
 router.register(r'api/projects', views.ProjectViewSet, basename='api-projects')
 router.register(r'api/proposals', views.ProposalViewSet, basename='api-proposals')
+router.register(r'freelancers', views.FreelancerViewSet, basename='freelancers')
 
 # ------------------- URL PATTERNS -------------------
 urlpatterns = [
@@ -40,11 +41,21 @@ urlpatterns = [
     path("project/<int:pk>/delete/", views.delete_project, name="delete_project"),
     path('notification/read/<int:notif_id>/', views.mark_notification_read, name='mark_notification_read'),
     path('contract/<int:contract_id>/chat/', views.contract_chat, name='contract_chat'),
+    path('contract/<int:contract_id>/chat/history/', views.chat_history, name='chat_history'),
+    path('contract/<int:contract_id>/chat/updates/', views.chat_updates, name='chat_updates'),
+    path('contract/<int:contract_id>/chat/search/', views.chat_search, name='chat_search'),
+    path('contract/<int:contract_id>/chat/read/', views.chat_read, name='chat_read'),
     
     path('contract/<int:contract_id>/clear/', views.clear_chat, name='clear_chat'),
 
     path("send_message/", views.send_message, name="send_message"),
+    path("uploads/", views.start_upload, name="start_upload"),
+    path("uploads/<uuid:upload_id>/", views.upload_chunk, name="upload_chunk"),
+    path("uploads/<uuid:upload_id>/complete/", views.complete_upload, name="complete_upload"),
+    path("messages/<int:message_id>/attachment/", views.download_attachment, name="download_attachment"),
+    path("messages/<int:message_id>/thumbnail/<int:width>.<str:fmt>", views.attachment_thumbnail, name="attachment_thumbnail"),
     path("notifications/", views.get_notifications, name="get_notifications"),
+    path("notifications/stream/", views.notification_stream, name="notification_stream"),
     path("notification/read/<int:id>/", views.read_notification, name="read_notification"),
     path('proposal/<int:proposal_id>/accept/', views.accept_proposal, name='accept_proposal'),
     path('proposal/<int:proposal_id>/reject/', views.reject_proposal, name='reject_proposal'),
@@ -65,15 +76,18 @@ urlpatterns = [
 
     # ---------------- FREELANCER ----------------
     path("freelancer/dashboard/", views.freelancer_dashboard, name="freelancer_dashboard"),
+    path("freelancer/projects/feed/", views.project_feed, name="project_feed"),
     path("project/<int:project_id>/", views.project_detail, name="project_detail"),
     path("review/<int:project_id>/<int:reviewee_id>/", views.leave_review, name="leave_review"),
 
     # ---------------- NOTIFICATIONS ----------------
     path("notifications/", views.notifications, name="notifications"),
+    path("notifications/history/", views.notifications, name="notification_history"),
     path("notifications/read/<int:notif_id>/", views.mark_notification_read, name="mark_notification_read"),
     path("notification/read/<int:id>/", views.read_notification, name="read_notification"),
     # Delete all notifications for logged-in user
     path('notifications/clear_all/', views.clear_all_notifications, name='clear_all_notifications'),
+    path('notifications/read_all/', views.mark_all_notifications_read, name='mark_all_notifications_read'),
 
     path('project/<int:pk>/', views.project_detail, name='project_detail'),
     path('contract/<int:contract_id>/submit_review/', views.submit_review, name='submit_review'),
@@ -1,25 +1,312 @@
 # myapp/utils.py
-from django.core.mail import send_mail
-from .models import Notification
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models import (
+    Avg, CharField, Count, DecimalField, F, OuterRef, Subquery, Value,
+)
+from django.db.models.functions import Cast, Coalesce, Concat, Greatest, Round
+from django.utils import timezone
+from .models import Notification, OutboxEmail, Profile, Review
+from .cache import invalidate_dashboards
+from .events import hub
+
+NOTIFICATION_FROM_EMAIL = "noreply@yourapp.com"
+
 
 def send_notification(user, message, email_placeholder=False):
     # Save in-app notification
     Notification.objects.create(user=user, message=message)
 
-    # Email placeholder (won’t actually send in dev)
-    if email_placeholder:
-        send_mail(
-            subject="Notification",
-            message=message,
-            from_email="noreply@yourapp.com",
-            recipient_list=[user.email],
-            fail_silently=True
+    # Email goes through the outbox; the send_outbox_emails worker sends it
+    if email_placeholder and user.email:
+        queue_email(user.email, "Notification", message)
+
+
+def queue_email(recipient, subject, body, from_email=NOTIFICATION_FROM_EMAIL):
+    return OutboxEmail.objects.create(
+        recipient=recipient, subject=subject, body=body, from_email=from_email
+    )
+
+
+def send_bulk_notification(users, message, email=False):
+    """
+    Fan-out of one message to many users: a single bulk INSERT for the
+    notifications (and one for the outbox emails) instead of N round-trips.
+    bulk_create skips post_save, so the counters, dashboard cache and live
+    push that the signals handle for single rows are updated here in bulk.
+    """
+    users = list(users)
+    notifications = Notification.objects.bulk_create(
+        [Notification(user=user, message=message) for user in users],
+        batch_size=500,
+    )
+    if email:
+        OutboxEmail.objects.bulk_create(
+            [
+                OutboxEmail(
+                    recipient=user.email,
+                    subject="Notification",
+                    body=message,
+                    from_email=NOTIFICATION_FROM_EMAIL,
+                )
+                for user in users if user.email
+            ],
+            batch_size=500,
         )
-# myapp/utils.py
-from .models import Notification
+    notifications_created(notifications)
+    return notifications
+
+
+def notifications_created(notifications):
+    """
+    Bookkeeping for notifications inserted without post_save signals.
+    """
+    per_user = Counter(n.user_id for n in notifications)
+    by_count = {}
+    for user_id, count in per_user.items():
+        by_count.setdefault(count, []).append(user_id)
+    for count, user_ids in by_count.items():
+        Profile.objects.filter(user_id__in=user_ids).update(
+            unread_notifications=F("unread_notifications") + count
+        )
+
+    invalidate_dashboards(*per_user)
+
+    events = [(n.user_id, {"id": n.id, "message": n.message}) for n in notifications if n.id]
+    transaction.on_commit(lambda: [hub.publish(user_id, event) for user_id, event in events])
+
+
+def notify_matching_freelancers(project):
+    """
+    Tells every available freelancer who has one of the project's
+    required skills that it was posted.
+    """
+    freelancers = User.objects.filter(
+        profile__role="freelancer",
+        profile__availability=True,
+        profile__skills__in=project.skills_required.all(),
+    ).exclude(id=project.client_id).distinct()
+    return send_bulk_notification(
+        freelancers, f"New project matching your skills: '{project.title}'"
+    )
+
 
 def notify_user(user, message):
     """
     Creates a notification for the given user.
     """
     Notification.objects.create(user=user, message=message)
+
+
+def contract_review_map(contracts, reviewer_name=None):
+    """
+    Maps contract.id -> Review (or None) for every contract in one query.
+
+    Reviews are keyed by (project, reviewer_name). Pass reviewer_name when the
+    same user wrote every review (client side); leave it as None to use each
+    contract's client username (freelancer side). When several reviews match a
+    pair the earliest one wins, like the old per-contract .first() lookups.
+    """
+    contracts = list(contracts)
+
+    def reviewer_for(contract):
+        if reviewer_name is not None:
+            return reviewer_name
+        return contract.client.user.username if contract.client else None
+
+    pairs = {c.id: (c.project_id, reviewer_for(c)) for c in contracts}
+    project_ids = {project_id for project_id, _ in pairs.values()}
+    reviewer_names = {name for _, name in pairs.values() if name is not None}
+
+    reviews = {}
+    if project_ids and reviewer_names:
+        for review in Review.objects.filter(
+            project_id__in=project_ids,
+            reviewer_name__in=reviewer_names,
+        ).order_by("pk"):
+            reviews.setdefault((review.project_id, review.reviewer_name), review)
+
+    return {contract_id: reviews.get(pair) for contract_id, pair in pairs.items()}
+
+
+# ---------------- Freelancer rating aggregates ----------------
+def freelancer_rating_subquery(aggregate):
+    """
+    aggregate over the reviews of the outer Profile as a freelancer: those
+    written by the client of one of its contracts, on that contract's
+    project.
+    """
+    reviews = (
+        Review.objects.filter(
+            project__contract__freelancer=OuterRef("pk"),
+            reviewer_name=F("project__contract__client__user__username"),
+        )
+        .order_by()
+        .values("project__contract__freelancer")
+        .annotate(value=aggregate)
+        .values("value")
+    )
+    return Coalesce(Subquery(reviews), Value(0), output_field=DecimalField())
+
+
+def refresh_freelancer_ratings(profile_ids=None):
+    """
+    Recomputes rating_count and rating_average of the given profiles (all
+    freelancers when None) in one UPDATE.
+    """
+    profiles = Profile.objects.filter(role="freelancer")
+    if profile_ids is not None:
+        profiles = profiles.filter(id__in=profile_ids)
+    return profiles.update(
+        rating_count=freelancer_rating_subquery(Count("id")),
+        # Rounded as stored, so keyset cursors compare equal
+        rating_average=freelancer_rating_subquery(Round(Avg("rating"), 2)),
+    )
+
+
+# ---------------- Unread notification counters ----------------
+def adjust_unread_count(user_id, delta):
+    """
+    Atomically moves a user's unread counter by delta (never below zero).
+    """
+    if delta:
+        Profile.objects.filter(user_id=user_id).update(
+            unread_notifications=Greatest(F("unread_notifications") + delta, 0)
+        )
+
+
+def unread_notification_count(user):
+    """
+    O(1) read of the denormalized counter, always straight from the row.
+    """
+    return Profile.objects.filter(user=user).values_list(
+        "unread_notifications", flat=True
+    ).first() or 0
+
+
+def notification_state(user):
+    """
+    (unread_count, latest_notification_id, latest_created_at) in one
+    query: the counter from the profile row plus index-only MAX(id) and
+    MAX(created_at) over the user's notifications. A coalesced chat
+    notification only moves the last one.
+    """
+    mine = Notification.objects.filter(user_id=OuterRef("user_id"))
+    row = Profile.objects.filter(user=user).annotate(
+        latest_id=Subquery(mine.order_by("-id").values("id")[:1]),
+        latest_at=Subquery(mine.order_by("-created_at").values("created_at")[:1]),
+    ).values_list("unread_notifications", "latest_id", "latest_at").first()
+    if row is None:
+        return 0, 0, None
+    return row[0], row[1] or 0, row[2]
+
+
+def mark_notifications_read(user, ids=None):
+    """
+    Marks the user's unread notifications (or just ids) as read and moves
+    the counter by the number of rows that actually changed.
+    """
+    notifications = Notification.objects.filter(user=user, is_read=False)
+    if ids is not None:
+        notifications = notifications.filter(id__in=ids)
+
+    with transaction.atomic():
+        changed = notifications.update(is_read=True)
+        adjust_unread_count(user.id, -changed)
+
+    if changed:
+        invalidate_dashboards(user.id)
+    return changed
+
+
+def clear_notifications(user):
+    """
+    Deletes every notification of the user, keeping the counter in step
+    with any notification created concurrently.
+    """
+    delete_notifications(Notification.objects.filter(user=user))
+
+
+def delete_notifications(notifications):
+    """
+    Deletes a queryset of notifications, possibly of several users, and
+    moves each owner's counter down by the unread ones removed.
+    """
+    unread = {}
+    with transaction.atomic():
+        owners = set()
+        for user_id, is_read in list(notifications.values_list("user_id", "is_read").distinct()):
+            owners.add(user_id)
+            if not is_read:
+                # Counted per owner as deleted, not as listed, so a
+                # concurrent read isn't taken off twice
+                unread[user_id] = notifications.filter(user_id=user_id, is_read=False).delete()[0]
+                adjust_unread_count(user_id, -unread[user_id])
+        notifications.delete()
+    # No receiver watches notification deletes; drop the owners' dashboards here
+    if owners:
+        invalidate_dashboards(*owners)
+    return sum(unread.values())
+
+
+def unread_count_subquery():
+    """
+    Recomputes the unread counter in SQL for every profile of a queryset.
+    """
+    return Coalesce(
+        Subquery(
+            Notification.objects.filter(user_id=OuterRef("user_id"), is_read=False)
+            .values("user_id")
+            .annotate(total=Count("id"))
+            .values("total")
+        ),
+        0,
+    )
+
+
+# ---------------- Coalesced chat notifications ----------------
+def chat_notification_text(sender_name, contract_id, count=1):
+    if count == 1:
+        return f"New message from {sender_name} in contract {contract_id}"
+    return f"{count} new messages from {sender_name} in contract {contract_id}"
+
+
+def notify_chat_message(user, contract, sender_name):
+    """
+    Tells user about a new message on contract. A burst of messages keeps
+    one unread notification per contract: the first inserts it, the rest
+    bump its count, text and timestamp in place, so the table (and the
+    unread counter) grows by one row per burst instead of per message.
+    """
+    now = timezone.now()
+    unread = Notification.objects.filter(user=user, contract=contract, is_read=False)
+
+    def bump():
+        return unread.update(
+            count=F("count") + 1,
+            created_at=now,
+            message=Concat(
+                Cast(F("count") + 1, CharField()),
+                Value(f" new messages from {sender_name} in contract {contract.id}"),
+            ),
+        )
+
+    if not bump():
+        try:
+            with transaction.atomic():
+                # post_save counts it as unread, drops dashboards and pushes it
+                return Notification.objects.create(
+                    user=user, contract=contract, message=chat_notification_text(sender_name, contract.id)
+                )
+        except IntegrityError:
+            # A concurrent message inserted it first
+            bump()
+
+    notification = unread.first()
+    invalidate_dashboards(user.id)
+    if notification is not None:
+        event = {"id": notification.id, "message": notification.message, "count": notification.count}
+        transaction.on_commit(lambda: hub.publish(user.id, event))
+    return notification
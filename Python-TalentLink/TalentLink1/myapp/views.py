@@ -1,25 +1,63 @@
+import os
+
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.contrib.auth.models import User
-from django.http import JsonResponse, HttpResponseForbidden
+from django.http import Http404, JsonResponse, HttpResponse, HttpResponseForbidden, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
 from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition
 
-from django.db.models import Q
-from django.core.files.storage import FileSystemStorage
-from django.utils import timezone
+from django.db.models import Count, Q, Prefetch, Exists, OuterRef
+from django.db.models.functions import Lower
+from django.urls import reverse
+from django.utils.dateparse import parse_datetime
 
 from rest_framework import viewsets, filters
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 
-from .models import Profile, Project, Proposal, Contract, Message, Review, Notification
+from .models import (
+    Profile, Project, Proposal, Contract, Message, Review, Notification, NotificationArchive, ChunkedUpload,
+)
 from .forms import ProjectForm, ReviewForm
 from .decorators import client_required, freelancer_required
-from .serializers import ProjectSerializer, ProposalSerializer
-from .filters import ProjectFilter
+from .serializers import FreelancerSerializer, ProjectSerializer, ProposalSerializer
+from .filters import FreelancerFilter, ProjectFilter, ProjectSearchFilter
+from .utils import (
+    contract_review_map,
+    mark_notifications_read,
+    clear_notifications,
+    unread_notification_count,
+    notification_state,
+)
+from .cache import get_dashboard_context, invalidate_dashboards
+from .matching import matched_projects
+from .pagination import keyset_page, keyset_page_by, bounded_page_size
+from .events import notification_events
+from .chat import chat_message_item, mark_chat_read, post_chat_message, unread_chat_counts
+from .purge import clear_chat_history, soft_delete_project
+from .search import search_messages
+from .storage import blob_storage
+from .thumbnails import (
+    FORMATS as THUMBNAIL_FORMATS,
+    PRESETS as THUMBNAIL_PRESETS,
+    derivative_name,
+    schedule_derivatives,
+)
+from .uploads import (
+    ChunkConflict,
+    PartFile,
+    append_chunk,
+    blob_response,
+    discard_upload,
+    parse_content_range,
+    part_path,
+)
 
 # ===========================
 # PUBLIC
@@ -119,43 +157,61 @@ def root_redirect(request):
     return redirect("freelancer_dashboard")
 
 
+# Dashboards show only the newest notifications; the rest are on the history page
+DASHBOARD_NOTIFICATIONS = 20
+
+
 # ===========================
 # CLIENT DASHBOARD
 # ===========================
-@login_required
-@client_required
-def client_dashboard(request):
-    user = request.user
+def _client_dashboard_context(user):
     profile = user.profile
 
-    projects = Project.objects.filter(client=user)
-    proposals = Proposal.objects.filter(project__client=user)
+    projects = Project.objects.filter(client=user).prefetch_related(
+        "skills_required",
+        Prefetch(
+            "proposals",
+            queryset=Proposal.objects.select_related(
+                "freelancer__user", "contract"
+            ).prefetch_related("freelancer__skills"),
+        ),
+    )
+    total_proposals = Proposal.objects.filter(project__client=user).count()
 
     contracts = Contract.objects.filter(client=profile).select_related(
-        "project", "freelancer"
+        "project", "client__user", "freelancer__user"
     )
 
-    notifications = Notification.objects.filter(user=user).order_by("-created_at")
-    unread_count = notifications.filter(is_read=False).count()
+    notifications = Notification.objects.filter(user=user).order_by("-created_at")[:DASHBOARD_NOTIFICATIONS]
+    unread_count = profile.unread_notifications
 
-    # ✅ Store reviews per contract
-    contract_reviews = {}
-    for contract in contracts:
-        review = Review.objects.filter(
-            project=contract.project,
-            reviewer_name=user.username
-        ).first()
-        contract_reviews[contract.id] = review
+    # ✅ Store reviews per contract (one query for all contracts)
+    contract_reviews = contract_review_map(contracts, reviewer_name=user.username)
 
-    context = {
+    # Read pointers sit on the contract rows already loaded
+    unread_chats = sum(1 for contract in contracts if contract.has_unread(profile))
+    chat_unread = unread_chat_counts(profile) if unread_chats else {}
+
+    return {
         "projects": projects,
-        "proposals": proposals,
+        "active_projects": len(projects),
+        "total_proposals": total_proposals,
         "contracts": contracts,
         "contract_reviews": contract_reviews,
+        "unread_chats": unread_chats,
+        "chat_unread": chat_unread,
         "notifications": notifications,
         "unread_count": unread_count,
     }
 
+
+@login_required
+@client_required
+def client_dashboard(request):
+    user = request.user
+    context = get_dashboard_context(
+        "client_dashboard", user, lambda: _client_dashboard_context(user)
+    )
     return render(request, "client_dashboard.html", context)
 
 # ===========================
@@ -168,18 +224,57 @@ from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
 from .models import Project, Proposal, Contract, Review, Notification
 
-@login_required
-def freelancer_dashboard(request):
-    user = request.user
+PROJECT_FEED_PAGE_SIZE = 20
+BEST_MATCHES = 5
+
+
+def _project_feed(profile, cursor=None, page_size=PROJECT_FEED_PAGE_SIZE, match_skills=True):
+    """
+    One keyset page of the freelancer project feed, newest first.
+    Limited to projects needing one of the freelancer's skills unless
+    match_skills is False or the freelancer has listed no skills.
+    """
+    projects = Project.objects.select_related('client')
+
+    if match_skills:
+        skill_ids = list(profile.skills.values_list('id', flat=True))
+        if skill_ids:
+            projects = projects.filter(Exists(
+                Project.skills_required.through.objects.filter(
+                    project_id=OuterRef('pk'),
+                    skill_id__in=skill_ids,
+                )
+            ))
+
+    return keyset_page(projects, cursor=cursor, page_size=page_size)
+
+
+def _project_feed_item(project):
+    return {
+        "id": project.id,
+        "title": project.title,
+        "description": project.description,
+        "client": project.client.username,
+        "created_at": project.created_at.isoformat(),
+        "detail_url": reverse("project_detail", args=[project.id]),
+        "proposal_url": reverse("submit_proposal", args=[project.id]),
+    }
+
+
+def _freelancer_dashboard_context(user):
     profile = user.profile  # freelancer profile
 
-    # ✅ Projects: show all projects posted by clients
-    projects = Project.objects.all().order_by('-created_at')
+    # ✅ Projects: first page of the feed, the rest is loaded on demand
+    projects, projects_next_cursor = _project_feed(profile)
+
+    # Best matches for the freelancer's skills, from the in-memory matcher
+    best_matches = matched_projects(profile, k=BEST_MATCHES)
 
     # ✅ Proposals submitted by this freelancer
     proposals = Proposal.objects.filter(freelancer=profile).select_related(
         'project',
-        'project__client'
+        'project__client__profile',
+        'contract'
     )
 
     # ✅ Contracts where this freelancer is involved
@@ -190,29 +285,56 @@ def freelancer_dashboard(request):
     )
 
     # Map reviews to contracts
-    reviews_by_contract = {
-        c.id: Review.objects.filter(
-            project=c.project,
-            reviewer_name=c.client.user.username
-        ).first()
-        for c in contracts
-    }
+    reviews_by_contract = contract_review_map(contracts)
+
+    # Unread chats from the read pointers on the contract rows
+    unread_chats = sum(1 for contract in contracts if contract.has_unread(profile))
+    chat_unread = unread_chat_counts(profile) if unread_chats else {}
 
     # Notifications
-    notifications = Notification.objects.filter(user=user).order_by('-created_at')
-    unread_count = notifications.filter(is_read=False).count()
+    notifications = Notification.objects.filter(user=user).order_by('-created_at')[:DASHBOARD_NOTIFICATIONS]
+    unread_count = profile.unread_notifications
 
-    context = {
+    return {
         "projects": projects,
+        "projects_next_cursor": projects_next_cursor,
+        "best_matches": best_matches,
         "proposals": proposals,
         "contracts": contracts,
         "reviews_by_contract": reviews_by_contract,
+        "unread_chats": unread_chats,
+        "chat_unread": chat_unread,
         "notifications": notifications,
         "unread_count": unread_count,
     }
 
+
+@login_required
+def freelancer_dashboard(request):
+    user = request.user
+    context = get_dashboard_context(
+        "freelancer_dashboard", user, lambda: _freelancer_dashboard_context(user)
+    )
     return render(request, "freelancer_dashboard.html", context)
 
+
+@login_required
+def project_feed(request):
+    """
+    "Load more" endpoint for the freelancer dashboard project list.
+    ?cursor= continues from the previous page, ?all=1 skips skill matching.
+    """
+    projects, next_cursor = _project_feed(
+        request.user.profile,
+        cursor=request.GET.get("cursor"),
+        page_size=bounded_page_size(request.GET.get("limit"), default=PROJECT_FEED_PAGE_SIZE),
+        match_skills=request.GET.get("all") != "1",
+    )
+    return JsonResponse({
+        "projects": [_project_feed_item(p) for p in projects],
+        "next_cursor": next_cursor,
+    })
+
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from .forms import ProjectForm
@@ -239,9 +361,7 @@ def create_project(request):
             skills_raw = form.cleaned_data.get("skills_text", "")
             skills_list = [s.strip() for s in skills_raw.split(",") if s.strip()]
 
-            for skill_name in skills_list:
-                skill, _ = Skill.objects.get_or_create(name=skill_name)
-                project.skills_required.add(skill)
+            project.skills_required.add(*Skill.objects.resolve(skills_list))
 
             return redirect("client_dashboard")
 
@@ -275,7 +395,8 @@ def update_project(request, pk):
 def delete_project(request, pk):
     project = get_object_or_404(Project, pk=pk, client=request.user)
     if request.method == "POST":
-        project.delete()
+        # Returns at once; purge_deleted removes the rows in batches
+        soft_delete_project(project)
     return redirect("client_dashboard")
 
 
@@ -346,10 +467,11 @@ def accept_proposal(request, proposal_id):
         proposal.status = 'ACCEPTED'
         proposal.save()
 
-        # Reject all other proposals
-        Proposal.objects.filter(
-            project=project
-        ).exclude(id=proposal.id).update(status='REJECTED')
+        # Reject all other proposals (update() sends no signals, so drop
+        # the affected freelancers' cached dashboards by hand)
+        others = Proposal.objects.filter(project=project).exclude(id=proposal.id)
+        others.update(status='REJECTED')
+        invalidate_dashboards(*others.values_list('freelancer__user_id', flat=True))
 
         # Create contract safely
         Contract.objects.get_or_create(
@@ -407,7 +529,7 @@ def reject_proposal(request, proposal_id):
 @require_POST
 def cancel_contract(request, contract_id):
     contract = get_object_or_404(Contract, id=contract_id)
-    if request.user.profile not in [contract.client, contract.freelancer]:
+    if not contract.has_party(request.user.profile):
         return HttpResponseForbidden()
     contract.status = 'CANCELLED'
     contract.save()
@@ -418,7 +540,7 @@ def cancel_contract(request, contract_id):
 @require_POST
 def complete_contract(request, contract_id):
     contract = get_object_or_404(Contract, id=contract_id)
-    if request.user.profile not in [contract.client, contract.freelancer]:
+    if not contract.has_party(request.user.profile):
         return HttpResponseForbidden()
     contract.status = 'COMPLETED'
     contract.save()
@@ -429,11 +551,119 @@ def complete_contract(request, contract_id):
 # CONTRACT CHAT
 # ===========================
 
+CHAT_PAGE_SIZE = 50
+CHAT_SEARCH_PAGE_SIZE = 20
+# How often an open chat asks chat_updates for the other side's messages
+CHAT_POLL_INTERVAL_MS = 3000
+
+
+def _chat_messages(contract):
+    return contract.visible_messages().select_related("sender__user")
+
+
 @login_required
 def contract_chat(request, contract_id):
+    """
+    Renders the newest CHAT_PAGE_SIZE messages; older ones are fetched
+    on demand from chat_history.
+    """
     contract = get_object_or_404(Contract, id=contract_id)
-    messages = contract.messages.order_by('timestamp')
-    return render(request, "contract_chat.html", {"contract": contract, "messages": messages})
+    if not contract.has_party(request.user.profile):
+        return HttpResponseForbidden()
+    newest, older_cursor = keyset_page(
+        _chat_messages(contract), page_size=CHAT_PAGE_SIZE, field="timestamp"
+    )
+    last_message_id = max((m.id for m in newest), default=0)
+    if last_message_id:
+        mark_chat_read(contract, request.user.profile, last_message_id)
+    return render(request, "contract_chat.html", {
+        "contract": contract,
+        "messages": newest[::-1],
+        "older_cursor": older_cursor,
+        "last_message_id": last_message_id,
+        "chat_poll_interval": CHAT_POLL_INTERVAL_MS,
+    })
+
+
+@login_required
+def chat_history(request, contract_id):
+    """
+    Scroll-back: the page of messages just before ?cursor=, oldest first.
+    next_cursor continues further back and is null at the start of the chat.
+    """
+    contract = get_object_or_404(Contract, id=contract_id)
+    if not contract.has_party(request.user.profile):
+        return HttpResponseForbidden()
+    older, next_cursor = keyset_page(
+        _chat_messages(contract),
+        cursor=request.GET.get("cursor"),
+        page_size=bounded_page_size(request.GET.get("limit"), default=CHAT_PAGE_SIZE),
+        field="timestamp",
+    )
+    return JsonResponse({
+        "messages": [chat_message_item(m) for m in reversed(older)],
+        "next_cursor": next_cursor,
+    })
+
+
+@login_required
+def chat_updates(request, contract_id):
+    """
+    Messages posted after ?after_id=, oldest first. has_more means the
+    client should ask again from the last id it received.
+    """
+    contract = get_object_or_404(Contract, id=contract_id)
+    if not contract.has_party(request.user.profile):
+        return HttpResponseForbidden()
+    try:
+        after_id = int(request.GET.get("after_id", 0))
+    except ValueError:
+        after_id = 0
+    limit = bounded_page_size(request.GET.get("limit"), default=CHAT_PAGE_SIZE)
+    rows = list(_chat_messages(contract).filter(id__gt=after_id).order_by("id")[:limit + 1])
+    return JsonResponse({
+        "messages": [chat_message_item(m) for m in rows[:limit]],
+        "has_more": len(rows) > limit,
+    })
+
+
+@login_required
+def chat_search(request, contract_id):
+    """
+    Messages matching ?q= (message text or attachment name), best match
+    first, one ?page= at a time. next_page is null on the last page.
+    """
+    contract = get_object_or_404(Contract, id=contract_id)
+    if not contract.has_party(request.user.profile):
+        return HttpResponseForbidden()
+    try:
+        page = max(1, int(request.GET.get("page", 1)))
+    except ValueError:
+        page = 1
+    page_size = bounded_page_size(request.GET.get("limit"), default=CHAT_SEARCH_PAGE_SIZE)
+    rows, has_more = search_messages(contract, request.GET.get("q", ""), page, page_size)
+    return JsonResponse({
+        "messages": [chat_message_item(m) for m in rows],
+        "next_page": page + 1 if has_more else None,
+    })
+
+
+@login_required
+@require_POST
+def chat_read(request, contract_id):
+    """
+    Moves the user's read pointer up to ?last_id=, the newest message the
+    open chat has shown. Pointers only move forward.
+    """
+    contract = get_object_or_404(Contract, id=contract_id)
+    if not contract.has_party(request.user.profile):
+        return HttpResponseForbidden()
+    try:
+        last_id = int(request.POST.get("last_id", 0))
+    except ValueError:
+        last_id = 0
+    moved = last_id > 0 and mark_chat_read(contract, request.user.profile, last_id)
+    return JsonResponse({"status": "success", "moved": moved})
 
 
 @login_required
@@ -441,8 +671,8 @@ def clear_chat(request, contract_id):
     if request.method == "POST":
         contract = get_object_or_404(Contract, id=contract_id)
         profile = get_object_or_404(Profile, user=request.user)
-        if profile in [contract.client, contract.freelancer]:
-            contract.messages.all().delete()
+        if contract.has_party(profile):
+            clear_chat_history(contract)
             return JsonResponse({"status": "success"})
     return JsonResponse({"status": "error"})
 
@@ -453,6 +683,8 @@ def send_message(request):
         contract_id = request.POST.get("contract_id")
         contract = get_object_or_404(Contract, id=contract_id)
         sender_profile, _ = Profile.objects.get_or_create(user=request.user)
+        if not contract.has_party(sender_profile):
+            return JsonResponse({"status": "error", "error": "Not a party to this contract"}, status=403)
 
         content = request.POST.get("content", "").strip()
         file = request.FILES.get("file")
@@ -460,46 +692,174 @@ def send_message(request):
         if not content and not file:
             return JsonResponse({"status": "error", "error": "Empty message"})
 
-        message = Message.objects.create(
-            contract=contract,
-            sender=sender_profile,
-            content=content,
-            file=file
-        )
+        message = post_chat_message(contract, sender_profile, content, file=file)
 
-        receiver = contract.freelancer.user if request.user == contract.client.user else contract.client.user
-        Notification.objects.create(
-            user=receiver,
-            message=f"New message from {request.user.username} in contract {contract.id}"
-        )
+        response_data = {"status": "success", **chat_message_item(message)}
+        return JsonResponse(response_data)
 
-        response_data = {
-            "status": "success",
-            "sender": request.user.username,
-            "content": content,
-            "timestamp": timezone.localtime(message.timestamp).strftime("%Y-%m-%d %H:%M:%S"),
-        }
+    return JsonResponse({"status": "error", "error": "Invalid request method"})
 
-        if file:
-            response_data.update({
-                "file_url": message.file.url,
-                "file_name": message.file.name,
-                "is_image": message.is_image,
-            })
 
-        return JsonResponse(response_data)
+# ===========================
+# CHAT ATTACHMENTS
+# ===========================
+
+@login_required
+@require_POST
+def start_upload(request):
+    """
+    Opens a resumable upload for a chat attachment. The client then PUTs
+    the file to upload_chunk in pieces and finishes with complete_upload.
+    """
+    contract = get_object_or_404(Contract, id=request.POST.get("contract_id"))
+    if not contract.has_party(request.user.profile):
+        return HttpResponseForbidden()
+
+    file_name = os.path.basename(request.POST.get("file_name", "")).strip()[:255]
+    try:
+        size = int(request.POST.get("size", ""))
+    except ValueError:
+        size = -1
+    if not file_name or not 0 < size <= settings.CHAT_UPLOAD_MAX_SIZE:
+        return JsonResponse({"status": "error", "error": "Invalid file name or size"}, status=400)
+
+    upload = ChunkedUpload.objects.create(
+        user=request.user, contract=contract, file_name=file_name, size=size
+    )
+    return JsonResponse({
+        "status": "success",
+        "upload_id": str(upload.id),
+        "offset": 0,
+        "chunk_size": settings.CHAT_UPLOAD_CHUNK_SIZE,
+    })
+
+
+@login_required
+def upload_chunk(request, upload_id):
+    """
+    GET reports how many bytes have arrived (to resume after a failure).
+    PUT appends the raw request body; Content-Range says where it goes.
+    The body is copied to disk block by block, never read whole.
+    """
+    upload = get_object_or_404(ChunkedUpload, id=upload_id, user=request.user)
+    if request.method == "GET":
+        return JsonResponse({"offset": upload.offset, "size": upload.size})
+    if request.method != "PUT":
+        return HttpResponse(status=405)
+
+    content_range = parse_content_range(request.headers.get("Content-Range"))
+    if content_range is None or content_range[2] != upload.size:
+        return JsonResponse({"status": "error", "error": "Bad Content-Range"}, status=400)
+    start, end, _ = content_range
+    length = end - start + 1
+    if length > settings.CHAT_UPLOAD_MAX_CHUNK_SIZE or length != int(request.headers.get("Content-Length") or 0):
+        return JsonResponse({"status": "error", "error": "Chunk too large or truncated"}, status=400)
+
+    try:
+        upload = append_chunk(upload.id, start, length, request)
+    except ChunkConflict as conflict:
+        return JsonResponse({"status": "error", "offset": conflict.offset}, status=409)
+    return JsonResponse({"status": "success", "offset": upload.offset, "complete": upload.complete})
+
+
+@login_required
+@require_POST
+def complete_upload(request, upload_id):
+    """
+    Turns a fully received upload into a chat message (with optional
+    text), exactly like send_message does for a one-shot upload.
+    """
+    upload = get_object_or_404(
+        ChunkedUpload.objects.select_related("contract"), id=upload_id, user=request.user
+    )
+    contract = upload.contract
+    sender_profile = request.user.profile
+    if not contract.has_party(sender_profile):
+        return HttpResponseForbidden()
+    if not upload.complete:
+        return JsonResponse({"status": "error", "offset": upload.offset}, status=409)
+
+    content = request.POST.get("content", "").strip()
+    with open(part_path(upload), "rb") as part:
+        message = post_chat_message(contract, sender_profile, content, file=PartFile(part, name=upload.file_name))
+    discard_upload(upload)
+    return JsonResponse({"status": "success", **chat_message_item(message)})
+
+
+def _attachment_message(request, message_id):
+    """
+    The message, if the user is a party to its contract and neither the
+    contract nor the message has been deleted (purging may still be due).
+    """
+    message = get_object_or_404(
+        Message.objects.select_related("contract").filter(contract__deleted_at__isnull=True),
+        id=message_id,
+    )
+    contract = message.contract
+    if not contract.has_party(request.user.profile) or message.id <= contract.chat_cleared_through:
+        raise Http404
+    return message
+
+
+@login_required
+def download_attachment(request, message_id):
+    message = _attachment_message(request, message_id)
+    if not message.file:
+        raise Http404
+    return blob_response(
+        request, message.file.name, message.file_name or os.path.basename(message.file.name)
+    )
 
-    return JsonResponse({"status": "error", "error": "Invalid request method"})
+
+@login_required
+def attachment_thumbnail(request, message_id, width, fmt):
+    """
+    A chat image's thumbnail, behind the same check as the attachment.
+    Until the background render has produced it, the original image is
+    sent instead and the render is (re)queued.
+    """
+    message = _attachment_message(request, message_id)
+    if not message.is_image:
+        raise Http404
+    widths, _ = THUMBNAIL_PRESETS["chat"]
+    if width not in widths or fmt not in THUMBNAIL_FORMATS:
+        raise Http404
+
+    download_name = message.file_name or os.path.basename(message.file.name)
+    name = derivative_name(message.file.name, "chat", width, fmt)
+    if not blob_storage.exists(name):
+        schedule_derivatives(message.file.name, "chat")
+        return blob_response(request, message.file.name, download_name, as_attachment=False)
+    stem = os.path.splitext(download_name)[0]
+    return blob_response(request, name, f"{stem}-{width}.{fmt}", as_attachment=False)
 
 
 # ===========================
 # NOTIFICATIONS
 # ===========================
 
+NOTIFICATION_HISTORY_PAGE_SIZE = 25
+
+
 @login_required
 def notifications(request):
-    notifications = Notification.objects.filter(user=request.user).order_by("-created_at")
-    return render(request, "notifications.html", {"notifications": notifications})
+    """
+    Notification history, newest first, one keyset page at a time
+    (?cursor=). ?archived=1 pages through the archived notifications.
+    """
+    archived = request.GET.get("archived") == "1"
+    model = NotificationArchive if archived else Notification
+    notifications, next_cursor = keyset_page(
+        model.objects.filter(user=request.user),
+        cursor=request.GET.get("cursor"),
+        page_size=bounded_page_size(request.GET.get("limit"), default=NOTIFICATION_HISTORY_PAGE_SIZE),
+    )
+    return render(request, "notifications.html", {
+        "notifications": notifications,
+        "next_cursor": next_cursor,
+        "archived": archived,
+        "unread_count": request.user.profile.unread_notifications,
+    })
 
 
 
@@ -510,12 +870,18 @@ from .models import Notification
 @login_required
 def mark_notification_read(request, notif_id):
     notif = get_object_or_404(Notification, id=notif_id, user=request.user)
-    notif.is_read = True
-    notif.save()
+    mark_notifications_read(request.user, ids=[notif.id])
 
     # Return updated unread count
-    unread_count = Notification.objects.filter(user=request.user, is_read=False).count()
+    unread_count = unread_notification_count(request.user)
     return JsonResponse({"status": "success", "unread_count": unread_count})
+
+
+@login_required
+@require_POST
+def mark_all_notifications_read(request):
+    marked = mark_notifications_read(request.user)
+    return JsonResponse({"success": True, "marked": marked, "unread_count": unread_notification_count(request.user)})
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 from .models import Notification
@@ -523,55 +889,90 @@ from .models import Notification
 @login_required
 def clear_all_notifications(request):
     if request.method == "POST":
-        Notification.objects.filter(user=request.user).delete()
-        return JsonResponse({"success": True, "unread_count": 0})
+        clear_notifications(request.user)
+        return JsonResponse({"success": True, "unread_count": unread_notification_count(request.user)})
     return JsonResponse({"success": False, "error": "Invalid request"})
 
 
-def get_notifications(request):
-    notifs = Notification.objects.filter(
-        user=request.user,
-        is_read=False
-    ).order_by("-created_at")
+def _notifications_etag(request):
+    # Unread counter + newest id + newest time change whenever the unread
+    # list can change (inserts raise the id, coalesced chat notifications
+    # the time, reads and clears lower the count). Read from the profile
+    # row and index-only MAXes, never from the notification rows.
+    request.notification_state = notification_state(request.user)
+    unread_count, latest_id, latest_at = request.notification_state
+    stamp = latest_at.timestamp() if latest_at else 0
+    return f"notif-{latest_id}-{unread_count}-{stamp}"
 
-    data = []
-    for n in notifs:
-        data.append({
-            "id": n.id,
-            "message": n.message
-        })
-
-    return JsonResponse({"notifications": data})
 
+@login_required
+@condition(etag_func=_notifications_etag)
 def get_notifications(request):
+    """
+    Unread notifications, newest first. With ?since=<latest_at> (or the
+    older ?since_id=N) only those created or coalesced into since then are
+    returned (delta sync); If-None-Match gets a 304 when nothing changed.
+    """
     notifs = Notification.objects.filter(
         user=request.user,
         is_read=False
     ).order_by("-created_at")
 
+    since_id = request.GET.get("since_id")
+    if since_id and since_id.isdigit():
+        notifs = notifs.filter(id__gt=int(since_id))
+    try:
+        since = parse_datetime(request.GET.get("since", ""))
+    except ValueError:
+        since = None
+    if since is not None:
+        notifs = notifs.filter(created_at__gt=since)
+
     data = []
     for n in notifs:
         data.append({
             "id": n.id,
-            "message": n.message
+            "message": n.message,
+            "count": n.count,
         })
 
-    return JsonResponse({"notifications": data})
+    unread_count, latest_id, latest_at = request.notification_state
+    return JsonResponse({
+        "notifications": data,
+        "unread_count": unread_count,
+        "latest_id": latest_id,
+        "latest_at": latest_at.isoformat() if latest_at else None,
+    })
+
+async def notification_stream(request):
+    """
+    Server-Sent Events feed of new notifications, served by TalentLink.asgi.
+    Under WSGI (waitress) a held-open stream would pin a worker thread, so
+    it answers 204, which stops EventSource and makes base.html poll instead.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponse(status=204)
+
+    response = StreamingHttpResponse(
+        notification_events(user.id), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
 
 def read_notification(request, id):
     if request.method != "POST":
         return JsonResponse({"success": False, "error": "Not POST"}, status=400)
 
     notif = get_object_or_404(Notification, id=id, user=request.user)
-    notif.is_read = True
-    notif.save()
+    mark_notifications_read(request.user, ids=[notif.id])
 
     return JsonResponse({"success": True, "id": notif.id})
-def mark_notification_read(request, notif_id):
-    notif = get_object_or_404(Notification, id=notif_id, user=request.user)
-    notif.is_read = True
-    notif.save()
-    return JsonResponse({"status": "success"})
 # ===========================
 # REVIEWS
 # ===========================
@@ -628,21 +1029,109 @@ def leave_review(request, project_id, reviewee_id):
 # DRF VIEWSETS
 # ===========================
 
-class ProjectViewSet(viewsets.ModelViewSet):
+class SparseFieldsViewSetMixin:
+    """
+    Loads only what the serializer's ?fields= / ?expand= read (see
+    SparseFieldsMixin.optimize_queryset) on reads, keeping the ordering
+    columns that keyset pagination reads from the last row.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method not in SAFE_METHODS:
+            # Saving an instance with deferred fields would skip them
+            return queryset
+        keep = [
+            name.lstrip("-")
+            for name in [
+                *queryset.query.order_by,
+                *(getattr(self, "ordering", None) or ()),
+                *getattr(self.paginator, "default_ordering", ()),
+            ]
+            if isinstance(name, str)
+        ]
+        return self.get_serializer().optimize_queryset(queryset, keep)
+
+
+class ProjectViewSet(SparseFieldsViewSetMixin, viewsets.ModelViewSet):
     queryset = Project.objects.all()
     serializer_class = ProjectSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, ProjectSearchFilter]
     filterset_class = ProjectFilter
     ordering_fields = ['created_at', 'budget', 'deadline']
     ordering = ['-created_at']
-    search_fields = ['title', 'description']
 
+    def perform_destroy(self, instance):
+        soft_delete_project(instance)
 
-class ProposalViewSet(viewsets.ModelViewSet):
+
+class ProposalViewSet(SparseFieldsViewSetMixin, viewsets.ModelViewSet):
     queryset = Proposal.objects.all()
     serializer_class = ProposalSerializer
     permission_classes = [IsAuthenticated]
+
+
+FREELANCER_PAGE_SIZE = 20
+
+
+class FreelancerViewSet(SparseFieldsViewSetMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Freelancer discovery for clients. ?skills= (comma-separated skill ids
+    or names) ranks by how many of them a freelancer has, and keeps only
+    those with at least one; then available freelancers come first, then
+    the best rated. ?min_rate=, ?max_rate=, ?available= and ?location=
+    filter. Pages follow ?cursor= (next_cursor of the previous page) and
+    hold ?page_size= rows, as with KeysetPagination.
+    """
+    serializer_class = FreelancerSerializer
+    permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = FreelancerFilter
+    # Behind the number of matched skills, on a ?skills= search
+    ordering = ["-availability", "-rating_average", "-id"]
+
+    def requested_skill_ids(self):
+        tokens = [t.strip() for t in self.request.query_params.get("skills", "").split(",") if t.strip()]
+        if not tokens:
+            return []
+        ids = [int(t) for t in tokens if t.isdigit()]
+        # Names are looked up on the case-insensitive unique index
+        keys = [Skill.canonical(t).lower() for t in tokens if not t.isdigit()]
+        skills = Skill.objects.alias(key=Lower("name")).filter(Q(id__in=ids) | Q(key__in=keys))
+        return list(skills.values_list("id", flat=True)) or [0]
+
+    def get_queryset(self):
+        # user is prefetched, not joined: its columns would widen the GROUP BY of a skill search
+        profiles = Profile.objects.filter(role="freelancer").prefetch_related("user", "skills")
+        skill_ids = self.requested_skill_ids()
+        if skill_ids:
+            profiles = profiles.filter(skills__in=skill_ids).annotate(matched=Count("skills"))
+        return profiles
+
+    def list(self, request, *args, **kwargs):
+        profiles = self.filter_queryset(self.get_queryset())
+        ordering = list(self.ordering)
+        if "matched" in profiles.query.annotations:
+            ordering.insert(0, "-matched")
+        # Same ?cursor= and ?page_size= as the rest of the API
+        paginator = self.paginator
+        rows, next_cursor = keyset_page_by(
+            profiles,
+            ordering,
+            cursor=request.query_params.get(paginator.cursor_query_param),
+            page_size=bounded_page_size(
+                request.query_params.get(paginator.page_size_query_param),
+                default=FREELANCER_PAGE_SIZE,
+                maximum=paginator.max_page_size,
+            ),
+        )
+        return Response({
+            "results": self.get_serializer(rows, many=True).data,
+            "next_cursor": next_cursor,
+        })
+
+
 @login_required
 @client_required
 def submit_review(request, contract_id):
@@ -679,9 +1168,7 @@ from django.contrib.auth.decorators import login_required
 from django.shortcuts import render
 from .models import Project, Contract, Proposal, Review, Notification
 
-@login_required
-def profile_view(request):
-    user = request.user
+def _profile_view_context(user):
     profile = user.profile  # Always use Profile when required
 
     # ==========================
@@ -693,13 +1180,9 @@ def profile_view(request):
         "project", "freelancer", "proposal"
     )
 
-    client_contract_reviews = {}
-    for contract in client_contracts:
-        review = Review.objects.filter(
-            project=contract.project,
-            reviewer_name=user.username
-        ).first()
-        client_contract_reviews[contract.id] = review
+    client_contract_reviews = contract_review_map(
+        client_contracts, reviewer_name=user.username
+    )
 
     client_active_projects = client_projects.count()
     client_total_proposals = client_proposals.count()
@@ -711,35 +1194,22 @@ def profile_view(request):
     # FREELANCER DATA
     # ==========================
     freelancer_contracts = Contract.objects.filter(freelancer=profile).select_related(
-        "project", "client"
+        "project", "client__user"
     )
 
-    freelancer_reviews = {}
-    for contract in freelancer_contracts:
-        review = Review.objects.filter(
-            project=contract.project,
-            reviewer_name=contract.client.user.username
-        ).first()
-        freelancer_reviews[contract.id] = review
-
-    freelancer_projects = Project.objects.all()  # Or filter projects relevant to freelancer if needed
+    freelancer_reviews = contract_review_map(freelancer_contracts)
 
     # ==========================
     # NOTIFICATIONS
     # ==========================
-    notifications = Notification.objects.filter(user=user).order_by("-created_at")
-    unread_count = notifications.filter(is_read=False).count()
+    notifications = Notification.objects.filter(user=user).order_by("-created_at")[:DASHBOARD_NOTIFICATIONS]
+    unread_count = profile.unread_notifications
 
     # ==========================
     # CONTEXT
     # ==========================
-    context = {
-        "user": user,
-        "profile": profile,
-
+    return {
         # Client data
-        "client_projects": client_projects,
-        "client_proposals": client_proposals,
         "client_contracts": client_contracts,
         "client_contract_reviews": client_contract_reviews,
         "client_active_projects": client_active_projects,
@@ -749,13 +1219,21 @@ def profile_view(request):
         # Freelancer data
         "freelancer_contracts": freelancer_contracts,
         "freelancer_reviews": freelancer_reviews,
-        "freelancer_projects": freelancer_projects,
 
         # Notifications
         "notifications": notifications,
         "unread_count": unread_count,
     }
 
+
+@login_required
+def profile_view(request):
+    user = request.user
+    context = {
+        "user": user,
+        "profile": user.profile,
+        **get_dashboard_context("profile_view", user, lambda: _profile_view_context(user)),
+    }
     return render(request, "profile.html", context)
 
 from django.contrib.auth.decorators import login_required
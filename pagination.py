@@ -0,0 +1,162 @@
+# pagination.py
+import base64
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import F, Q
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+
+def bounded_page_size(value, default=20, maximum=100):
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, maximum))
+
+
+def encode_position(values):
+    """
+    Opaque cursor for a row's values of a multi-column ordering. NULL is
+    stored as an empty value.
+    """
+    raw = "|".join("" if value is None else str(value) for value in values).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_position(cursor, length):
+    """
+    The values encode_position stored, as strings (the ORM converts them
+    back when filtering), or None for a missing/malformed cursor.
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+    except (ValueError, UnicodeDecodeError):
+        return None
+    return values if len(values) == length else None
+
+
+def keyset_page_by(queryset, ordering, cursor=None, page_size=20, nullable=()):
+    """
+    keyset_page for an ordering on several columns or annotations, e.g.
+    ("-matched", "-rating_average", "-id"). The last one must be unique.
+    The columns named in nullable sort their NULLs last in either
+    direction. Returns (rows, next_cursor).
+    """
+    fields = [name.lstrip("-") for name in ordering]
+    queryset = queryset.order_by(*[
+        (F(field).desc(nulls_last=True) if name.startswith("-") else F(field).asc(nulls_last=True))
+        if field in nullable else name
+        for name, field in zip(ordering, fields)
+    ])
+
+    position = decode_position(cursor, len(fields))
+    if position is not None:
+        # (a, b, c) after (x, y, z): a past x, or a = x and b past y, ...
+        # A NULL is past every value and nothing is past a NULL.
+        after, same = Q(), Q()
+        for name, field, value in zip(ordering, fields, position):
+            if field in nullable and value == "":
+                same &= Q(**{f"{field}__isnull": True})
+                continue
+            past = Q(**{f"{field}__{'lt' if name.startswith('-') else 'gt'}": value})
+            if field in nullable:
+                past |= Q(**{f"{field}__isnull": True})
+            after |= same & past
+            same &= Q(**{field: value})
+        try:
+            queryset = queryset.filter(after)
+        except (ValueError, ValidationError):
+            # Tampered values: start over, like a malformed cursor
+            pass
+
+    rows = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_position([getattr(rows[-1], field) for field in fields])
+    return rows, next_cursor
+
+
+class KeysetPagination(BasePagination):
+    """
+    Default paginator of the API: keyset pages (keyset_page_by) over the
+    ordering the queryset already has, from OrderingFilter or the view,
+    with the primary key added to break ties; newest first without one.
+
+    ?page_size= is capped at max_page_size, and the total is only counted
+    when asked for with ?count=true. Orderings on something other than
+    model fields, like a search rank, are paged by offset instead.
+    """
+    default_ordering = ("-created_at",)
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+
+    def get_ordering(self, queryset, view):
+        ordering = list(queryset.query.order_by or getattr(view, "ordering", None) or self.default_ordering)
+        if not all(isinstance(name, str) for name in ordering):
+            return None
+        ordering = ["-id" if name == "-pk" else "id" if name == "pk" else name for name in ordering]
+        if ordering[-1].lstrip("-") != "id":
+            ordering.append("-id" if ordering[-1].startswith("-") else "id")
+        return ordering
+
+    def nullable_fields(self, model, ordering):
+        """
+        The model fields of ordering that may be NULL, or None when one of
+        its terms isn't a model field.
+        """
+        nullable = set()
+        for name in ordering:
+            try:
+                field = model._meta.get_field(name.lstrip("-"))
+            except FieldDoesNotExist:
+                return None
+            if not field.concrete or field.many_to_many:
+                return None
+            if field.null:
+                nullable.add(field.name)
+        return nullable
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = bounded_page_size(
+            request.query_params.get(self.page_size_query_param), self.page_size, self.max_page_size
+        )
+        cursor = request.query_params.get(self.cursor_query_param)
+        wants_count = request.query_params.get(self.count_query_param, "").lower() in ("1", "true", "yes")
+        self.count = queryset.count() if wants_count else None
+
+        ordering = self.get_ordering(queryset, view)
+        nullable = self.nullable_fields(queryset.model, ordering) if ordering else None
+        if nullable is None:
+            return self.offset_page(queryset, cursor, page_size)
+        rows, self.next_cursor = keyset_page_by(queryset, ordering, cursor, page_size, nullable)
+        return rows
+
+    def offset_page(self, queryset, cursor, page_size):
+        position = decode_position(cursor, 1)
+        offset = int(position[0]) if position and position[0].isdigit() else 0
+        rows = list(queryset[offset:offset + page_size + 1])
+        self.next_cursor = encode_position([offset + page_size]) if len(rows) > page_size else None
+        return rows[:page_size]
+
+    def get_paginated_response(self, data):
+        body = {"results": data, "next_cursor": self.next_cursor}
+        if self.count is not None:
+            body["count"] = self.count
+        return Response(body)
+
+    def get_paginated_response_schema(self, schema):
+        properties = {
+            "results": schema,
+            "next_cursor": {"type": "string", "nullable": True},
+            "count": {"type": "integer"},
+        }
+        return {"type": "object", "required": ["results", "next_cursor"], "properties": properties}
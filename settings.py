@@ -89,6 +89,8 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # Keyset pages of at most 100 rows; ?count=true adds the total
+    'DEFAULT_PAGINATION_CLASS': 'myapp.pagination.KeysetPagination',
 }
 
 CORS_ALLOW_ALL_ORIGINS = True
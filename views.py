@@ -117,12 +117,16 @@ class ContractViewSet(viewsets.ModelViewSet):
     queryset = Contract.objects.all()
     serializer_class = ContractSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    # Keyset pages follow this; contracts have no created_at
+    ordering = ['-id']
 
 
 class MessageViewSet(viewsets.ModelViewSet):
     queryset = Message.objects.all()
     serializer_class = MessageSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    # Keyset pages follow this instead of the default created_at
+    ordering = ['-timestamp']
 
 
 class ReviewViewSet(viewsets.ModelViewSet):